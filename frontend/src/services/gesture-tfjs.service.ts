@@ -73,7 +73,11 @@ export class GestureTFJSService {
         // If that fails, fall back to backend Python prediction
         const modelUrl = '/models/tfjs_model/model.json';
         
-        this.model = await tf.loadLayersModel(modelUrl);
+        // convert_to_tfjs.py can emit either a layers or a graph model
+        const manifest = await (await fetch(modelUrl)).json();
+        this.model = manifest.format === 'graph-model'
+          ? await tf.loadGraphModel(modelUrl)
+          : await tf.loadLayersModel(modelUrl);
         // Browser model loaded successfully
       } catch (error: any) {
         // This is expected if model hasn't been converted/deployed
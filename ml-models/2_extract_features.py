@@ -5,23 +5,106 @@ This script processes your training videos and extracts facial landmark features
 
 Usage:
     python 2_extract_features.py
+    python 2_extract_features.py --feature-mode head_pose
+    python 2_extract_features.py --workers 4     # Process videos in parallel
+    python 2_extract_features.py --split-workers 4   # Split each long video across 4 workers
+    python 2_extract_features.py --verify-split videos/yes/session.mp4
+    python 2_extract_features.py --archive           # Also keep all raw landmarks
+    python 2_extract_features.py --from-archive --feature-mode head_pose
+    python 2_extract_features.py --full              # Re-extract every video
+    python 2_extract_features.py --pipeline          # Overlap decode and FaceMesh
+    python 2_extract_features.py --profile fast      # Downscaled FaceMesh input
+    python 2_extract_features.py --benchmark-profiles   # fps + accuracy per profile
+    python 2_extract_features.py --roi               # FaceMesh on the face crop only
+    python 2_extract_features.py --track 5           # FaceMesh every 5th frame + optical flow
+    python 2_extract_features.py --feature-mode keypoints   # Face detector instead of FaceMesh
+    python 2_extract_features.py --benchmark-sources # FaceMesh vs keypoints: cost + accuracy
+    python 2_extract_features.py --batched 16        # Batched landmark network across videos
+    python 2_extract_features.py --gate 2.0          # Skip FaceMesh on still frames
+    python 2_extract_features.py --benchmark-gate    # Skip rate + accuracy per gate threshold
+    python 2_extract_features.py --dtype float16     # Quarter-size dataset
+    python 2_extract_features.py --trace             # Chrome trace of every stage
 
 What it does:
     - Loads videos from videos/ folder
     - Uses MediaPipe to detect facial landmarks
     - Extracts key points from each frame
     - Creates training sequences
-    - Saves processed data to data/training_data.npz
+    - Streams the sequences into fixed-size shards in data/dataset (see
+      dataset_io.py), so memory stays flat however large the dataset grows;
+      --dtype float16 stores them at a quarter of the size
+    - Only processes new or changed videos: per-video results are kept in
+      data/per_video and tracked in data/extraction_manifest.json (see
+      extraction_manifest.py); removed videos are dropped
+    - Checkpoints every finished video, so an interrupted run resumes where
+      it stopped; videos that fail are quarantined with their error instead
+      of aborting the run
+    - With --workers N, spreads videos over N processes (one FaceMesh each);
+      results are merged in input order, so the dataset is identical to a
+      sequential run
+    - With --split-workers N, each long video is cut into N frame ranges
+      processed in parallel. Every range starts --warmup-frames early so
+      FaceMesh tracking can lock on; the overlap is discarded when the
+      landmark streams are stitched, and the remaining difference at each
+      seam is reported
+    - With --archive, all 478 raw landmarks of every frame are kept in
+      data/landmarks (see landmark_archive.py); --from-archive then builds
+      any feature mode / sequence length from the archive without decoding
+      video (videos missing from the archive are decoded and added)
+    - With --pipeline, a decoder thread feeds a bounded frame queue
+      (--frame-queue), a FaceMesh thread feeds a bounded landmark queue
+      (--landmark-queue) and the main thread converts the results, so
+      decoding overlaps inference. Per-stage utilization (busy / waiting on
+      input / blocked on output) is printed and saved in either mode; with
+      --workers or --split-workers, busy time is summed over processes
+    - Every run records decode, color conversion, FaceMesh, conversion,
+      feature and window time, frames/sec and peak RSS, in total and per
+      video, in extraction_stats.json. With --trace, every stage of every
+      frame also goes to data/extraction_trace.json, a Chrome trace-event
+      timeline across threads and worker processes (see pipeline_trace.py)
+    - With --profile, FaceMesh input is downscaled, frames are decimated
+      and/or refine_landmarks is turned off (see EXTRACTION_PROFILES); the
+      profile is stored in the dataset index and extraction_stats.json.
+      --benchmark-profiles extracts the dataset once per profile into
+      data/profile_benchmark/<profile> and reports video frames/sec and
+      validation accuracy for each
+    - With --roi, only a padded crop around the previous frame's face is
+      color-converted and given to FaceMesh (see face_roi.py); landmarks are
+      mapped back to full-frame coordinates, and the full frame is used
+      whenever the face is lost
+    - With --track N, FaceMesh runs on every Nth frame (and whenever
+      tracking quality drops); the feature landmarks are carried through the
+      frames in between with Lucas-Kanade optical flow (see
+      landmark_tracker.py, which also measures the drift)
+    - With --batched N, MediaPipe's face-landmark network runs directly on
+      batches of N face crops cut from tracked boxes, gathered across frames
+      and videos (see batched_landmarks.py, which also checks agreement with
+      per-frame FaceMesh and reports the speedup); --workers is ignored
+    - With --gate T, a frame whose downsampled face region differs from the
+      last FaceMesh frame by less than T gray levels reuses its landmarks
+      (see frame_gate.py); reused frames are tagged in the landmark stream
+      and archive, and counted in extraction_stats.json. --benchmark-gate
+      compares thresholds on skip rate, fps and validation accuracy
 
 Technical Details:
     - Uses MediaPipe Face Mesh for landmark detection
     - Tracks 8 key facial points: nose, forehead, chin, eyes, mouth
     - Creates 30-frame sequences for temporal analysis
     - Uses sliding window with 10-frame overlap for more training data
+    - Feature modes:
+        coords:    9 raw coordinates (y of nose/forehead/chin, x of nose/eyes,
+                   z of nose/forehead/chin)
+        head_pose: 6 values - pitch, yaw, roll and their angular velocity
+                   (see head_pose.py)
+        keypoints: 10 values from the face detector's 6 keypoints instead
+                   of FaceMesh (see keypoint_source.py); needs its own model
 
 Output:
-    - data/training_data.npz: Processed features ready for training
+    - data/dataset/: Processed features ready for training (index.json +
+      X_*.npy / y_*.npy shards)
     - data/extraction_stats.json: Statistics about the extraction process
+    - data/extraction_trace.json: Stage timeline (with --trace)
+    - data/extraction_manifest.json + data/per_video/: Incremental state
 """
 
 import cv2
@@ -31,21 +114,392 @@ from pathlib import Path
 from tqdm import tqdm
 import json
 import time
+import os
+import queue
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import argparse
+
+from head_pose import FEATURE_MODES, POSE_LANDMARKS, POSE_FEATURE_NAMES
+from landmark_archive import ARCHIVE_ROOT, LandmarkArchive, video_content_hash
+from gesture_features import features_from_landmarks, landmarks_to_array
+from extraction_manifest import ExtractionManifest
+from face_roi import FaceROI
+from landmark_tracker import TRACKED_LANDMARKS, KeyframeTracker
+from keypoint_source import DetectorKeypoints, KEYPOINT_FEATURE_NAMES
+from batched_landmarks import BatchedFaceLandmarker, extract_videos
+from frame_gate import FrameGate
+from pipeline_trace import TraceRecorder, peak_rss_mb
+from dataset_io import DATASET_DIR, DEFAULT_SHARD_SIZE, STORAGE_DTYPES, ShardedDatasetWriter
+
+VIDEO_EXTENSIONS = ["*.mp4", "*.avi", "*.mov", "*.MOV"]
+WINDOW_STRIDE = 10
+
+# Frames each video adds to a round of the batched engine (--batched): the
+# crops of a round share the box tracked from the previous round
+BATCH_FRAMES_PER_VIDEO = 4
+
+# Extraction speed profiles (--profile). FaceMesh input is downscaled to at
+# most max_width pixels, only every frame_step-th frame is processed and
+# refine_landmarks adds the iris points (478 instead of 468 landmarks; no
+# feature mode uses them). frame_step > 1 stretches each window over more
+# time, so a model trained on it expects the same decimation at run time.
+DEFAULT_PROFILE = "full"
+EXTRACTION_PROFILES = {
+    "full":     {"max_width": None, "frame_step": 1, "refine_landmarks": True},
+    "balanced": {"max_width": 640, "frame_step": 1, "refine_landmarks": True},
+    "fast":     {"max_width": 480, "frame_step": 1, "refine_landmarks": False},
+    "fastest":  {"max_width": 320, "frame_step": 2, "refine_landmarks": False}
+}
+
+def assemble_sequences(frame_features, sequence_length, stride=WINDOW_STRIDE):
+    """
+    Cut per-frame features into overlapping training windows
+    
+    Args:
+        frame_features: Features of the frames with a detected face, in order
+        sequence_length: Frames per window
+        stride: Frames between window starts
+    
+    Returns:
+        List of numpy arrays of shape (sequence_length, feature_dim)
+    """
+    sequences = [
+        np.array(frame_features[start:start + sequence_length])
+        for start in range(0, len(frame_features) - sequence_length + 1, stride)
+    ]
+    
+    # Handle videos shorter than sequence_length
+    if len(sequences) == 0 and len(frame_features) > sequence_length // 2:
+        # Pad short sequences by repeating last frame
+        padded = list(frame_features) + [frame_features[-1]] * (sequence_length - len(frame_features))
+        sequences.append(np.array(padded))
+    
+    return sequences
+
+# Per-process extractor used by the worker pool (one FaceMesh per worker)
+_worker_extractor = None
+
+def _init_worker(config):
+    global _worker_extractor
+    # Workers already run in parallel; keep OpenCV from oversubscribing cores
+    cv2.setNumThreads(1)
+    _worker_extractor = FeatureExtractor(**config)
+
+def _process_video_job(job):
+    # Stage times and trace events travel back with the result so the
+    # parent can report them
+    video_file, sequence_length, content_hash = job
+    if content_hash is not None:
+        _worker_extractor.content_hashes[str(video_file)] = content_hash
+    _worker_extractor.stage_times = new_stage_times()
+    result = _worker_extractor.process_video(video_file, sequence_length)
+    return result, _worker_extractor.stage_times, _worker_extractor.drain_trace()
+
+def _extract_range_job(job):
+    _worker_extractor.stage_times = new_stage_times()
+    stream = _worker_extractor.extract_frame_range(*job)
+    _worker_extractor.stage_times["peak_rss_mb"] = peak_rss_mb()
+    return stream, _worker_extractor.stage_times, _worker_extractor.drain_trace()
+
+# Extraction stages, in pipeline order:
+#   decode     reading and decoding frames (with --batched also cropping,
+#              keyframe FaceMesh and mapping landmarks back)
+#   color      BGR -> RGB conversion and downscaling to the profile's width
+#              (part of landmarks with --roi / --track / --gate, which
+#              convert the crop or keyframe there)
+#   landmarks  FaceMesh, the face detector or the batched network
+#   convert    results -> full-frame landmark arrays
+#   features   per-frame features from the landmarks
+#   windows    cutting the features into training windows
+STAGES = ["decode", "color", "landmarks", "convert", "features", "windows"]
+
+def new_stage_times():
+    """
+    Empty per-stage timing record
+    
+    Per stage: busy (working), waiting (input queue empty) and blocked
+    (output queue full) seconds. wall is the time spent in process_video,
+    reused the frames that reused landmarks (--gate), peak_rss_mb the
+    largest peak resident memory of the processes involved.
+    """
+    return {"wall": 0.0, "frames": 0, "reused": 0, "peak_rss_mb": None,
+            "stages": {stage: {"busy": 0.0, "waiting": 0.0, "blocked": 0.0} for stage in STAGES}}
+
+def merge_stage_times(total, times):
+    """Add one timing record (e.g. from a worker process) to another"""
+    total["wall"] += times["wall"]
+    total["frames"] += times["frames"]
+    total["reused"] += times["reused"]
+    if times["peak_rss_mb"] is not None:
+        total["peak_rss_mb"] = max(total["peak_rss_mb"] or 0.0, times["peak_rss_mb"])
+    for stage, counters in times["stages"].items():
+        for key, seconds in counters.items():
+            total["stages"][stage][key] += seconds
+
+def video_timing_report(times):
+    """
+    Stage breakdown of one video for extraction_stats.json
+    
+    Returns:
+        Dictionary with frames, seconds, fps, peak RSS and busy seconds per stage
+    """
+    wall = times["wall"]
+    return {
+        "frames": times["frames"],
+        "seconds": round(wall, 3),
+        "fps": round(times["frames"] / wall, 1) if wall > 0 else None,
+        "peak_rss_mb": None if times["peak_rss_mb"] is None else round(times["peak_rss_mb"], 1),
+        "stages_s": {stage: round(counters["busy"], 4) for stage, counters in times["stages"].items()}
+    }
+
+def stage_utilization(times):
+    """
+    Share of the wall time each stage spent working, waiting and blocked
+    
+    Returns:
+        Dictionary for extraction_stats.json, stage -> seconds and fractions
+    """
+    wall = times["wall"]
+    frames = times["frames"]
+    report = {}
+    for stage, counters in times["stages"].items():
+        report[stage] = {key + "_s": round(seconds, 3) for key, seconds in counters.items()}
+        report[stage]["utilization"] = round(counters["busy"] / wall, 3) if wall > 0 else 0.0
+        report[stage]["ms_per_frame"] = round(counters["busy"] / frames * 1000, 3) if frames else None
+    return report
+
+def print_stage_report(times, pipelined):
+    """Per-stage utilization; the busiest stage bounds the frame rate"""
+    wall = times["wall"]
+    if wall <= 0:
+        return
+    print(f"\nStage utilization ({'pipelined' if pipelined else 'sequential'}, "
+          f"{times['frames']} frames in {wall:.1f}s, {times['frames'] / wall:.1f} fps):")
+    for stage, counters in times["stages"].items():
+        per_frame = counters['busy'] / times['frames'] * 1000 if times['frames'] else 0.0
+        print(f"  {stage:10} busy {counters['busy'] / wall * 100:5.1f}%  "
+              f"waiting {counters['waiting'] / wall * 100:5.1f}%  "
+              f"blocked {counters['blocked'] / wall * 100:5.1f}%  "
+              f"{per_frame:7.3f} ms/frame")
+    if times["peak_rss_mb"] is not None:
+        print(f"  Peak RSS: {times['peak_rss_mb']:.0f} MB")
+
+# Queue marker: the producing stage has finished
+_END_OF_STREAM = object()
+
+def _pipeline_put(stage_queue, item, stop):
+    """
+    Put into a bounded queue unless the pipeline is shutting down
+    
+    Returns:
+        Seconds spent blocked on a full queue
+    """
+    start = time.perf_counter()
+    while not stop.is_set():
+        try:
+            stage_queue.put(item, timeout=0.1)
+            break
+        except queue.Full:
+            continue
+    return time.perf_counter() - start
+
+def _pipeline_get(stage_queue, stop):
+    """
+    Take the next item from a queue, giving up when the pipeline shuts down
+    
+    Returns:
+        (item, seconds spent waiting); item is _END_OF_STREAM on shutdown
+    """
+    start = time.perf_counter()
+    while True:
+        try:
+            item = stage_queue.get(timeout=0.1)
+            break
+        except queue.Empty:
+            if stop.is_set():
+                item = _END_OF_STREAM
+                break
+    return item, time.perf_counter() - start
+
+def plan_segments(frame_count, num_segments, warmup_frames, min_segment_frames=300, frame_step=1):
+    """
+    Frame ranges for splitting one video
+    
+    Args:
+        frame_count: Frames in the video (from the container, may be approximate)
+        num_segments: Requested number of segments
+        warmup_frames: Extra frames each segment processes before its start
+        min_segment_frames: Shorter segments aren't worth the warm-up cost
+        frame_step: Only every frame_step-th frame is processed; all bounds
+                    are multiples of it so segments pick the same frames as
+                    a sequential run
+        
+    Returns:
+        List of (first_frame, start_frame, end_frame); end_frame None = to the end
+    """
+    num_segments = max(1, min(num_segments, frame_count // min_segment_frames))
+    bounds = np.linspace(0, frame_count, num_segments + 1).astype(int) // frame_step * frame_step
+    warmup_frames = -(-warmup_frames // frame_step) * frame_step
+    segments = []
+    for i in range(num_segments):
+        start = int(bounds[i])
+        end = int(bounds[i + 1]) if i < num_segments - 1 else None
+        segments.append((max(0, start - warmup_frames), start, end))
+    return segments
+
+def stitch_segments(segments):
+    """
+    Join per-segment landmark streams, dropping each segment's warm-up frames
+    
+    Args:
+        segments: List of (first_frame, start_frame, stream) in video order;
+                  each stream (see extract_frame_range) starts at first_frame
+        
+    Returns:
+        stream: Stitched landmark stream
+        seams: One report per seam comparing the warm-up frames with the same
+               frames from the previous (fully tracked) segment
+    """
+    frames = []
+    timestamps = []
+    reused = []
+    seams = []
+    for first, start, stream in segments:
+        warmup = stream["frames"][:start - first]
+        
+        if frames and warmup:
+            # Same frames, seen by the previous segment with tracking already locked
+            reference = frames[first:start]
+            mismatches = sum((a is None) != (b is None) for a, b in zip(warmup, reference))
+            differences = [
+                float(np.max(np.abs(np.asarray(a) - np.asarray(b))))
+                for a, b in zip(warmup, reference) if a is not None and b is not None
+            ]
+            seams.append({
+                "frame": start,
+                "warmup_frames": len(warmup),
+                "detection_mismatches": int(mismatches),
+                "max_abs_diff": max(differences) if differences else None,
+                "seam_abs_diff": differences[-1] if differences else None
+            })
+        
+        frames.extend(stream["frames"][start - first:])
+        timestamps.extend(stream["timestamps"][start - first:])
+        reused.extend(stream.get("reused", [])[start - first:])
+    
+    stitched = dict(segments[0][2], frames=frames, timestamps=timestamps)
+    if "reused" in stitched:
+        stitched["reused"] = reused
+    return stitched, seams
+
+def print_seam_report(split_reports):
+    """Summarize how much the split runs differ at their seams"""
+    print(f"\nSplit-video seams (warm-up frames vs the previous segment):")
+    for video, seams in split_reports.items():
+        for seam in seams:
+            diff = "n/a" if seam["seam_abs_diff"] is None else f"{seam['seam_abs_diff']:.6f}"
+            print(f"  {Path(video).name} @ frame {seam['frame']}: "
+                  f"seam diff {diff}, {seam['detection_mismatches']} detection mismatches "
+                  f"in {seam['warmup_frames']} warm-up frames")
 
 class FeatureExtractor:
-    def __init__(self, video_path="videos", output_path="data"):
+    def __init__(self, video_path="videos", output_path="data", feature_mode="coords",
+                 archive_path=None, from_archive=False, queue_sizes=None, profile=DEFAULT_PROFILE,
+                 roi=False, track_interval=0, batch_size=0, landmark_model=None, gate_threshold=0.0,
+                 trace=False):
+        # Constructor arguments, so worker processes can build identical extractors
+        self.config = {
+            "video_path": str(video_path),
+            "output_path": str(output_path),
+            "feature_mode": feature_mode,
+            "archive_path": None if archive_path is None else str(archive_path),
+            "from_archive": from_archive,
+            "queue_sizes": None if queue_sizes is None else list(queue_sizes),
+            "profile": profile,
+            "roi": roi,
+            "track_interval": track_interval,
+            "batch_size": batch_size,
+            "landmark_model": None if landmark_model is None else str(landmark_model),
+            "gate_threshold": gate_threshold,
+            "trace": trace
+        }
         self.video_path = Path(video_path)
         self.output_path = Path(output_path)
         self.output_path.mkdir(exist_ok=True)
         
-        # Initialize MediaPipe Face Mesh
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        if feature_mode not in FEATURE_MODES:
+            raise ValueError(f"Unknown feature mode '{feature_mode}' (choose from {FEATURE_MODES})")
+        self.feature_mode = feature_mode
+        
+        if profile not in EXTRACTION_PROFILES:
+            raise ValueError(f"Unknown extraction profile '{profile}' "
+                             f"(choose from {list(EXTRACTION_PROFILES)})")
+        self.profile_name = profile
+        self.profile = EXTRACTION_PROFILES[profile]
+        
+        # Raw landmark archive (landmark_archive.py): write to it, read from it, or neither
+        self.archive = LandmarkArchive(archive_path) if archive_path is not None else None
+        self.from_archive = from_archive and self.archive is not None
+        
+        # (frame queue, landmark queue) sizes of the threaded decode ->
+        # landmarks -> convert pipeline; None runs the stages in sequence
+        self.queue_sizes = None if queue_sizes is None else tuple(queue_sizes)
+        self.stage_times = new_stage_times()
+        # Stage times of each video processed (see video_timing)
+        self.video_times = {}
+        
+        # Optional Chrome trace of every stage of every frame (pipeline_trace.py)
+        self.trace = TraceRecorder() if trace else None
+        
+        # Initialize MediaPipe Face Mesh (or the face detector's keypoints,
+        # which keypoint_source.py makes look like FaceMesh results)
+        if feature_mode == "keypoints":
+            self.face_mesh = DetectorKeypoints()
+        else:
+            self.mp_face_mesh = mp.solutions.face_mesh
+            self.face_mesh = self.mp_face_mesh.FaceMesh(
+                max_num_faces=1,
+                refine_landmarks=self.profile["refine_landmarks"],
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
+        
+        if roi and feature_mode == "keypoints":
+            raise ValueError("--roi needs FaceMesh landmarks; the keypoint detector already runs on the full frame")
+        
+        # Optional face crop (face_roi.py): FaceMesh only sees the area
+        # around the previous frame's face
+        self.roi = FaceROI(self.face_mesh) if roi else None
+        
+        # Optional keyframe tracker (landmark_tracker.py): FaceMesh every
+        # track_interval frames, optical flow for the feature landmarks between
+        self.tracker = None
+        if track_interval > 1:
+            self.tracker = KeyframeTracker(
+                self.detect_keyframe, TRACKED_LANDMARKS[feature_mode], track_interval
+            )
+        
+        # Optional batched landmark engine (batched_landmarks.py): the
+        # face-landmark network on batches of face crops from many videos;
+        # FaceMesh above only finds faces that have no tracked box yet
+        self.landmarker = None
+        if batch_size > 0:
+            if feature_mode == "keypoints" or roi or self.tracker is not None:
+                raise ValueError("--batched already crops and tracks the face with FaceMesh's own "
+                                 "network; it can't be combined with keypoints, --roi or --track")
+            self.landmarker = BatchedFaceLandmarker(landmark_model, batch_size)
+        
+        # Optional motion gate (frame_gate.py): reuse the previous landmarks
+        # while the frame barely changes
+        self.gate = None
+        if gate_threshold > 0:
+            if self.landmarker is not None:
+                raise ValueError("--gate works per frame; it can't be combined with --batched")
+            self.gate = FrameGate(gate_threshold, keep_flags=True)
         
         # Focused landmarks for head movement detection
         # YES (vertical nod): Track points that move up/down
@@ -64,188 +518,889 @@ class FeatureExtractor:
         # All key landmarks (union of both sets)
         self.key_landmarks = sorted(list(set(self.vertical_landmarks + self.horizontal_landmarks)))
         
+        # Warm-up seam reports of videos split across workers
+        self.split_reports = {}
+        
+        # Content hashes known from the manifest, so a video is read for
+        # hashing at most once per run
+        self.content_hashes = {}
+        
         self.categories = ["yes", "no", "neutral"]
         self.label_map = {"yes": 0, "no": 1, "neutral": 2}
     
-    def extract_landmarks_from_frame(self, frame):
+    def detect_landmarks(self, frame):
         """
-        Extract facial landmarks and compute movement-focused features
+        Run FaceMesh on one frame
         
         Args:
             frame: BGR image from OpenCV
             
         Returns:
-            numpy array of shape (feature_dim,) containing movement features
-            or None if no face detected
+            numpy array of shape (478, 3) with normalized x/y/z of every
+            landmark (468 without refine_landmarks), or None if no face detected
+        """
+        output = self.landmark_stage(self.decode_stage(frame))
+        return self.convert_stage(output, frame.shape)
+    
+    # The three per-frame stages, run in turn or on separate threads (--pipeline)
+    def decode_stage(self, frame):
+        """Decoded BGR frame -> landmark stage input"""
+        # With --roi / --track / --gate the crop, the keyframe or the reuse
+        # decision depends on the previous frame, so all per-frame work moves
+        # to the landmark stage
+        if self.roi is not None or self.tracker is not None or self.gate is not None:
+            return frame
+        return self.prepare_frame(frame)
+    
+    def landmark_stage(self, image):
+        """
+        FaceMesh on one frame: (results, ROI crop box or None)
+        
+        With --track / --gate: (landmark array from the keyframe tracker or
+        the motion gate, None)
+        """
+        if self.gate is not None:
+            detect = self.tracker.process if self.tracker is not None else self.detect_keyframe
+            return self.gate.process(image, detect), None
+        if self.tracker is not None:
+            return self.tracker.process(image), None
+        return self.face_mesh_output(image)
+    
+    def convert_stage(self, output, frame_shape):
+        """Landmark stage output -> full-frame (478, 3) landmark array, or None"""
+        results, box = output
+        if self.tracker is not None or self.gate is not None:
+            return results
+        return self.full_frame_landmarks(results, box, frame_shape)
+    
+    def face_mesh_output(self, image):
+        """FaceMesh results and their ROI crop box (image is prepared unless --roi)"""
+        if self.roi is None:
+            return self.face_mesh.process(image), None
+        return self.roi.process(image, map_landmarks=False, prepare=self.prepare_frame)
+    
+    def full_frame_landmarks(self, results, box, frame_shape):
+        """FaceMesh results -> landmark array in full-frame coordinates, or None"""
+        landmarks = self.landmark_array(results)
+        if landmarks is None or box is None:
+            return landmarks
+        return FaceROI.to_frame(landmarks, box, frame_shape)
+    
+    def detect_keyframe(self, frame):
+        """Full FaceMesh landmarks of a BGR frame (keyframes of --track)"""
+        image = frame if self.roi is not None else self.prepare_frame(frame)
+        return self.full_frame_landmarks(*self.face_mesh_output(image), frame.shape)
+    
+    def prepare_frame(self, frame):
+        """BGR frame -> RGB FaceMesh input, downscaled to the profile's max_width"""
+        max_width = self.profile["max_width"]
+        if max_width is not None and frame.shape[1] > max_width:
+            height = round(frame.shape[0] * max_width / frame.shape[1])
+            frame = cv2.resize(frame, (max_width, height), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    
+    def read_frame(self, cap):
+        """
+        Next frame to process, skipping the frames the profile decimates
+        
+        Returns:
+            (timestamp in milliseconds, BGR frame), or (None, None) at the end
         """
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(rgb_frame)
+        ret, frame = cap.read()
+        if not ret:
+            return None, None
+        timestamp = cap.get(cv2.CAP_PROP_POS_MSEC)
         
+        # grab() skips the decode work that read() would do
+        for _ in range(self.profile["frame_step"] - 1):
+            if not cap.grab():
+                break
+        return timestamp, frame
+    
+    @staticmethod
+    def landmark_array(results):
+        """FaceMesh results -> (478, 3) array, or None if no face detected"""
         if not results.multi_face_landmarks:
             return None
         
-        face_landmarks = results.multi_face_landmarks[0]
+        return landmarks_to_array(results.multi_face_landmarks[0].landmark)
+    
+    def compute_features(self, stream):
+        """
+        Movement-focused features for every face frame of a landmark stream
+        
+        coords mode focuses the model on:
+            - YES: High variance in vertical_y coordinates (nose, forehead, chin)
+            - NO: High variance in horizontal_x coordinates (nose, eyes)
+            - NEUTRAL: Low variance in all coordinates
+        head_pose mode gives pitch/yaw/roll + angular velocity (6 features).
+        
+        Returns:
+            List of numpy arrays of shape (feature_dim,), one per face frame
+        """
+        face_frames = [landmarks for landmarks in stream["frames"] if landmarks is not None]
+        if not face_frames:
+            return []
+        return list(features_from_landmarks(np.array(face_frames), self.feature_mode, stream["frame_shape"]))
+    
+    def extract_frame_range(self, video_path, first_frame=0, end_frame=None):
+        """
+        Raw landmarks for a range of a video
+        
+        Args:
+            video_path: Path to video file
+            first_frame: First frame to process
+            end_frame: Stop before this frame (None = end of video)
+            
+        Returns:
+            Landmark stream: dictionary with
+                frames:      one (478, 3) array per processed frame (every
+                             frame_step-th frame), None where no face
+                timestamps:  frame times in milliseconds
+                frame_shape: (height, width) of the frames
+                fps:         frame rate reported by the container
+            or None if the video can't be opened
+        """
+        cap = cv2.VideoCapture(str(video_path))
+        
+        if not cap.isOpened():
+            return None
+        
+        if first_frame > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, first_frame)
+        if self.roi is not None:
+            self.roi.reset()
+        if self.tracker is not None:
+            self.tracker.reset()
+        if self.gate is not None:
+            self.gate.reset()
         
-        # Extract raw landmark positions
-        vertical_positions = []
-        horizontal_positions = []
+        stream = {
+            "frames": [],
+            "timestamps": [],
+            "frame_shape": (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))),
+            "fps": cap.get(cv2.CAP_PROP_FPS)
+        }
+        try:
+            if self.queue_sizes is None:
+                self._extract_sequential(cap, stream, first_frame, end_frame)
+            else:
+                self._extract_pipelined(cap, stream, first_frame, end_frame)
+        finally:
+            cap.release()
         
-        for idx in self.vertical_landmarks:
-            landmark = face_landmarks.landmark[idx]
-            vertical_positions.append([landmark.x, landmark.y, landmark.z])
+        self.stage_times["frames"] += len(stream["frames"])
+        if self.gate is not None:
+            # Tag the frames that reused the previous frame's landmarks
+            stream["reused"] = list(self.gate.flags)
+            self.stage_times["reused"] += sum(stream["reused"])
+        return stream
+    
+    def _extract_sequential(self, cap, stream, first_frame, end_frame):
+        """Decode, FaceMesh and convert each frame in turn on this thread"""
+        stages = self.stage_times["stages"]
+        frame_step = self.profile["frame_step"]
+        while end_frame is None or first_frame + len(stream["frames"]) * frame_step < end_frame:
+            start = time.perf_counter()
+            timestamp, frame = self.read_frame(cap)
+            if frame is None:
+                break
+            read = time.perf_counter()
+            stream["timestamps"].append(timestamp)
+            image = self.decode_stage(frame)
+            decoded = time.perf_counter()
+            output = self.landmark_stage(image)
+            detected = time.perf_counter()
+            stream["frames"].append(self.convert_stage(output, frame.shape))
+            converted = time.perf_counter()
+            
+            stages["decode"]["busy"] += read - start
+            stages["color"]["busy"] += decoded - read
+            stages["landmarks"]["busy"] += detected - decoded
+            stages["convert"]["busy"] += converted - detected
+            if self.trace is not None:
+                self.trace_frame(start, read, decoded, detected, converted)
+    
+    def _extract_pipelined(self, cap, stream, first_frame, end_frame):
+        """
+        Decode, FaceMesh and convert frames on three threads
         
-        for idx in self.horizontal_landmarks:
-            landmark = face_landmarks.landmark[idx]
-            horizontal_positions.append([landmark.x, landmark.y, landmark.z])
+        A decoder thread fills a bounded frame queue, a landmark thread runs
+        FaceMesh on it and this thread converts the results. OpenCV decoding
+        and MediaPipe inference release the GIL, so decoding the next frames
+        overlaps inference on the current one. Each queue has one producer
+        and one consumer, so frame order (and the result) is the same as the
+        sequential run.
+        """
+        frame_queue_size, landmark_queue_size = self.queue_sizes
+        frame_queue = queue.Queue(maxsize=frame_queue_size)
+        landmark_queue = queue.Queue(maxsize=landmark_queue_size)
+        stop = threading.Event()
+        errors = []
+        stages = self.stage_times["stages"]
         
-        vertical_positions = np.array(vertical_positions)
-        horizontal_positions = np.array(horizontal_positions)
+        frame_step = self.profile["frame_step"]
         
-        # Compute movement-focused features:
-        # Focus on coordinates that change most for each gesture type
+        def decode():
+            frames_read = 0
+            try:
+                while not stop.is_set() and (end_frame is None or first_frame + frames_read * frame_step < end_frame):
+                    start = time.perf_counter()
+                    timestamp, frame = self.read_frame(cap)
+                    if frame is None:
+                        break
+                    read = time.perf_counter()
+                    image = self.decode_stage(frame)
+                    decoded = time.perf_counter()
+                    stages["decode"]["busy"] += read - start
+                    stages["color"]["busy"] += decoded - read
+                    if self.trace is not None:
+                        self.trace_frame(start, read, decoded)
+                    stages["decode"]["blocked"] += _pipeline_put(
+                        frame_queue, (timestamp, frame.shape, image), stop
+                    )
+                    frames_read += 1
+            except Exception as e:
+                errors.append(e)
+            finally:
+                _pipeline_put(frame_queue, _END_OF_STREAM, stop)
         
-        features = []
+        def detect():
+            try:
+                while True:
+                    item, waited = _pipeline_get(frame_queue, stop)
+                    stages["landmarks"]["waiting"] += waited
+                    if item is _END_OF_STREAM:
+                        break
+                    timestamp, frame_shape, image = item
+                    start = time.perf_counter()
+                    output = self.landmark_stage(image)
+                    detected = time.perf_counter()
+                    stages["landmarks"]["busy"] += detected - start
+                    if self.trace is not None:
+                        self.trace.add("landmarks", start, detected)
+                    stages["landmarks"]["blocked"] += _pipeline_put(
+                        landmark_queue, (timestamp, frame_shape, output), stop
+                    )
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                _pipeline_put(landmark_queue, _END_OF_STREAM, stop)
         
-        # Vertical movement features (YES - up/down motion)
-        # Use y-coordinates of vertical landmarks (nose, forehead, chin)
-        # These move up/down when nodding
-        vertical_y = vertical_positions[:, 1]  # y-coordinates
-        features.extend(vertical_y.tolist())  # 3 features: nose_y, forehead_y, chin_y
+        threads = [
+            threading.Thread(target=decode, name="extract-decode", daemon=True),
+            threading.Thread(target=detect, name="extract-landmarks", daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+        
+        try:
+            while True:
+                item, waited = _pipeline_get(landmark_queue, stop)
+                stages["convert"]["waiting"] += waited
+                if item is _END_OF_STREAM:
+                    break
+                timestamp, frame_shape, output = item
+                start = time.perf_counter()
+                stream["timestamps"].append(timestamp)
+                stream["frames"].append(self.convert_stage(output, frame_shape))
+                converted = time.perf_counter()
+                stages["convert"]["busy"] += converted - start
+                if self.trace is not None:
+                    self.trace.add("convert", start, converted)
+        finally:
+            # Unblock both threads on errors and Ctrl-C as well
+            stop.set()
+            for thread in threads:
+                thread.join()
+        
+        if errors:
+            raise errors[0]
+    
+    def extract_split(self, video_path, split_workers, warmup_frames=30):
+        """
+        Raw landmarks for a whole video, split across worker processes
+        
+        Returns:
+            stream: Stitched landmark stream (as extract_frame_range)
+            seams: Warm-up report per seam (see stitch_segments)
+        """
+        frame_count = video_frame_count(video_path)
+        frame_step = self.profile["frame_step"]
+        segments = plan_segments(frame_count, split_workers, warmup_frames, frame_step=frame_step)
+        if len(segments) == 1:
+            return self.extract_frame_range(video_path), []
         
-        # Horizontal movement features (NO - left/right motion)
-        # Use x-coordinates of horizontal landmarks (nose, left eye, right eye)
-        # These move left/right when shaking head
-        horizontal_x = horizontal_positions[:, 0]  # x-coordinates
-        features.extend(horizontal_x.tolist())  # 3 features: nose_x, left_eye_x, right_eye_x
+        jobs = [(video_path, first, end) for first, _, end in segments]
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(len(jobs), initializer=_init_worker, initargs=(self.config,)) as pool:
+            outputs = pool.map(_extract_range_job, jobs, chunksize=1)
         
-        # Add z-coordinates for depth (helps with 3D movement)
-        vertical_z = vertical_positions[:, 2]  # z-coordinates (depth)
-        features.extend(vertical_z.tolist())  # 3 features: nose_z, forehead_z, chin_z
+        results = []
+        for stream, times, events in outputs:
+            results.append(stream)
+            merge_stage_times(self.stage_times, times)
+            if self.trace is not None:
+                self.trace.extend(events)
         
-        # Total: 9 features (3 vertical_y + 3 horizontal_x + 3 vertical_z)
-        # This focuses the model on:
-        # - YES: High variance in vertical_y coordinates
-        # - NO: High variance in horizontal_x coordinates  
-        # - NEUTRAL: Low variance in all coordinates
+        if any(stream is None for stream in results):
+            return None, []
         
-        return np.array(features)
+        # Streams hold every frame_step-th frame: stitch in processed-frame indices
+        stream, seams = stitch_segments([
+            (first // frame_step, start // frame_step, stream)
+            for (first, start, _), stream in zip(segments, results)
+        ])
+        for seam in seams:
+            seam["frame"] *= frame_step
+        return stream, seams
     
-    def process_video(self, video_path, sequence_length=30):
+    def content_hash(self, video_path):
+        """video_content_hash of a video, from content_hashes when known"""
+        content_hash = self.content_hashes.get(str(video_path))
+        if content_hash is None:
+            content_hash = video_content_hash(video_path)
+            self.content_hashes[str(video_path)] = content_hash
+        return content_hash
+    
+    def archive_key(self, content_hash):
+        """
+        Archive entry of a video for this profile and ROI setting
+        
+        FaceMesh with the full profile and without ROI, tracking or batching
+        uses the plain hash. Tracked entries only have current positions for
+        the tracked landmarks; batched entries have 468 landmarks.
+        """
+        parts = [content_hash]
+        if self.feature_mode == "keypoints":
+            parts.append("keypoints")
+        if self.profile_name != DEFAULT_PROFILE:
+            parts.append(self.profile_name)
+        if self.roi is not None:
+            parts.append("roi")
+        if self.tracker is not None:
+            parts.append(f"track{self.tracker.keyframe_interval}")
+        if self.landmarker is not None:
+            parts.append("batched")
+        if self.gate is not None:
+            parts.append(f"gate{self.gate.threshold:g}")
+        return "-".join(parts)
+    
+    def load_landmarks(self, video_path, split_workers=1, warmup_frames=30):
+        """
+        Landmark stream of a video, from the archive when possible
+        
+        Decodes the video (optionally split across workers) unless
+        --from-archive is set and the archive has it; with --archive, newly
+        decoded videos are archived.
+        """
+        archive_key = None
+        if self.archive is not None:
+            archive_key = self.archive_key(self.content_hash(video_path))
+            if self.from_archive and self.archive.contains(archive_key):
+                entry = self.archive.load(archive_key)
+                landmarks = np.asarray(entry["landmarks"], dtype=np.float64)
+                stream = {
+                    "frames": [landmarks[i] if detected else None for i, detected in enumerate(entry["mask"])],
+                    "timestamps": list(entry["timestamps"]),
+                    "frame_shape": tuple(entry["meta"]["frame_shape"]),
+                    "fps": entry["meta"]["fps"]
+                }
+                if "reused" in entry:
+                    stream["reused"] = [bool(flag) for flag in entry["reused"]]
+                return stream
+        
+        if split_workers > 1:
+            stream, seams = self.extract_split(video_path, split_workers, warmup_frames)
+            if seams:
+                self.split_reports[str(video_path)] = seams
+        else:
+            stream = self.extract_frame_range(video_path)
+        
+        if stream is not None and archive_key is not None:
+            self.archive_stream(video_path, archive_key, stream)
+        return stream
+    
+    def archive_stream(self, video_path, archive_key, stream):
+        """Write a freshly extracted landmark stream to the archive"""
+        video_path = Path(video_path)
+        self.archive.write(archive_key, stream["frames"], stream["timestamps"], {
+            "video": str(video_path),
+            "category": video_path.parent.name,
+            "frame_shape": list(stream["frame_shape"]),
+            "fps": stream["fps"],
+            "profile": self.profile_name,
+            "roi": self.roi is not None,
+            "track_interval": self.config["track_interval"],
+            "batched": self.landmarker is not None,
+            "gate_threshold": self.config["gate_threshold"]
+        }, reused=stream.get("reused"))
+    
+    def process_video(self, video_path, sequence_length=30, split_workers=1, warmup_frames=30):
         """
         Process a video and extract landmark sequences
         
         Args:
             video_path: Path to video file
             sequence_length: Number of frames per sequence (default 30, ~1 second at 30fps)
+            split_workers: Split the video into this many frame ranges processed
+                           in parallel (long videos only)
+            warmup_frames: Frames each range starts early for tracking to lock on
             
         Returns:
-            List of numpy arrays, each of shape (sequence_length, 24)
+            (sequences, detection_rate): list of (sequence_length,
+            num_features) windows and the percentage of frames with a face,
+            or None if the video can't be opened
         """
-        cap = cv2.VideoCapture(str(video_path))
+        with self.video_timing(video_path) as times:
+            video_start = time.perf_counter()
+            stream = self.load_landmarks(video_path, split_workers, warmup_frames)
+            
+            if stream is None:
+                print(f"Error opening video: {video_path}")
+                return None
+            
+            result = self.stream_sequences(stream, sequence_length)
+            video_end = time.perf_counter()
+            times["wall"] += video_end - video_start
+            if self.trace is not None:
+                self.trace.add("video", video_start, video_end, category="video",
+                               video=str(video_path), frames=len(stream["frames"]))
+        return result
+    
+    @contextmanager
+    def video_timing(self, video_path):
+        """
+        Collect one video's stage times on their own, then add them to the totals
         
-        if not cap.isOpened():
+        Yields:
+            The video's timing record (self.stage_times until the block ends)
+        """
+        totals, self.stage_times = self.stage_times, new_stage_times()
+        try:
+            yield self.stage_times
+        finally:
+            times, self.stage_times = self.stage_times, totals
+            if times["peak_rss_mb"] is None:
+                times["peak_rss_mb"] = peak_rss_mb()
+            merge_stage_times(totals, times)
+            self.video_times[str(video_path)] = times
+    
+    def trace_frame(self, start, read, decoded, detected=None, converted=None):
+        """Trace spans of one frame's stages (perf_counter times between them)"""
+        self.trace.add("decode", start, read)
+        self.trace.add("color", read, decoded)
+        if detected is not None:
+            self.trace.add("landmarks", decoded, detected)
+            self.trace.add("convert", detected, converted)
+    
+    def drain_trace(self):
+        """Trace events recorded since the last call (empty without --trace)"""
+        return self.trace.drain() if self.trace is not None else []
+    
+    def stream_sequences(self, stream, sequence_length=30):
+        """
+        Sequences of a landmark stream
+        
+        Returns:
+            (sequences, detection rate in percent) like process_video
+        """
+        features_start = time.perf_counter()
+        frame_features = self.compute_features(stream)
+        frames_processed = len(stream["frames"])
+        frames_with_face = len(frame_features)
+        windows_start = time.perf_counter()
+        
+        # Create overlapping sequences for more training data (slide by 10 frames)
+        sequences = assemble_sequences(frame_features, sequence_length)
+        
+        windows_end = time.perf_counter()
+        self.stage_times["stages"]["features"]["busy"] += windows_start - features_start
+        self.stage_times["stages"]["windows"]["busy"] += windows_end - windows_start
+        if self.trace is not None:
+            self.trace.add("features", features_start, windows_start)
+            self.trace.add("windows", windows_start, windows_end, sequences=len(sequences))
+        
+        # Calculate face detection rate
+        detection_rate = (frames_with_face / frames_processed * 100) if frames_processed > 0 else 0
+        
+        return sequences, detection_rate
+    
+    def verify_split(self, video_path, split_workers=4, warmup_frames=30):
+        """
+        Compare a split run of one video against a sequential run
+        
+        Returns:
+            Dictionary with frame counts, per-frame landmark differences and
+            seam reports
+        """
+        print(f"\nVerifying split extraction of {video_path}")
+        start = time.time()
+        sequential = self.extract_frame_range(video_path)
+        sequential_time = time.time() - start
+        
+        start = time.time()
+        split, seams = self.extract_split(video_path, split_workers, warmup_frames)
+        split_time = time.time() - start
+        
+        if sequential is None or split is None:
             print(f"Error opening video: {video_path}")
             return None
         
-        sequences = []
-        current_sequence = []
-        frames_processed = 0
-        frames_with_face = 0
+        pairs = list(zip(sequential["frames"], split["frames"]))
+        mismatches = sum((a is None) != (b is None) for a, b in pairs)
+        differences = np.array([
+            np.max(np.abs(a - b)) for a, b in pairs if a is not None and b is not None
+        ])
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frames_processed += 1
-            landmarks = self.extract_landmarks_from_frame(frame)
+        report = {
+            "frames_sequential": len(sequential["frames"]),
+            "frames_split": len(split["frames"]),
+            "segments": len(seams) + 1,
+            "detection_mismatches": int(mismatches),
+            "max_abs_diff": float(differences.max()) if len(differences) else 0.0,
+            "frames_differing": int(np.sum(differences > 1e-6)),
+            "sequential_seconds": sequential_time,
+            "split_seconds": split_time,
+            "seams": seams
+        }
+        
+        print(f"  Frames:               {report['frames_sequential']} sequential, {report['frames_split']} split "
+              f"({report['segments']} segments)")
+        print(f"  Detection mismatches: {report['detection_mismatches']}")
+        print(f"  Differing frames:     {report['frames_differing']} (max landmark diff {report['max_abs_diff']:.6f})")
+        print(f"  Time:                 {sequential_time:.1f}s sequential, {split_time:.1f}s split")
+        if seams:
+            print_seam_report({str(video_path): seams})
+        return report
+    
+    def list_videos(self, category):
+        """Video files of a category, sorted so runs are reproducible"""
+        category_path = self.video_path / category
+        video_files = []
+        for pattern in VIDEO_EXTENSIONS:
+            video_files.extend(category_path.glob(pattern))
+        
+        # Remove duplicates (Windows is case-insensitive)
+        return sorted(set(video_files))
+    
+    def process_videos(self, video_files, sequence_length=30, workers=1, split_workers=1, warmup_frames=30):
+        """
+        Process many videos, optionally across a process pool
+        
+        Args:
+            video_files: Videos to process
+            sequence_length: Number of frames per sequence
+            workers: Number of worker processes (1 = in this process)
+            split_workers: Split each long video across this many processes
+                           (only when videos are processed one at a time)
+            warmup_frames: Tracking warm-up frames per split segment
             
-            if landmarks is not None:
-                frames_with_face += 1
-                current_sequence.append(landmarks)
-                
-                # Create overlapping sequences for more training data
-                if len(current_sequence) == sequence_length:
-                    sequences.append(np.array(current_sequence))
-                    # Slide window by 10 frames (overlap)
-                    current_sequence = current_sequence[10:]
+        Yields:
+            (video_file, result, error) as each video finishes - in completion
+            order when workers > 1. result is the process_video result; error
+            is a message if the video failed (result is then None)
+        """
+        if self.landmarker is not None:
+            if workers > 1 or split_workers > 1:
+                print("  [NOTE] --workers / --split-workers are ignored with --batched "
+                      "(one process batches across all videos)")
+            yield from self._process_videos_batched(video_files, sequence_length)
+            return
         
-        cap.release()
+        if workers <= 1 or len(video_files) <= 1:
+            for video_file in tqdm(video_files, desc="  videos"):
+                try:
+                    result = self.process_video(video_file, sequence_length, split_workers, warmup_frames)
+                except Exception as e:
+                    yield video_file, None, f"{type(e).__name__}: {e}"
+                    continue
+                yield video_file, result, None if result is not None else "Could not open video"
+            return
         
-        # Handle videos shorter than sequence_length
-        if len(sequences) == 0 and len(current_sequence) > sequence_length // 2:
-            # Pad short sequences by repeating last frame
-            while len(current_sequence) < sequence_length:
-                current_sequence.append(current_sequence[-1])
-            sequences.append(np.array(current_sequence))
+        # Pool workers can't start pools of their own
+        if split_workers > 1:
+            print("  [NOTE] --split-workers is ignored when --workers > 1")
         
-        # Calculate face detection rate
-        detection_rate = (frames_with_face / frames_processed * 100) if frames_processed > 0 else 0
+        workers = min(workers, len(video_files))
         
-        return sequences, detection_rate
+        # spawn: MediaPipe's threads don't survive fork(). A worker that dies
+        # (e.g. out of memory) raises BrokenProcessPool instead of hanging.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(self.config,)) as executor:
+            futures = {
+                executor.submit(_process_video_job, (video_file, sequence_length,
+                                                     self.content_hashes.get(str(video_file)))): video_file
+                for video_file in video_files
+            }
+            try:
+                for future in tqdm(as_completed(futures), total=len(futures),
+                                   desc=f"  videos ({workers} workers)"):
+                    video_file = futures[future]
+                    try:
+                        result, times, events = future.result()
+                        merge_stage_times(self.stage_times, times)
+                        self.video_times[str(video_file)] = times
+                        if self.trace is not None:
+                            self.trace.extend(events)
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        yield video_file, None, f"{type(e).__name__}: {e}"
+                        continue
+                    yield video_file, result, None if result is not None else "Could not open video"
+            except BaseException:
+                # Don't wait for queued videos on Ctrl-C or a broken pool
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
     
-    def extract_all_features(self, sequence_length=30):
+    def _process_videos_batched(self, video_files, sequence_length):
+        """
+        process_videos with the batched landmark engine
+        
+        Archived videos (--from-archive) are read as usual; the rest go
+        through the engine together. If the engine fails, the videos it
+        hadn't finished are retried one at a time, so only the broken one
+        is reported.
+        """
+        archived = []
+        if self.from_archive:
+            archived = [v for v in video_files if self.archive.contains(self.archive_key(self.content_hash(v)))]
+        for video_file in archived:
+            yield video_file, self.process_video(video_file, sequence_length), None
+        
+        remaining = [v for v in video_files if v not in archived]
+        done = set()
+        progress = tqdm(total=len(remaining), desc=f"  videos (batches of {self.landmarker.batch_size})")
+        try:
+            yield from self._batched_results(remaining, sequence_length, progress, done)
+        except Exception:
+            for video_file in [v for v in remaining if v not in done]:
+                try:
+                    yield from self._batched_results([video_file], sequence_length, progress, done)
+                except Exception as e:
+                    yield video_file, None, f"{type(e).__name__}: {e}"
+        finally:
+            progress.close()
+    
+    def _batched_results(self, video_files, sequence_length, progress, done):
+        """Run the engine over videos, yielding process_videos tuples (finished videos go in done)"""
+        start = time.perf_counter()
+        network_time = self.landmarker.inference_time
+        streams = extract_videos(video_files, self.landmarker, self.detect_keyframe,
+                                 frames_per_video=BATCH_FRAMES_PER_VIDEO, read_frame=self.read_frame)
+        for video_file, stream in streams:
+            # Network time is the landmark stage; decoding, cropping,
+            # keyframe FaceMesh and mapping back count as decode. Videos
+            # advance in lockstep, so a video's share is the time since the
+            # previous video finished
+            with self.video_timing(video_file) as times:
+                end = time.perf_counter()
+                network = self.landmarker.inference_time - network_time
+                times["stages"]["landmarks"]["busy"] += network
+                times["stages"]["decode"]["busy"] += end - start - network
+                times["wall"] += end - start
+                if self.trace is not None:
+                    self.trace.add("batched video", start, end, video=str(video_file))
+                
+                result = None
+                if stream is not None:
+                    times["frames"] += len(stream["frames"])
+                    if self.archive is not None:
+                        self.archive_stream(video_file, self.archive_key(self.content_hash(video_file)), stream)
+                    features_start = time.perf_counter()
+                    result = self.stream_sequences(stream, sequence_length)
+                    times["wall"] += time.perf_counter() - features_start
+            done.add(video_file)
+            progress.update(1)
+            
+            if stream is None:
+                yield video_file, None, "Could not open video"
+            else:
+                yield video_file, result, None
+            start = time.perf_counter()
+            network_time = self.landmarker.inference_time
+    
+    def extraction_params(self, sequence_length):
+        """Parameters that determine a video's result (manifest key)"""
+        params = {
+            "feature_mode": self.feature_mode,
+            "sequence_length": sequence_length,
+            "stride": WINDOW_STRIDE
+        }
+        # The full profile keeps the original key, so existing results stay valid
+        if self.profile_name != DEFAULT_PROFILE:
+            params["profile"] = dict(self.profile, name=self.profile_name)
+        if self.roi is not None:
+            params["roi"] = True
+        if self.tracker is not None:
+            params["track_interval"] = self.tracker.keyframe_interval
+        if self.landmarker is not None:
+            params["batched"] = True
+        if self.gate is not None:
+            params["gate_threshold"] = self.gate.threshold
+        return params
+    
+    def extract_all_features(self, sequence_length=30, workers=1, split_workers=1, warmup_frames=30,
+                             full=False, retry_quarantined=False, shard_size=DEFAULT_SHARD_SIZE,
+                             storage_dtype=None):
         """
         Extract features from all videos in the dataset
         
         Args:
             sequence_length: Number of frames per sequence
+            workers: Number of worker processes for parallel extraction
+            split_workers: Processes per long video (see process_video)
+            warmup_frames: Tracking warm-up frames per split segment
+            full: Re-extract every video instead of only new or changed ones
+            retry_quarantined: Also retry videos that failed in earlier runs
+            shard_size: Sequences per dataset shard (see dataset_io.py)
+            storage_dtype: Dtype the sequences are stored as, e.g. "float16"
+                           (None = float64 as computed)
             
         Returns:
-            X: numpy array of shape (num_sequences, sequence_length, 24)
-            y: numpy array of shape (num_sequences,) containing labels
+            ShardedDataset of data/dataset (sequences are written shard by
+            shard, never all held in memory)
         """
-        all_sequences = []
-        all_labels = []
         stats = {
             "extraction_time": None,
             "sequence_length": sequence_length,
+            "feature_mode": self.feature_mode,
+            "extraction_profile": dict(self.profile, name=self.profile_name),
+            "roi": self.roi is not None,
+            "track_interval": self.config["track_interval"],
+            "batch_size": self.config["batch_size"],
+            "gate_threshold": self.config["gate_threshold"],
+            "workers": workers,
             "categories": {}
         }
         
         print("\n" + "="*60)
         print(" "*15 + "FEATURE EXTRACTION")
         print("="*60)
-        print(f"\nSequence length: {sequence_length} frames (~{sequence_length/30:.2f} seconds at 30fps)")
+        frame_step = self.profile["frame_step"]
+        print(f"\nSequence length: {sequence_length} frames "
+              f"(~{sequence_length * frame_step / 30:.2f} seconds at 30fps)")
+        print(f"Extraction profile: {self.profile_name} (max width {self.profile['max_width'] or 'source'}, "
+              f"frame step {frame_step}, refine_landmarks={self.profile['refine_landmarks']})")
         print(f"Feature extraction strategy:")
-        print(f"  - Vertical landmarks (YES): {len(self.vertical_landmarks)} points")
-        print(f"  - Horizontal landmarks (NO): {len(self.horizontal_landmarks)} points")
-        print(f"  - Focus: Movement patterns (vertical for YES, horizontal for NO)")
+        if self.feature_mode == "head_pose":
+            print(f"  - Head pose from {len(POSE_LANDMARKS)} landmarks: {', '.join(POSE_FEATURE_NAMES)}")
+            print(f"  - Focus: Rotation (pitch for YES, yaw for NO)")
+        elif self.feature_mode == "keypoints":
+            print(f"  - Face detector keypoints: {', '.join(KEYPOINT_FEATURE_NAMES)}")
+            print(f"  - Focus: Movement patterns, no FaceMesh")
+        else:
+            print(f"  - Vertical landmarks (YES): {len(self.vertical_landmarks)} points")
+            print(f"  - Horizontal landmarks (NO): {len(self.horizontal_landmarks)} points")
+            print(f"  - Focus: Movement patterns (vertical for YES, horizontal for NO)")
         
         start_time = time.time()
         
+        # Gather all videos first so the worker pool sees the whole dataset
+        category_videos = {}
         for category in self.categories:
-            category_path = self.video_path / category
-            video_files = list(category_path.glob("*.mp4")) + \
-                         list(category_path.glob("*.avi")) + \
-                         list(category_path.glob("*.mov")) + \
-                         list(category_path.glob("*.MOV"))
-            
-            # Remove duplicates (Windows is case-insensitive)
-            video_files = list(set(video_files))
+            video_files = self.list_videos(category)
             
             if len(video_files) == 0:
                 print(f"\n[WARNING] No videos found in {category}/")
                 continue
-            
-            print(f"\n{category.upper()}: Processing {len(video_files)} videos...")
+            category_videos[category] = video_files
+        
+        all_videos = [video_file for video_files in category_videos.values() for video_file in video_files]
+        video_categories = {
+            video_file: category
+            for category, video_files in category_videos.items() for video_file in video_files
+        }
+        
+        # Only new or changed videos need processing; the rest come from the manifest
+        params = self.extraction_params(sequence_length)
+        manifest = ExtractionManifest(self.output_path)
+        removed = manifest.prune(all_videos)
+        pending = all_videos if full else [v for v in all_videos if not manifest.is_up_to_date(v, params)]
+        
+        # Videos that failed before stay out until they change
+        skipped = [] if retry_quarantined else [v for v in pending if manifest.is_quarantined(v)]
+        pending = [v for v in pending if v not in skipped]
+        
+        # Hash each video to process once; the manifest, the archive key and
+        # workers all reuse it
+        self.content_hashes.update({str(v): manifest.content_hash(v) for v in pending})
+        
+        stats["videos_up_to_date"] = len(all_videos) - len(pending) - len(skipped)
+        stats["videos_processed"] = len(pending)
+        stats["videos_removed"] = len(removed)
+        
+        print(f"\n{len(all_videos)} videos: {stats['videos_up_to_date']} up to date, "
+              f"{len(pending)} to process, {len(removed)} removed, {len(skipped)} quarantined")
+        if pending:
+            print(f"Processing {len(pending)} videos"
+                  f"{f' with {workers} workers' if workers > 1 else ''}...")
+        if self.archive is not None:
+            stats["archive"] = {"path": str(self.archive.root), "read": self.from_archive}
+            if self.from_archive:
+                archived = sum(self.archive.contains(self.archive_key(self.content_hash(v))) for v in pending)
+                stats["archive"]["videos_from_archive"] = archived
+                print(f"  {archived} of {len(pending)} videos are in the landmark archive")
+        
+        # Checkpoint every finished video so an interrupted run can resume;
+        # results go to disk right away and are read back below
+        processed = 0
+        failed = {}
+        try:
+            for video_file, result, error in self.process_videos(
+                pending, sequence_length, workers, split_workers, warmup_frames
+            ):
+                if error is not None:
+                    failed[video_file] = error
+                    manifest.add_to_quarantine(video_file, error)
+                    tqdm.write(f"  [QUARANTINED] {video_file}: {error}")
+                else:
+                    processed += 1
+                    manifest.record(video_file, video_categories[video_file], params, *result)
+                manifest.checkpoint()
+        except (KeyboardInterrupt, BrokenProcessPool) as e:
+            manifest.save()
+            reason = "Interrupted" if isinstance(e, KeyboardInterrupt) else "A worker process died"
+            print(f"\n[STOPPED] {reason} - {processed} videos were checkpointed.")
+            print("   Run the script again to resume from where it stopped.")
+            return None
+        manifest.save()
+        
+        quarantined = set(skipped) | set(failed)
+        if quarantined:
+            stats["quarantined"] = {
+                str(v): manifest.quarantine[Path(v).as_posix()]["error"] for v in sorted(quarantined)
+            }
+        
+        # Stream every video's sequences into the dataset shards, in category
+        # and video order; only one video and one shard are in memory at a time
+        dataset_path = self.output_path / DATASET_DIR
+        writer = ShardedDatasetWriter(dataset_path, shard_size, metadata={
+            "sequence_length": sequence_length,
+            "label_map": self.label_map,
+            "feature_mode": self.feature_mode,
+            "extraction_profile": dict(self.profile, name=self.profile_name)
+        }, dtype=storage_dtype)
+        for category, video_files in category_videos.items():
+            print(f"\n{category.upper()}: {len(video_files)} videos")
             sequences_count = 0
             total_detection_rate = 0
+            videos_with_results = 0
             
-            for video_file in tqdm(video_files, desc=f"  {category}"):
-                result = self.process_video(video_file, sequence_length)
-                
-                if result is not None:
-                    sequences, detection_rate = result
-                    total_detection_rate += detection_rate
-                    
-                    if sequences:
-                        all_sequences.extend(sequences)
-                        label = self.label_map[category]
-                        all_labels.extend([label] * len(sequences))
-                        sequences_count += len(sequences)
+            for video_file in video_files:
+                if video_file in quarantined:
+                    continue
+                sequences, detection_rate = manifest.load_result(video_file, params)
+                total_detection_rate += detection_rate
+                videos_with_results += 1
+                writer.append(sequences, self.label_map[category])
+                sequences_count += len(sequences)
             
-            avg_detection_rate = total_detection_rate / len(video_files) if len(video_files) > 0 else 0
+            # Quarantined videos have no detection rate
+            avg_detection_rate = total_detection_rate / videos_with_results if videos_with_results > 0 else 0
             
             stats["categories"][category] = {
                 "videos": len(video_files),
@@ -258,25 +1413,60 @@ class FeatureExtractor:
         
         extraction_time = time.time() - start_time
         stats["extraction_time"] = f"{extraction_time:.2f} seconds"
+        if self.split_reports:
+            stats["split_seams"] = self.split_reports
+            print_seam_report(self.split_reports)
+        if self.stage_times["frames"] > 0:
+            main_rss = peak_rss_mb()
+            if main_rss is not None:
+                self.stage_times["peak_rss_mb"] = max(self.stage_times["peak_rss_mb"] or 0.0, main_rss)
+            stats["stages"] = {
+                "mode": "sequential" if self.queue_sizes is None else "pipelined",
+                "queue_sizes": self.config["queue_sizes"],
+                "frames": self.stage_times["frames"],
+                "seconds": round(self.stage_times["wall"], 3),
+                "fps": round(self.stage_times["frames"] / self.stage_times["wall"], 1),
+                "peak_rss_mb": video_timing_report(self.stage_times)["peak_rss_mb"],
+                "utilization": stage_utilization(self.stage_times)
+            }
+            stats["videos"] = {video: video_timing_report(times) for video, times in self.video_times.items()}
+            print_stage_report(self.stage_times, self.queue_sizes is not None)
+            slowest = sorted(self.video_times.items(), key=lambda item: -item[1]["wall"])[:3]
+            if len(self.video_times) > 1:
+                print("  Slowest videos: " + ", ".join(
+                    f"{Path(video).name} {times['wall']:.1f}s" for video, times in slowest))
+        if self.gate is not None and self.stage_times["frames"] > 0:
+            frames, reused = self.stage_times["frames"], self.stage_times["reused"]
+            stats["motion_gate"] = {
+                "threshold": self.gate.threshold,
+                "max_reuse": self.gate.max_reuse,
+                "frames": frames,
+                "reused_frames": reused,
+                "skip_rate": round(reused / frames, 4)
+            }
+            print(f"\nMotion gate: landmarks reused on {reused} of {frames} frames "
+                  f"({reused / frames * 100:.1f}%, threshold {self.gate.threshold})")
         
-        if len(all_sequences) == 0:
+        if sum(category["sequences"] for category in stats["categories"].values()) == 0:
+            writer.abort()
             print("\n[ERROR] No features extracted!")
             print("   Please check your videos and ensure faces are visible.")
             return None
         
-        # Convert to numpy arrays
-        X = np.array(all_sequences)
-        y = np.array(all_labels)
-        
-        # Save processed data
-        output_file = self.output_path / "training_data.npz"
-        np.savez_compressed(
-            str(output_file),
-            X=X,
-            y=y,
-            sequence_length=sequence_length,
-            label_map=self.label_map
-        )
+        dataset = writer.close()
+        stats["dataset"] = {
+            "path": str(dataset_path),
+            "shards": len(dataset.shards),
+            "shard_size": shard_size,
+            "dtype": dataset.dtype.name,
+            "max_cast_error": dataset.index["max_cast_error"]
+        }
+        
+        if self.trace is not None:
+            trace_file = self.output_path / "extraction_trace.json"
+            spans = self.trace.save(trace_file)
+            stats["trace"] = str(trace_file)
+            print(f"\nTrace: {spans} spans saved to {trace_file} (open in chrome://tracing or ui.perfetto.dev)")
         
         # Save statistics
         stats_file = self.output_path / "extraction_stats.json"
@@ -286,21 +1476,22 @@ class FeatureExtractor:
         print("\n" + "="*60)
         print(" "*17 + "EXTRACTION COMPLETE")
         print("="*60)
-        print(f"\nTotal sequences extracted: {len(X)}")
-        print(f"Sequence shape: {X.shape}")
-        print(f"  - {X.shape[0]} samples")
-        print(f"  - {X.shape[1]} frames per sequence")
-        print(f"  - {X.shape[2]} features per frame")
-        print(f"\nData saved to: {output_file}")
+        print(f"\nTotal sequences extracted: {len(dataset)}")
+        print(f"Sequence shape: {dataset.shape}")
+        print(f"  - {dataset.shape[0]} samples")
+        print(f"  - {dataset.shape[1]} frames per sequence")
+        print(f"  - {dataset.shape[2]} features per frame")
+        print(f"\nData saved to: {dataset_path}/ ({len(dataset.shards)} shards of up to {shard_size} sequences)")
+        if storage_dtype is not None:
+            print(f"Stored as {dataset.dtype.name} (max rounding error {dataset.index['max_cast_error']:.2e})")
         print(f"Statistics saved to: {stats_file}")
         print(f"Extraction time: {extraction_time:.2f} seconds")
         
-        # Display label distribution
-        unique, counts = np.unique(y, return_counts=True)
+        # Display label distribution (from the shard index, no data is read)
         print(f"\nLabel distribution:")
-        for label, count in zip(unique, counts):
+        for label, count in sorted(dataset.label_counts.items()):
             label_name = [k for k, v in self.label_map.items() if v == label][0]
-            percentage = count / len(y) * 100
+            percentage = count / len(dataset) * 100
             print(f"  {label_name.upper():8}: {count:4} samples ({percentage:.1f}%)")
         
         print("\n" + "="*60)
@@ -310,9 +1501,274 @@ class FeatureExtractor:
         print("           This will train the gesture recognition model.")
         print("\n" + "="*60)
         
-        return X, y
+        return dataset
+
+def video_frame_count(video_path):
+    """Frame count reported by the container (0 if the video can't be opened)"""
+    cap = cv2.VideoCapture(str(video_path))
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+    cap.release()
+    return frame_count
+
+def benchmark_extraction(configs, sequence_length=15, workers=1, output_root=Path("data") / "benchmark"):
+    """
+    Extract the dataset once per extractor configuration, measuring speed and accuracy
+    
+    Validation accuracy comes from the classical backend's random forest
+    (classical_backend.py) on the usual 80/20 split - fast, and enough to
+    show whether a configuration throws away information the model needs.
+    
+    Args:
+        configs: Dictionary of name -> FeatureExtractor keyword arguments
+        sequence_length: Frames per sequence
+        workers: Worker processes for each extraction
+        output_root: Each configuration's dataset goes to output_root/<name>
+        
+    Returns:
+        Dictionary of name -> benchmark result (seconds, video / processed
+        frames per second, landmark ms per frame, share of frames with
+        reused landmarks, sequences, val_accuracy)
+    """
+    from sklearn.model_selection import train_test_split
+    from classical_backend import create_estimator, window_features
+    
+    output_root = Path(output_root)
+    output_root.mkdir(parents=True, exist_ok=True)
+    
+    results = {}
+    for name, config in configs.items():
+        extractor = FeatureExtractor(output_path=output_root / name, **config)
+        source_frames = sum(
+            video_frame_count(video_file)
+            for category in extractor.categories for video_file in extractor.list_videos(category)
+        )
+        
+        start = time.perf_counter()
+        data = extractor.extract_all_features(sequence_length, workers, full=True)
+        seconds = time.perf_counter() - start
+        
+        frames = extractor.stage_times["frames"]
+        landmark_seconds = extractor.stage_times["stages"]["landmarks"]["busy"]
+        result = {
+            "seconds": round(seconds, 2),
+            "video_fps": round(source_frames / seconds, 1),
+            "processed_fps": round(frames / seconds, 1),
+            "landmark_ms_per_frame": round(landmark_seconds / frames * 1000, 3) if frames else None,
+            "reused_share": round(extractor.stage_times["reused"] / frames, 4) if frames else None
+        }
+        if data is not None:
+            X, y = data.load()
+            result["sequences"] = len(X)
+            try:
+                X_train, X_val, y_train, y_val = train_test_split(
+                    X, y, test_size=0.2, random_state=42, stratify=y
+                )
+            except ValueError as e:
+                # Too few windows per class (short videos, large frame step)
+                result["error"] = str(e)
+            else:
+                estimator = create_estimator("forest")
+                estimator.fit(window_features(X_train, extractor.feature_mode), y_train)
+                F_val = window_features(X_val, extractor.feature_mode)
+                result["val_accuracy"] = float(np.mean(estimator.predict(F_val) == y_val))
+        results[name] = result
+    return results
+
+def _accuracy_text(result):
+    return f"{result['val_accuracy'] * 100:.1f}%" if "val_accuracy" in result else "n/a"
+
+def benchmark_profiles(profile_names, feature_mode="coords", sequence_length=15, workers=1,
+                       queue_sizes=None, output_root=Path("data") / "profile_benchmark"):
+    """
+    Compare extraction profiles on speed and accuracy (see benchmark_extraction)
+    
+    Args:
+        profile_names: Profiles to compare (keys of EXTRACTION_PROFILES)
+        feature_mode: Feature mode of every dataset
+        sequence_length: Frames per sequence
+        workers: Worker processes for each extraction
+        queue_sizes: Pipeline queue sizes (None = sequential stages)
+        output_root: Each profile's dataset goes to output_root/<profile>
+        
+    Returns:
+        Dictionary of profile name -> benchmark result
+    """
+    configs = {
+        name: {"feature_mode": feature_mode, "queue_sizes": queue_sizes, "profile": name}
+        for name in profile_names
+    }
+    results = benchmark_extraction(configs, sequence_length, workers, output_root)
+    for name, result in results.items():
+        result.update(EXTRACTION_PROFILES[name])
+    
+    print("\n" + "="*60)
+    print(" "*15 + "EXTRACTION PROFILE BENCHMARK")
+    print("="*60)
+    print(f"\n{'Profile':10} {'Width':>6} {'Step':>5} {'Refine':>7} {'Video fps':>10} {'Sequences':>10} {'Val acc':>8}")
+    for name, result in results.items():
+        print(f"{name:10} {str(result['max_width'] or 'source'):>6} {result['frame_step']:>5} "
+              f"{str(result['refine_landmarks']):>7} {result['video_fps']:>10.1f} "
+              f"{result.get('sequences', 0):>10} {_accuracy_text(result):>8}")
+    print("\nVideo fps counts every source frame, including the ones a profile skips.")
+    
+    benchmark_file = Path(output_root) / "benchmark.json"
+    with open(str(benchmark_file), 'w') as f:
+        json.dump({"feature_mode": feature_mode, "sequence_length": sequence_length, "profiles": results}, f, indent=2)
+    print(f"Results saved to: {benchmark_file}")
+    return results
+
+def benchmark_sources(sequence_length=15, workers=1, queue_sizes=None,
+                      output_root=Path("data") / "source_benchmark"):
+    """
+    Compare FaceMesh landmarks with face detector keypoints (keypoint_source.py)
+    
+    Reports the landmark stage's cost per frame and the validation accuracy
+    of each source's own feature set.
+    
+    Returns:
+        Dictionary of source name -> benchmark result
+    """
+    configs = {
+        "facemesh": {"feature_mode": "coords", "queue_sizes": queue_sizes},
+        "facemesh_pose": {"feature_mode": "head_pose", "queue_sizes": queue_sizes},
+        "keypoints": {"feature_mode": "keypoints", "queue_sizes": queue_sizes}
+    }
+    results = benchmark_extraction(configs, sequence_length, workers, output_root)
+    
+    print("\n" + "="*60)
+    print(" "*15 + "LANDMARK SOURCE BENCHMARK")
+    print("="*60)
+    print(f"\n{'Source':14} {'Features':>9} {'ms/frame':>9} {'Video fps':>10} {'Sequences':>10} {'Val acc':>8}")
+    for name, result in results.items():
+        cost = result["landmark_ms_per_frame"]
+        print(f"{name:14} {configs[name]['feature_mode']:>9} {cost if cost is not None else float('nan'):>9.2f} "
+              f"{result['video_fps']:>10.1f} {result.get('sequences', 0):>10} {_accuracy_text(result):>8}")
+    print("\nms/frame is the landmark stage alone (FaceMesh or the face detector).")
+    
+    benchmark_file = Path(output_root) / "benchmark.json"
+    with open(str(benchmark_file), 'w') as f:
+        json.dump({"sequence_length": sequence_length, "sources": results}, f, indent=2)
+    print(f"Results saved to: {benchmark_file}")
+    return results
+
+def benchmark_gate(thresholds, feature_mode="coords", sequence_length=15, workers=1,
+                   queue_sizes=None, output_root=Path("data") / "gate_benchmark"):
+    """
+    Compare motion gate thresholds (frame_gate.py) with no gate
+    
+    Reports the share of frames that reused landmarks, video frames/sec
+    and validation accuracy per threshold.
+    
+    Returns:
+        Dictionary of configuration name -> benchmark result
+    """
+    configs = {"no_gate": {"feature_mode": feature_mode, "queue_sizes": queue_sizes}}
+    for threshold in thresholds:
+        configs[f"gate_{threshold:g}"] = {
+            "feature_mode": feature_mode, "queue_sizes": queue_sizes, "gate_threshold": threshold
+        }
+    results = benchmark_extraction(configs, sequence_length, workers, output_root)
+    
+    print("\n" + "="*60)
+    print(" "*17 + "MOTION GATE BENCHMARK")
+    print("="*60)
+    print(f"\n{'Config':10} {'Reused':>8} {'Video fps':>10} {'Speedup':>8} {'Sequences':>10} {'Val acc':>8}")
+    baseline = results["no_gate"]["video_fps"]
+    for name, result in results.items():
+        reused = result["reused_share"] or 0.0
+        print(f"{name:10} {reused * 100:>7.1f}% {result['video_fps']:>10.1f} "
+              f"{result['video_fps'] / baseline if baseline else 0:>7.2f}x "
+              f"{result.get('sequences', 0):>10} {_accuracy_text(result):>8}")
+    print("\nReused = frames whose landmarks were copied from the last FaceMesh frame.")
+    
+    benchmark_file = Path(output_root) / "benchmark.json"
+    with open(str(benchmark_file), 'w') as f:
+        json.dump({"feature_mode": feature_mode, "sequence_length": sequence_length,
+                   "configs": results}, f, indent=2)
+    print(f"Results saved to: {benchmark_file}")
+    return results
 
 def main():
+    parser = argparse.ArgumentParser(description="Extract gesture features from training videos")
+    parser.add_argument("--feature-mode", choices=FEATURE_MODES, default="coords",
+                        help="coords: 9 landmark coordinates, head_pose: pitch/yaw/roll + velocity, "
+                             "keypoints: 10 features from face detector keypoints (no FaceMesh)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for parallel extraction (0 = one per CPU core)")
+    parser.add_argument("--split-workers", type=int, default=1,
+                        help="Split each long video into this many frame ranges processed in parallel")
+    parser.add_argument("--warmup-frames", type=int, default=30,
+                        help="Frames each split range starts early so tracking can lock on")
+    parser.add_argument("--verify-split", metavar="VIDEO",
+                        help="Compare split and sequential extraction of one video, then exit")
+    parser.add_argument("--archive", action="store_true",
+                        help="Keep all raw landmarks in data/landmarks for later re-derivation")
+    parser.add_argument("--from-archive", action="store_true",
+                        help="Derive features from archived landmarks instead of decoding video")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Overlap decoding, FaceMesh and landmark conversion on separate threads")
+    parser.add_argument("--frame-queue", type=int, default=8,
+                        help="Decoded frames buffered ahead of FaceMesh (with --pipeline)")
+    parser.add_argument("--landmark-queue", type=int, default=32,
+                        help="FaceMesh results buffered ahead of conversion (with --pipeline)")
+    parser.add_argument("--profile", choices=list(EXTRACTION_PROFILES), default=DEFAULT_PROFILE,
+                        help="Speed profile: FaceMesh input width, frame step, refine_landmarks")
+    parser.add_argument("--benchmark-profiles", nargs="*", metavar="PROFILE",
+                        choices=list(EXTRACTION_PROFILES),
+                        help="Extract once per profile (default: all) and compare fps and validation accuracy")
+    parser.add_argument("--roi", action="store_true",
+                        help="Run FaceMesh on a crop around the previous frame's face")
+    parser.add_argument("--track", type=int, default=0, metavar="N",
+                        help="FaceMesh every N frames, optical-flow tracking in between (0 = off)")
+    parser.add_argument("--batched", type=int, default=0, metavar="BATCH_SIZE",
+                        help="Batched face-landmark network on crops from many videos (0 = off)")
+    parser.add_argument("--landmark-model", default=None,
+                        help="face_landmark.tflite for --batched (default: from mediapipe)")
+    parser.add_argument("--gate", type=float, default=0.0, metavar="THRESHOLD",
+                        help="Reuse the previous landmarks while the frame changes less than "
+                             "THRESHOLD gray levels (0 = off, see frame_gate.py)")
+    parser.add_argument("--benchmark-gate", nargs="*", type=float, metavar="THRESHOLD",
+                        help="Extract without and with the motion gate (default thresholds: 1 2 4) "
+                             "and compare skip rate, fps and validation accuracy")
+    parser.add_argument("--benchmark-sources", action="store_true",
+                        help="Compare FaceMesh and face detector keypoints on cost and accuracy")
+    parser.add_argument("--sequence-length", type=int, default=15)
+    parser.add_argument("--full", action="store_true",
+                        help="Re-extract every video instead of only new or changed ones")
+    parser.add_argument("--retry-quarantined", action="store_true",
+                        help="Retry videos that failed in earlier runs")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE,
+                        help="Sequences per dataset shard in data/dataset")
+    parser.add_argument("--trace", action="store_true",
+                        help="Write a Chrome trace of every stage to data/extraction_trace.json")
+    parser.add_argument("--dtype", choices=STORAGE_DTYPES, default=None,
+                        help="Store sequences as this dtype, e.g. float16 for a quarter of the size")
+    args = parser.parse_args()
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+    archive_path = ARCHIVE_ROOT if (args.archive or args.from_archive) else None
+    queue_sizes = (args.frame_queue, args.landmark_queue) if args.pipeline else None
+    
+    if args.benchmark_profiles is not None:
+        benchmark_profiles(
+            args.benchmark_profiles or list(EXTRACTION_PROFILES), args.feature_mode,
+            args.sequence_length, workers, queue_sizes
+        )
+        return
+    
+    if args.benchmark_sources:
+        benchmark_sources(args.sequence_length, workers, queue_sizes)
+        return
+    
+    if args.benchmark_gate is not None:
+        benchmark_gate(args.benchmark_gate or [1.0, 2.0, 4.0], args.feature_mode,
+                       args.sequence_length, workers, queue_sizes)
+        return
+    
+    if args.verify_split:
+        extractor = FeatureExtractor(feature_mode=args.feature_mode, profile=args.profile)
+        extractor.verify_split(args.verify_split, max(args.split_workers, 2), args.warmup_frames)
+        return
+    
     print("\n" + "="*60)
     print(" "*12 + "FEATURE EXTRACTION PIPELINE")
     print(" "*10 + "Gesture Recognition Model Training")
@@ -327,10 +1783,21 @@ def main():
     print("\n" + "-"*60)
     # input("Press Enter to start extraction...")
     
-    extractor = FeatureExtractor()
+    extractor = FeatureExtractor(
+        feature_mode=args.feature_mode,
+        archive_path=archive_path, from_archive=args.from_archive,
+        queue_sizes=queue_sizes, profile=args.profile, roi=args.roi,
+        track_interval=args.track, batch_size=args.batched, landmark_model=args.landmark_model,
+        gate_threshold=args.gate, trace=args.trace
+    )
     # OPTIMIZED FOR FAST + ACCURATE DETECTION: 15 frames = ~0.5 seconds
     # This is the sweet spot: fast enough for Tinder-style apps, long enough to capture full gesture
-    result = extractor.extract_all_features(sequence_length=15)
+    result = extractor.extract_all_features(
+        sequence_length=args.sequence_length, workers=workers,
+        split_workers=args.split_workers, warmup_frames=args.warmup_frames,
+        full=args.full, retry_quarantined=args.retry_quarantined, shard_size=args.shard_size,
+        storage_dtype=args.dtype
+    )
     
     if result is not None:
         print("\nFeature extraction completed successfully!")
@@ -5,9 +5,11 @@ This script trains an LSTM neural network to recognize head gestures.
 
 Usage:
     python 3_train_model.py
+    python 3_train_model.py --model-path models/keypoints   # Separate model folder
 
 What it does:
-    - Loads preprocessed training data
+    - Loads preprocessed training data (data/dataset, see dataset_io.py);
+      windows are read from the memory-mapped shards one batch at a time
     - Splits data into training and validation sets
     - Trains an LSTM neural network
     - Evaluates model performance
@@ -18,6 +20,7 @@ Model Architecture:
     - Batch normalization and dropout for regularization
     - Dense layers for classification
     - Softmax output for 3 classes (YES, NO, NEUTRAL)
+    - Head-pose data (6 features) gets a tiny LSTM(16) → Dense(16) model
 
 Training Features:
     - Early stopping to prevent overfitting
@@ -42,35 +45,101 @@ from pathlib import Path
 import json
 from datetime import datetime
 import time
+import argparse
+
+from model_bundle import clear_current, export_bundle, feature_spec_for_mode
+from model_profile import profile_model, print_profile
+from dataset_io import DATASET_DIR, load_training_data
+
+class EpochThroughput(keras.callbacks.Callback):
+    """Records training samples/sec for every epoch (validation excluded)"""
+    
+    def __init__(self, num_samples):
+        super().__init__()
+        self.num_samples = num_samples
+        self.samples_per_sec = []
+    
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch_start = time.perf_counter()
+    
+    def on_test_begin(self, logs=None):
+        self.train_end = time.perf_counter()
+    
+    def on_epoch_end(self, epoch, logs=None):
+        end = getattr(self, 'train_end', None) or time.perf_counter()
+        self.samples_per_sec.append(self.num_samples / (end - self.epoch_start))
+        self.train_end = None
+
+class WindowBatches(keras.utils.Sequence):
+    """Batches of windows gathered on demand, so X can be a ShardedDataset"""
+    
+    def __init__(self, X, y, indices, batch_size, shuffle=False):
+        """
+        Args:
+            X: Windows - array or ShardedDataset (indexed with arrays)
+            y: Labels of all windows
+            indices: Windows in this split
+            batch_size: Windows per batch
+            shuffle: Reshuffle the windows after every epoch
+        """
+        super().__init__()
+        self.X = X
+        self.y = y
+        self.indices = np.array(indices)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(42)
+        if shuffle:
+            self.rng.shuffle(self.indices)
+    
+    def __len__(self):
+        return int(np.ceil(len(self.indices) / self.batch_size))
+    
+    def __getitem__(self, batch):
+        indices = self.indices[batch * self.batch_size:(batch + 1) * self.batch_size]
+        return np.asarray(self.X[indices], dtype=np.float32), self.y[indices]
+    
+    def on_epoch_end(self):
+        if self.shuffle:
+            self.rng.shuffle(self.indices)
 
 class GestureModelTrainer:
     def __init__(self, data_path="data", model_path="models"):
         self.data_path = Path(data_path)
         self.model_path = Path(model_path)
-        self.model_path.mkdir(exist_ok=True)
+        self.model_path.mkdir(parents=True, exist_ok=True)
         
         self.model = None
         self.history = None
         self.label_names = {0: "YES", 1: "NO", 2: "NEUTRAL"}
+        self.feature_mode = "coords"
+        self.extraction_profile = None
     
     def load_data(self):
-        """Load preprocessed training data"""
-        data_file = self.data_path / "training_data.npz"
+        """
+        Load preprocessed training data
+        
+        Returns:
+            X: Windows - a ShardedDataset read lazily (an array for a
+               training_data.npz from older versions)
+            y: Labels
+        """
+        data = load_training_data(self.data_path, lazy=True)
         
-        if not data_file.exists():
+        if data is None:
             print("❌ ERROR: Training data not found!")
-            print(f"   Looking for: {data_file}")
+            print(f"   Looking for: {self.data_path / DATASET_DIR}")
             print("\n   Please run '2_extract_features.py' first")
             return None, None
         
         print("Loading training data...")
-        data = np.load(str(data_file), allow_pickle=True)
-        
-        X = data['X']
-        y = data['y']
+        X, y, metadata = data
+        self.feature_mode = metadata.get("feature_mode", self.feature_mode)
+        self.extraction_profile = metadata.get("extraction_profile")
         
         print(f"Loaded {len(X)} sequences")
         print(f"  Shape: {X.shape}")
+        print(f"  Feature mode: {self.feature_mode}")
         
         # Display label distribution
         unique, counts = np.unique(y, return_counts=True)
@@ -95,6 +164,9 @@ class GestureModelTrainer:
         Returns:
             Compiled Keras model
         """
+        if self.feature_mode == "head_pose":
+            return self.create_pose_model(input_shape, num_classes)
+        
         model = keras.Sequential([
             keras.layers.Input(shape=input_shape),
             
@@ -131,12 +203,38 @@ class GestureModelTrainer:
         
         return model
     
+    def create_pose_model(self, input_shape, num_classes=3):
+        """
+        Create a tiny LSTM for head-pose features
+        
+        Pitch/yaw angles already separate the gestures, so a single small
+        recurrent layer is enough.
+        
+        Architecture:
+            Input → LSTM(16) → Dense(16) → Output(3)
+        """
+        model = keras.Sequential([
+            keras.layers.Input(shape=input_shape),
+            keras.layers.LSTM(16),
+            keras.layers.Dropout(0.2),
+            keras.layers.Dense(16, activation='relu'),
+            keras.layers.Dense(num_classes, activation='softmax')
+        ], name='HeadPoseGestureModel')
+        
+        model.compile(
+            optimizer=keras.optimizers.Adam(learning_rate=0.002),
+            loss='sparse_categorical_crossentropy',
+            metrics=['accuracy']
+        )
+        
+        return model
+    
     def train(self, X, y, epochs=100, batch_size=16, validation_split=0.2):
         """
         Train the gesture recognition model
         
         Args:
-            X: Training features
+            X: Training features (array or ShardedDataset)
             y: Training labels
             epochs: Maximum number of training epochs
             batch_size: Batch size for training
@@ -146,14 +244,17 @@ class GestureModelTrainer:
         print(" "*20 + "MODEL TRAINING")
         print("="*60)
         
-        # Split data
-        X_train, X_val, y_train, y_val = train_test_split(
-            X, y, test_size=validation_split, random_state=42, stratify=y
+        # Split window indices; batches are gathered from X on demand
+        train_idx, val_idx = train_test_split(
+            np.arange(len(y)), test_size=validation_split, random_state=42, stratify=y
         )
+        y_train, y_val = y[train_idx], y[val_idx]
+        train_batches = WindowBatches(X, y, train_idx, batch_size, shuffle=True)
+        val_batches = WindowBatches(X, y, val_idx, batch_size)
         
         print(f"\nData split:")
-        print(f"  Training samples:   {len(X_train)}")
-        print(f"  Validation samples: {len(X_val)}")
+        print(f"  Training samples:   {len(train_idx)}")
+        print(f"  Validation samples: {len(val_idx)}")
         
         # Create model
         input_shape = (X.shape[1], X.shape[2])
@@ -169,7 +270,9 @@ class GestureModelTrainer:
         self.model.summary()
         
         # Callbacks for training optimization
+        throughput = EpochThroughput(len(train_idx))
         callbacks = [
+            throughput,
             # Stop training if validation loss doesn't improve
             keras.callbacks.EarlyStopping(
                 monitor='val_loss',
@@ -218,10 +321,9 @@ class GestureModelTrainer:
         start_time = time.time()
         
         self.history = self.model.fit(
-            X_train, y_train,
-            validation_data=(X_val, y_val),
+            train_batches,
+            validation_data=val_batches,
             epochs=epochs,
-            batch_size=batch_size,
             callbacks=callbacks,
             class_weight=class_weights,
             verbose=1
@@ -234,8 +336,8 @@ class GestureModelTrainer:
         print(" "*20 + "EVALUATION")
         print("="*60)
         
-        train_loss, train_acc = self.model.evaluate(X_train, y_train, verbose=0)
-        val_loss, val_acc = self.model.evaluate(X_val, y_val, verbose=0)
+        train_loss, train_acc = self.model.evaluate(train_batches, verbose=0)
+        val_loss, val_acc = self.model.evaluate(val_batches, verbose=0)
         
         print(f"\nFinal Results:")
         print(f"  Training accuracy:   {train_acc*100:.2f}%")
@@ -243,7 +345,7 @@ class GestureModelTrainer:
         print(f"  Training time:       {training_time:.1f} seconds")
         
         # Detailed classification metrics
-        y_pred = np.argmax(self.model.predict(X_val, verbose=0), axis=1)
+        y_pred = np.argmax(self.model.predict(val_batches, verbose=0), axis=1)
         
         # Get actual classes present in the data
         unique_classes = np.unique(np.concatenate([y_val, y_pred]))
@@ -282,6 +384,20 @@ class GestureModelTrainer:
         self.model.save(str(model_file))
         print(f"\nModel saved to: {model_file}")
         
+        # Memory-mapped bundle with feature spec for fast, checked loading
+        bundle_hash = None
+        try:
+            bundle_dir = export_bundle(
+                self.model, feature_spec_for_mode(self.feature_mode),
+                self.label_names, self.model_path / "bundles"
+            )
+            bundle_hash = bundle_dir.name
+            print(f"Model bundle saved to: {bundle_dir}")
+        except ValueError as e:
+            # Don't leave the previous model's bundle in place of this one
+            clear_current(self.model_path / "bundles")
+            print(f"Model bundle skipped: {e}")
+        
         # Save training information
         info = {
             "training_date": datetime.now().isoformat(),
@@ -294,11 +410,21 @@ class GestureModelTrainer:
             "batch_size": batch_size,
             "training_time_seconds": training_time,
             "input_shape": list(input_shape),
+            "feature_mode": self.feature_mode,
+            "extraction_profile": self.extraction_profile,
             "num_classes": 3,
             "label_map": self.label_names,
-            "total_parameters": int(self.model.count_params())
+            "total_parameters": int(self.model.count_params()),
+            "bundle": bundle_hash
         }
         
+        # What the model costs to run, next to how well it does
+        print("\nProfiling model performance...")
+        info["performance"] = profile_model(
+            self.model, model_file, input_shape, throughput.samples_per_sec
+        )
+        print_profile(info["performance"])
+        
         info_file = self.model_path / "model_info.json"
         with open(str(info_file), 'w') as f:
             json.dump(info, f, indent=2)
@@ -338,6 +464,13 @@ class GestureModelTrainer:
         plt.close()
 
 def main():
+    parser = argparse.ArgumentParser(description="Train the gesture classifier")
+    parser.add_argument("--data-path", default="data",
+                        help="Folder with the extracted dataset (dataset/ or training_data.npz)")
+    parser.add_argument("--model-path", default="models",
+                        help="Folder for the trained model (e.g. models/keypoints)")
+    args = parser.parse_args()
+    
     print("\n" + "="*60)
     print(" "*15 + "MODEL TRAINING PIPELINE")
     print(" "*10 + "Gesture Recognition Model Training")
@@ -353,7 +486,7 @@ def main():
     print("\n" + "-"*60)
     # input("Press Enter to start training...")
     
-    trainer = GestureModelTrainer()
+    trainer = GestureModelTrainer(data_path=args.data_path, model_path=args.model_path)
     
     # Load data
     X, y = trainer.load_data()
@@ -5,6 +5,11 @@ This script tests your trained model with real-time webcam input.
 
 Usage:
     python 4_test_model.py
+    python 4_test_model.py --early   # Decide from 5+ frames (early_decision.py)
+    python 4_test_model.py --backend classical   # scikit-learn backend
+    python 4_test_model.py --roi     # FaceMesh on the face crop only (face_roi.py)
+    python 4_test_model.py --track 5 # FaceMesh every 5th frame (landmark_tracker.py)
+    python 4_test_model.py --gate 2.0 # Reuse landmarks on still frames (frame_gate.py)
 
 What it does:
     - Loads your trained model
@@ -38,50 +43,108 @@ from pathlib import Path
 import json
 from collections import deque
 import time
+import argparse
+
+from head_pose import HeadPoseFeatures, POSE_LANDMARKS
+from model_bundle import check_feature_spec, feature_spec_for_mode, load_model_bundle
+from face_roi import FaceROI
+from frame_gate import FrameGate, results_points
+from keypoint_source import DetectorKeypoints
+from gesture_features import face_features, features_from_landmarks
+from landmark_tracker import TRACKED_LANDMARKS, KeyframeTracker, facemesh_detector
 
 class GestureTester:
-    def __init__(self, model_path="models"):
+    def __init__(self, model_path="models", early_decision=False, backend="lstm", roi=False,
+                 track_interval=0, gate_threshold=0.0, feature_mode=None):
         self.model_path = Path(model_path)
         
-        # Load trained model
-        model_file = self.model_path / "gesture_classifier.h5"
-        if not model_file.exists():
-            raise FileNotFoundError(
-                f"Model not found: {model_file}\n"
-                "Please train the model first using '3_train_model.py'"
-            )
-        
-        print("Loading model...")
-        self.model = tf.keras.models.load_model(str(model_file))
-        
-        # Load model metadata
-        info_file = self.model_path / "model_info.json"
-        with open(str(info_file), 'r') as f:
-            self.info = json.load(f)
+        # Load model metadata (the classical model carries its own)
+        classical_model = None
+        if backend == "classical":
+            from classical_backend import ClassicalGestureModel
+            print("Loading classical model...")
+            classical_model = ClassicalGestureModel.load(self.model_path / "gesture_classifier_classical.pkl")
+            self.info = classical_model.metadata
+        else:
+            info_file = self.model_path / "model_info.json"
+            with open(str(info_file), 'r') as f:
+                self.info = json.load(f)
         
         self.label_names = {int(k): v for k, v in self.info['label_map'].items()}
         self.sequence_length = self.info['input_shape'][0]
         
+        # Features this script computes (default: the mode the model was trained with)
+        self.feature_mode = feature_mode or self.info.get('feature_mode', 'coords')
+        self.pose_features = HeadPoseFeatures()
+        consumer_spec = feature_spec_for_mode(self.feature_mode)
+        
+        # Load trained model; a model/feature mismatch is caught here rather
+        # than showing up as wrong predictions
+        if classical_model is not None:
+            self.model = classical_model
+            check_feature_spec(feature_spec_for_mode(classical_model.feature_mode), consumer_spec)
+        else:
+            # Memory-mapped bundle of the trained model, if it has one
+            self.model = load_model_bundle(self.model_path, consumer_spec)
+            if self.model is not None:
+                print("Loaded model bundle")
+        if self.model is None:
+            model_file = self.model_path / "gesture_classifier.h5"
+            if not model_file.exists():
+                raise FileNotFoundError(
+                    f"Model not found: {model_file}\n"
+                    "Please train the model first using '3_train_model.py'"
+                )
+            
+            print("Loading model...")
+            self.model = tf.keras.models.load_model(str(model_file))
+            check_feature_spec(feature_spec_for_mode(self.info.get('feature_mode', 'coords')), consumer_spec)
+        
         # Setup MediaPipe Face Mesh
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-        
-        # Key landmarks (must match training)
-        # Focused on movement-specific landmarks:
-        # Vertical landmarks (YES - nodding): 1 (nose), 10 (forehead), 152 (chin)
-        # Horizontal landmarks (NO - shaking): 1 (nose), 33 (left eye), 263 (right eye)
-        self.vertical_landmarks = [1, 10, 152]
-        self.horizontal_landmarks = [1, 33, 263]
-        self.key_landmarks = sorted(list(set(self.vertical_landmarks + self.horizontal_landmarks)))
+        if self.feature_mode == "keypoints":
+            # Model trained on face detector keypoints (keypoint_source.py)
+            self.face_mesh = DetectorKeypoints()
+        else:
+            self.mp_face_mesh = mp.solutions.face_mesh
+            self.face_mesh = self.mp_face_mesh.FaceMesh(
+                max_num_faces=1,
+                refine_landmarks=True,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
+        
+        # Optional face crop (face_roi.py): FaceMesh only sees the area
+        # around the previous frame's face (FaceMesh only)
+        self.face_roi = FaceROI(self.face_mesh) if roi and self.feature_mode != "keypoints" else None
+        
+        # Optional motion gate (frame_gate.py): reuse the last landmarks
+        # while the frame barely changes
+        self.frame_gate = FrameGate(gate_threshold) if gate_threshold > 0 else None
+        self.gated_results = None
+        
+        # Optional keyframe tracker (landmark_tracker.py): FaceMesh every
+        # track_interval frames, optical flow for the feature landmarks between
+        self.tracker = None
+        if track_interval > 1:
+            self.tracker = KeyframeTracker(
+                facemesh_detector(self.face_mesh, self.face_roi),
+                TRACKED_LANDMARKS[self.feature_mode], track_interval
+            )
         
         # Frame buffer for sequences
         self.frame_buffer = deque(maxlen=self.sequence_length)
         
+        # Optional early-decision model: one decision per gesture, from as
+        # few frames as it is confident on
+        self.early_classifier = None
+        self.last_decision = None
+        self.new_decision = False
+        if early_decision:
+            from early_decision import EarlyDecisionClassifier
+            self.early_classifier = EarlyDecisionClassifier(self.model_path / "early")
+            print(f"[OK] Early decision enabled (from {self.early_classifier.min_frames} frames, "
+                  f"threshold {self.early_classifier.threshold:.2f})")
+        
         # Statistics
         self.gesture_counts = {label: 0 for label in self.label_names.values()}
         self.total_predictions = 0
@@ -91,52 +154,58 @@ class GestureTester:
         print(f"  Trained on: {self.info['training_date']}")
         print(f"  Validation accuracy: {self.info['val_accuracy']*100:.2f}%")
         print(f"  Sequence length: {self.sequence_length} frames")
+        print(f"  Feature mode: {self.feature_mode}")
     
     def extract_landmarks(self, frame):
         """Extract facial landmarks and compute movement-focused features (must match training)"""
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(rgb_frame)
+        if self.tracker is not None:
+            return self.tracked_features(frame)
+        
+        if self.frame_gate is not None and self.frame_gate.check(frame):
+            # Barely changed since the last FaceMesh frame: reuse its landmarks
+            results = self.gated_results
+        else:
+            if self.face_roi is not None:
+                results, _ = self.face_roi.process(frame)
+            else:
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                results = self.face_mesh.process(rgb_frame)
+            if self.frame_gate is not None:
+                self.gated_results = results
+                self.frame_gate.update(results_points(results))
         
         if not results.multi_face_landmarks:
             return None
         
-        face_landmarks = results.multi_face_landmarks[0]
-        
-        # Extract raw landmark positions
-        vertical_positions = []
-        horizontal_positions = []
-        
-        for idx in self.vertical_landmarks:
-            landmark = face_landmarks.landmark[idx]
-            vertical_positions.append([landmark.x, landmark.y, landmark.z])
-        
-        for idx in self.horizontal_landmarks:
-            landmark = face_landmarks.landmark[idx]
-            horizontal_positions.append([landmark.x, landmark.y, landmark.z])
-        
-        vertical_positions = np.array(vertical_positions)
-        horizontal_positions = np.array(horizontal_positions)
-        
-        # Compute movement-focused features (matching training):
-        features = []
-        
-        # Vertical movement features (YES - up/down motion)
-        vertical_y = vertical_positions[:, 1]  # y-coordinates
-        features.extend(vertical_y.tolist())  # 3 features
-        
-        # Horizontal movement features (NO - left/right motion)
-        horizontal_x = horizontal_positions[:, 0]  # x-coordinates
-        features.extend(horizontal_x.tolist())  # 3 features
-        
-        # Add z-coordinates for depth
-        vertical_z = vertical_positions[:, 2]  # z-coordinates
-        features.extend(vertical_z.tolist())  # 3 features
-        
-        # Total: 9 features (matching training extraction)
-        return np.array(features)
+        # Same kernel as training (gesture_features.py)
+        return face_features(results.multi_face_landmarks[0], self.feature_mode, frame.shape, self.pose_features)
+    
+    def tracked_features(self, frame):
+        """Same features as extract_landmarks, from the keyframe tracker's landmark array"""
+        if self.frame_gate is not None:
+            landmarks = self.frame_gate.process(frame, self.tracker.process)
+        else:
+            landmarks = self.tracker.process(frame)
+        if landmarks is None:
+            return None
+        if self.feature_mode == "head_pose":
+            return self.pose_features.from_points(landmarks[POSE_LANDMARKS], frame.shape)
+        return features_from_landmarks(landmarks[None], self.feature_mode, frame.shape)[0]
     
     def predict_gesture(self):
         """Predict gesture from frame buffer"""
+        if self.early_classifier is not None:
+            # Early decision: commit as soon as the calibrated confidence
+            # passes the threshold (at the latest on the full window), then
+            # start the buffer over so the next gesture gets its own decision;
+            # the decision stays on screen until then
+            result = self.early_classifier.predict(self.frame_buffer)
+            self.new_decision = result is not None and result[3]
+            if self.new_decision:
+                self.frame_buffer.clear()
+                self.last_decision = result[:3]
+            return self.last_decision or (None, 0.0)
+        
         if len(self.frame_buffer) < self.sequence_length:
             return None, 0.0
         
@@ -343,9 +412,10 @@ class GestureTester:
                         gesture_name = self.label_names[predicted_class]
                         color = gesture_colors.get(predicted_class, (255, 255, 255))
                         
-                        # Update statistics
-                        self.gesture_counts[gesture_name] += 1
-                        self.total_predictions += 1
+                        # Update statistics (early decisions count once per gesture)
+                        if self.early_classifier is None or self.new_decision:
+                            self.gesture_counts[gesture_name] += 1
+                            self.total_predictions += 1
                         
                         # Draw prediction
                         self.draw_prediction_box(frame, gesture_name, confidence, color)
@@ -364,6 +434,11 @@ class GestureTester:
             cv2.putText(frame, f"FPS: {fps:.1f}", (frame.shape[1] - 100, 30),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
             
+            # Tag frames whose landmarks came from the motion gate
+            if self.frame_gate is not None and self.frame_gate.last_reused:
+                cv2.putText(frame, "REUSED", (frame.shape[1] - 100, 55),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 1)
+            
             # Display frame
             cv2.imshow('Gesture Testing - Feet Swipe App', frame)
             
@@ -374,6 +449,7 @@ class GestureTester:
                 break
             elif key == ord('r'):
                 self.frame_buffer.clear()
+                self.last_decision = None
                 print("Buffer reset")
             elif key == ord('s'):
                 self.show_stats = not self.show_stats
@@ -392,6 +468,9 @@ class GestureTester:
             for gesture, count in self.gesture_counts.items():
                 pct = count / self.total_predictions * 100
                 print(f"  {gesture:8}: {count:4} ({pct:.1f}%)")
+        if self.frame_gate is not None:
+            print(f"\nMotion gate: landmarks reused on {self.frame_gate.reused} of "
+                  f"{self.frame_gate.frames} frames ({self.frame_gate.skip_rate * 100:.1f}%)")
         print("\n" + "="*60)
         print("[OK] Testing complete")
 
@@ -401,8 +480,28 @@ def main():
     print(" "*10 + "Gesture Recognition Model Testing")
     print("="*60)
     
+    parser = argparse.ArgumentParser(description="Real-time gesture testing")
+    parser.add_argument("--early", action="store_true",
+                        help="One decision per gesture, from partially filled buffers (train with early_decision.py)")
+    parser.add_argument("--backend", choices=["lstm", "classical"], default="lstm",
+                        help="Model backend (train 'classical' with classical_backend.py)")
+    parser.add_argument("--model-path", default="models",
+                        help="Model folder (e.g. a separately trained keypoints model)")
+    parser.add_argument("--roi", action="store_true",
+                        help="Run FaceMesh on a crop around the previous frame's face")
+    parser.add_argument("--gate", type=float, default=0.0, metavar="THRESHOLD",
+                        help="Reuse the last landmarks while the frame changes less than THRESHOLD "
+                             "gray levels (0 = off, see frame_gate.py)")
+    parser.add_argument("--track", type=int, default=0, metavar="N",
+                        help="FaceMesh every N frames, optical-flow tracking in between (0 = off)")
+    parser.add_argument("--feature-mode", choices=["coords", "head_pose", "keypoints"], default=None,
+                        help="Features to compute (default: the model's); a mismatch is refused")
+    args = parser.parse_args()
+    
     try:
-        tester = GestureTester()
+        tester = GestureTester(model_path=args.model_path, early_decision=args.early, backend=args.backend, roi=args.roi,
+                               track_interval=args.track, gate_threshold=args.gate,
+                               feature_mode=args.feature_mode)
         
         print("\n" + "-"*60)
         print("Starting webcam testing...")
@@ -5,6 +5,8 @@ This script helps you systematically test your model's accuracy.
 
 Usage:
     python 5_accuracy_test.py
+    python 5_accuracy_test.py --roi   # FaceMesh on the face crop only (face_roi.py)
+    python 5_accuracy_test.py --gate 2.0   # Reuse landmarks on still frames (frame_gate.py)
 
 What it does:
     - Tests model with structured accuracy evaluation
@@ -35,11 +37,19 @@ from pathlib import Path
 import json
 from collections import deque
 import time
+import argparse
 import csv
 from datetime import datetime
 
+from head_pose import HeadPoseFeatures
+from model_bundle import feature_spec_for_mode, load_model_bundle
+from face_roi import FaceROI
+from frame_gate import FrameGate, results_points
+from keypoint_source import DetectorKeypoints
+from gesture_features import face_features
+
 class AccuracyTester:
-    def __init__(self, model_path="models"):
+    def __init__(self, model_path="models", roi=False, gate_threshold=0.0):
         self.model_path = Path(model_path)
         
         # Load trained model
@@ -50,9 +60,6 @@ class AccuracyTester:
                 "Please train the model first using '3_train_model.py'"
             )
         
-        print("Loading model...")
-        self.model = tf.keras.models.load_model(str(model_file))
-        
         # Load model metadata
         info_file = self.model_path / "model_info.json"
         with open(str(info_file), 'r') as f:
@@ -60,17 +67,37 @@ class AccuracyTester:
         
         self.label_names = {int(k): v for k, v in self.info['label_map'].items()}
         self.sequence_length = self.info['input_shape'][0]
+        self.feature_mode = self.info.get('feature_mode', 'coords')
+        self.pose_features = HeadPoseFeatures()
+        
+        # Memory-mapped bundle of the trained model if it has one; it is
+        # refused if its feature spec isn't what this script computes
+        print("Loading model...")
+        self.model = load_model_bundle(self.model_path, feature_spec_for_mode(self.feature_mode))
+        if self.model is None:
+            self.model = tf.keras.models.load_model(str(model_file))
         
         # Setup MediaPipe
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        if self.feature_mode == "keypoints":
+            # Model trained on face detector keypoints (keypoint_source.py)
+            self.face_mesh = DetectorKeypoints()
+        else:
+            self.mp_face_mesh = mp.solutions.face_mesh
+            self.face_mesh = self.mp_face_mesh.FaceMesh(
+                max_num_faces=1,
+                refine_landmarks=True,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
         
-        self.key_landmarks = [1, 10, 152, 33, 263, 61, 291, 199]
+        # Optional face crop (face_roi.py): FaceMesh only sees the area
+        # around the previous frame's face (FaceMesh only)
+        self.face_roi = FaceROI(self.face_mesh) if roi and self.feature_mode != "keypoints" else None
+        
+        # Optional motion gate (frame_gate.py): reuse the last landmarks
+        # while the frame barely changes
+        self.frame_gate = FrameGate(gate_threshold) if gate_threshold > 0 else None
+        self.gated_results = None
         
         # Frame buffer
         self.frame_buffer = deque(maxlen=self.sequence_length)
@@ -85,20 +112,23 @@ class AccuracyTester:
     
     def extract_landmarks(self, frame):
         """Extract facial landmarks from a frame"""
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(rgb_frame)
+        if self.frame_gate is not None and self.frame_gate.check(frame):
+            # Barely changed since the last FaceMesh frame: reuse its landmarks
+            results = self.gated_results
+        else:
+            if self.face_roi is not None:
+                results, _ = self.face_roi.process(frame)
+            else:
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                results = self.face_mesh.process(rgb_frame)
+            if self.frame_gate is not None:
+                self.gated_results = results
+                self.frame_gate.update(results_points(results))
         
         if not results.multi_face_landmarks:
             return None
         
-        face_landmarks = results.multi_face_landmarks[0]
-        landmarks = []
-        
-        for idx in self.key_landmarks:
-            landmark = face_landmarks.landmark[idx]
-            landmarks.extend([landmark.x, landmark.y, landmark.z])
-        
-        return np.array(landmarks)
+        return face_features(results.multi_face_landmarks[0], self.feature_mode, frame.shape, self.pose_features)
     
     def predict_gesture(self):
         """Predict gesture from frame buffer"""
@@ -302,6 +332,9 @@ class AccuracyTester:
         print(f"  Correct: {correct}")
         print(f"  Incorrect: {total - correct}")
         print(f"  Accuracy: {accuracy:.2f}%")
+        if self.frame_gate is not None:
+            print(f"  Motion gate: landmarks reused on {self.frame_gate.skip_rate * 100:.1f}% of "
+                  f"{self.frame_gate.frames} frames (threshold {self.frame_gate.threshold})")
         
         # Per-class accuracy
         print(f"\nPer-Class Results:")
@@ -349,8 +382,16 @@ def main():
     print(" "*10 + "Systematic Gesture Recognition Testing")
     print("="*60)
     
+    parser = argparse.ArgumentParser(description="Systematic gesture accuracy testing")
+    parser.add_argument("--roi", action="store_true",
+                        help="Run FaceMesh on a crop around the previous frame's face")
+    parser.add_argument("--gate", type=float, default=0.0, metavar="THRESHOLD",
+                        help="Reuse the last landmarks while the frame changes less than THRESHOLD "
+                             "gray levels (0 = off, see frame_gate.py)")
+    args = parser.parse_args()
+    
     try:
-        tester = AccuracyTester()
+        tester = AccuracyTester(roi=args.roi, gate_threshold=args.gate)
         
         print("\n" + "-"*60)
         input("Press Enter to start accuracy testing...")
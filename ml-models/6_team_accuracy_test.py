@@ -5,6 +5,8 @@ Test model accuracy with multiple team members.
 
 Usage:
     python 6_team_accuracy_test.py
+    python 6_team_accuracy_test.py --roi   # FaceMesh on the face crop only (face_roi.py)
+    python 6_team_accuracy_test.py --gate 2.0   # Reuse landmarks on still frames (frame_gate.py)
 
 What it does:
     - Collects tester information (name, age, etc.)
@@ -28,35 +30,60 @@ from pathlib import Path
 import json
 from collections import deque
 import time
+import argparse
 import csv
 from datetime import datetime
 
+from head_pose import HeadPoseFeatures
+from model_bundle import feature_spec_for_mode, load_model_bundle
+from face_roi import FaceROI
+from frame_gate import FrameGate, results_points
+from keypoint_source import DetectorKeypoints
+from gesture_features import face_features
+
 class TeamAccuracyTester:
-    def __init__(self, model_path="models"):
+    def __init__(self, model_path="models", roi=False, gate_threshold=0.0):
         self.model_path = Path(model_path)
         
-        # Load model
-        model_file = self.model_path / "gesture_classifier.h5"
-        print("Loading model...")
-        self.model = tf.keras.models.load_model(str(model_file))
-        
         info_file = self.model_path / "model_info.json"
         with open(str(info_file), 'r') as f:
             self.info = json.load(f)
         
         self.label_names = {int(k): v for k, v in self.info['label_map'].items()}
         self.sequence_length = self.info['input_shape'][0]
+        self.feature_mode = self.info.get('feature_mode', 'coords')
+        self.pose_features = HeadPoseFeatures()
+        
+        # Load model (memory-mapped bundle of the trained model if it has
+        # one; refused if its feature spec isn't what this script computes)
+        print("Loading model...")
+        self.model = load_model_bundle(self.model_path, feature_spec_for_mode(self.feature_mode))
+        if self.model is None:
+            model_file = self.model_path / "gesture_classifier.h5"
+            self.model = tf.keras.models.load_model(str(model_file))
         
         # MediaPipe setup
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-        
-        self.key_landmarks = [1, 10, 152, 33, 263, 61, 291, 199]
+        if self.feature_mode == "keypoints":
+            # Model trained on face detector keypoints (keypoint_source.py)
+            self.face_mesh = DetectorKeypoints()
+        else:
+            self.mp_face_mesh = mp.solutions.face_mesh
+            self.face_mesh = self.mp_face_mesh.FaceMesh(
+                max_num_faces=1,
+                refine_landmarks=True,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
+        
+        # Optional face crop (face_roi.py): FaceMesh only sees the area
+        # around the previous frame's face (FaceMesh only)
+        self.face_roi = FaceROI(self.face_mesh) if roi and self.feature_mode != "keypoints" else None
+        
+        # Optional motion gate (frame_gate.py): reuse the last landmarks
+        # while the frame barely changes
+        self.frame_gate = FrameGate(gate_threshold) if gate_threshold > 0 else None
+        self.gated_results = None
+        
         self.frame_buffer = deque(maxlen=self.sequence_length)
         
         print(f"✓ Model loaded")
@@ -77,20 +104,23 @@ class TeamAccuracyTester:
     
     def extract_landmarks(self, frame):
         """Extract facial landmarks"""
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(rgb_frame)
+        if self.frame_gate is not None and self.frame_gate.check(frame):
+            # Barely changed since the last FaceMesh frame: reuse its landmarks
+            results = self.gated_results
+        else:
+            if self.face_roi is not None:
+                results, _ = self.face_roi.process(frame)
+            else:
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                results = self.face_mesh.process(rgb_frame)
+            if self.frame_gate is not None:
+                self.gated_results = results
+                self.frame_gate.update(results_points(results))
         
         if not results.multi_face_landmarks:
             return None
         
-        face_landmarks = results.multi_face_landmarks[0]
-        landmarks = []
-        
-        for idx in self.key_landmarks:
-            landmark = face_landmarks.landmark[idx]
-            landmarks.extend([landmark.x, landmark.y, landmark.z])
-        
-        return np.array(landmarks)
+        return face_features(results.multi_face_landmarks[0], self.feature_mode, frame.shape, self.pose_features)
     
     def predict_gesture(self):
         """Predict gesture"""
@@ -229,6 +259,9 @@ class TeamAccuracyTester:
         print(f"  Total tests: {total}")
         print(f"  Correct: {correct}")
         print(f"  Accuracy: {accuracy:.2f}%")
+        if self.frame_gate is not None:
+            print(f"  Motion gate: landmarks reused on {self.frame_gate.skip_rate * 100:.1f}% of "
+                  f"{self.frame_gate.frames} frames (threshold {self.frame_gate.threshold})")
         
         # Per-person results
         print(f"\nPer-Person Results:")
@@ -271,8 +304,16 @@ def main():
     print(" "*12 + "Multi-Person Model Evaluation")
     print("="*60)
     
+    parser = argparse.ArgumentParser(description="Multi-person gesture accuracy testing")
+    parser.add_argument("--roi", action="store_true",
+                        help="Run FaceMesh on a crop around the previous frame's face")
+    parser.add_argument("--gate", type=float, default=0.0, metavar="THRESHOLD",
+                        help="Reuse the last landmarks while the frame changes less than THRESHOLD "
+                             "gray levels (0 = off, see frame_gate.py)")
+    args = parser.parse_args()
+    
     try:
-        tester = TeamAccuracyTester()
+        tester = TeamAccuracyTester(roi=args.roi, gate_threshold=args.gate)
         
         all_results = []
         
@@ -0,0 +1,538 @@
+"""
+BATCHED LANDMARK INFERENCE
+==========================
+Runs MediaPipe's face-landmark network directly on batches of face crops,
+gathered across frames and across videos, for offline extraction.
+
+FaceMesh.process() takes one image per call, so offline extraction never
+gets the throughput of batched CPU inference. This engine skips the
+MediaPipe graph: it loads the face-landmark TFLite model itself, cuts a
+192x192 face crop per frame from each video's tracked box and runs the
+network on a whole batch of crops at once.
+
+Usage:
+    python batched_landmarks.py                    # Agreement + fps vs FaceMesh on videos/
+    python batched_landmarks.py --tune             # Pick the fastest batch size first
+    python batched_landmarks.py --batch-size 32 --streams 8 --frames-per-video 4
+    python 2_extract_features.py --batched 16      # Extract the dataset with the engine
+
+How it works:
+    - Several videos are read in lockstep (--streams); each round takes
+      the next few frames of every video (--frames-per-video)
+    - Each video has a tracked box: a square around its last landmarks,
+      rotated to level the eyes and scaled by 1.5 (MediaPipe's own face
+      landmark crop). All frames of a round are cropped with it
+    - The crops of all videos go through the network together, in batches
+      of --batch-size; the interpreter keeps one input shape, so a short
+      last batch is padded
+    - A video without a box (first frame, face lost) runs full-frame
+      FaceMesh once to find the face; a crop whose face score is too low is
+      retried the same way
+    - Landmarks are mapped back to full-frame normalized coordinates with
+      the inverse crop transform (z scales like x, as in MediaPipe)
+
+The network is the 468-landmark model (no iris points; no feature mode
+uses them), so keyframe landmarks are cut to 468 as well.
+
+Validation:
+    Runs per-frame FaceMesh and the batched engine over the same videos and
+    reports the pixel error of the feature landmarks, disagreement on face
+    presence and the video frames/sec of both paths.
+"""
+
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+
+import cv2
+
+from head_pose import POSE_LANDMARKS
+from model_bundle import COORDS_FEATURE_SPEC
+from gesture_features import landmarks_to_array
+
+NUM_MESH_LANDMARKS = 468
+INPUT_SIZE = 192
+CROP_SCALE = 1.5
+FACE_SCORE_THRESHOLD = 0.5
+
+# Eye corners that set the crop rotation (as in MediaPipe's face landmark graph)
+LEFT_EYE_CORNER, RIGHT_EYE_CORNER = 33, 263
+
+# Landmarks the feature modes read: compared by the agreement check
+FEATURE_LANDMARKS = sorted(set(COORDS_FEATURE_SPEC["landmarks"]) | set(POSE_LANDMARKS))
+
+BATCH_SIZE_CANDIDATES = [1, 2, 4, 8, 16, 32, 64]
+
+def find_face_landmark_model():
+    """
+    Path of the face-landmark TFLite model shipped with mediapipe
+    
+    Returns:
+        Path, or None if this mediapipe install doesn't include it (pass
+        --landmark-model then)
+    """
+    import mediapipe as mp
+    
+    model = Path(mp.__file__).parent / "modules" / "face_landmark" / "face_landmark.tflite"
+    return model if model.exists() else None
+
+def crop_transform(landmarks, frame_shape, scale=CROP_SCALE, input_size=INPUT_SIZE):
+    """
+    Affine transform from frame pixels to the network input crop
+    
+    Args:
+        landmarks: (N, 3) full-frame normalized landmarks of the face
+        frame_shape: (height, width, ...) of the frame
+    
+    Returns:
+        2x3 matrix for cv2.warpAffine: a square around the landmarks,
+        rotated so the eye corners are level and scaled by `scale`
+    """
+    height, width = frame_shape[:2]
+    points = landmarks[:NUM_MESH_LANDMARKS, :2] * (width, height)
+    dx, dy = points[RIGHT_EYE_CORNER] - points[LEFT_EYE_CORNER]
+    angle = np.arctan2(dy, dx)
+    cos, sin = np.cos(angle), np.sin(angle)
+    
+    # Bounding box in face-aligned axes (frame axes rotated by the roll)
+    to_face = np.array([[cos, sin], [-sin, cos]])
+    aligned = points @ to_face.T
+    low, high = aligned.min(axis=0), aligned.max(axis=0)
+    center = ((low + high) / 2) @ to_face
+    side = max(high - low) * scale
+    
+    zoom = input_size / side
+    matrix = np.zeros((2, 3))
+    matrix[:, :2] = zoom * to_face
+    matrix[:, 2] = input_size / 2 - matrix[:, :2] @ center
+    return matrix
+
+def crop_to_frame(points, matrix, frame_shape):
+    """
+    Map network output (crop pixels) to full-frame normalized coordinates
+    
+    Args:
+        points: (N, 3) landmarks in crop pixels, z in the same units
+        matrix: Crop transform from crop_transform()
+        frame_shape: (height, width, ...) of the frame
+    """
+    height, width = frame_shape[:2]
+    inverse = cv2.invertAffineTransform(matrix)
+    zoom = np.sqrt(abs(np.linalg.det(matrix[:, :2])))
+    result = np.empty((len(points), 3))
+    result[:, :2] = (points[:, :2] @ inverse[:, :2].T + inverse[:, 2]) / (width, height)
+    result[:, 2] = points[:, 2] / zoom / width
+    return result
+
+def cut_crop(frame, matrix, input_size=INPUT_SIZE):
+    """BGR frame -> RGB network input crop"""
+    crop = cv2.warpAffine(frame, matrix, (input_size, input_size), flags=cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_CONSTANT)
+    return cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+
+class BatchedFaceLandmarker:
+    """MediaPipe's face-landmark network on batches of 192x192 crops"""
+    
+    def __init__(self, model_path=None, batch_size=16, num_threads=None):
+        """
+        Args:
+            model_path: face_landmark.tflite (default: the one in mediapipe)
+            batch_size: Crops per interpreter call
+            num_threads: Interpreter threads (None = TFLite's default)
+        """
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        
+        model_path = model_path or find_face_landmark_model()
+        if model_path is None:
+            raise FileNotFoundError("face_landmark.tflite not found in the mediapipe package; "
+                                    "pass its path with --landmark-model")
+        self.model_path = Path(model_path)
+        self.batch_size = batch_size
+        self.interpreter = Interpreter(model_path=str(model_path), num_threads=num_threads)
+        
+        input_details = self.interpreter.get_input_details()[0]
+        self.input_index = input_details["index"]
+        self.input_dtype = input_details["dtype"]
+        self.interpreter.resize_tensor_input(self.input_index, [batch_size, INPUT_SIZE, INPUT_SIZE, 3])
+        self.interpreter.allocate_tensors()
+        
+        # Outputs by size: 468 x/y/z landmarks and the face presence logit
+        self.landmarks_index = self.score_index = None
+        for output in self.interpreter.get_output_details():
+            size = int(np.prod(output["shape"][1:]))
+            if size == NUM_MESH_LANDMARKS * 3:
+                self.landmarks_index = output["index"]
+            elif size == 1:
+                self.score_index = output["index"]
+        if self.landmarks_index is None or self.score_index is None:
+            raise ValueError(f"{self.model_path.name} is not the 468-landmark face model")
+        
+        self.batch = np.zeros((batch_size, INPUT_SIZE, INPUT_SIZE, 3), dtype=self.input_dtype)
+        self.calls = 0
+        self.crops = 0
+        self.inference_time = 0.0
+    
+    def infer(self, crops):
+        """
+        Landmarks for any number of RGB crops
+        
+        Args:
+            crops: (num_crops, 192, 192, 3) uint8 RGB
+        
+        Returns:
+            (landmarks, scores): (num_crops, 468, 3) in crop pixels and
+            (num_crops,) face presence probabilities
+        """
+        landmarks = np.empty((len(crops), NUM_MESH_LANDMARKS, 3))
+        scores = np.empty(len(crops))
+        for start in range(0, len(crops), self.batch_size):
+            chunk = crops[start:start + self.batch_size]
+            count = len(chunk)
+            if self.input_dtype == np.uint8:
+                self.batch[:count] = chunk
+            else:
+                # The float model takes RGB in [0, 1]
+                np.multiply(chunk, 1.0 / 255.0, out=self.batch[:count], casting="unsafe")
+            if count < self.batch_size:
+                self.batch[count:] = 0
+            
+            start_time = time.perf_counter()
+            self.interpreter.set_tensor(self.input_index, self.batch)
+            self.interpreter.invoke()
+            self.inference_time += time.perf_counter() - start_time
+            self.calls += 1
+            self.crops += count
+            
+            output = self.interpreter.get_tensor(self.landmarks_index)
+            logits = self.interpreter.get_tensor(self.score_index).reshape(self.batch_size)
+            landmarks[start:start + count] = output.reshape(self.batch_size, NUM_MESH_LANDMARKS, 3)[:count]
+            scores[start:start + count] = 1.0 / (1.0 + np.exp(-logits[:count]))
+        return landmarks, scores
+
+class _VideoStream:
+    """Reading state and landmark stream of one video in the lockstep loop"""
+    
+    def __init__(self, video_path, cap):
+        self.video_path = video_path
+        self.cap = cap
+        self.matrix = None
+        self.done = False
+        self.stream = {
+            "frames": [],
+            "timestamps": [],
+            "frame_shape": (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))),
+            "fps": cap.get(cv2.CAP_PROP_FPS)
+        }
+
+def extract_videos(video_paths, landmarker, detect, streams=None, frames_per_video=4,
+                   read_frame=None, score_threshold=FACE_SCORE_THRESHOLD):
+    """
+    Landmark streams of many videos with batched inference
+    
+    Args:
+        video_paths: Videos to process
+        landmarker: BatchedFaceLandmarker
+        detect: Function BGR frame -> full-frame (N, 3) landmarks or None,
+                used where a video has no tracked box (full-frame FaceMesh)
+        streams: Videos read in lockstep (default: enough to fill a batch)
+        frames_per_video: Frames each video contributes per round
+        read_frame: Function cap -> (timestamp, frame) (default cap.read())
+        score_threshold: Face presence probability below which a crop is
+                         retried on the full frame
+    
+    Yields:
+        (video_path, stream) as each video finishes; stream has the layout
+        of FeatureExtractor.extract_frame_range (None if the video can't be
+        opened)
+    """
+    if streams is None:
+        streams = max(1, -(-landmarker.batch_size // frames_per_video))
+    if read_frame is None:
+        def read_frame(cap):
+            ret, frame = cap.read()
+            return (cap.get(cv2.CAP_PROP_POS_MSEC), frame) if ret else (None, None)
+    
+    def keyframe(video, frame):
+        landmarks = detect(frame)
+        if landmarks is None:
+            video.matrix = None
+            return None
+        landmarks = landmarks[:NUM_MESH_LANDMARKS]
+        video.matrix = crop_transform(landmarks, frame.shape)
+        return landmarks
+    
+    waiting = list(video_paths)
+    active = []
+    while waiting or active:
+        while waiting and len(active) < streams:
+            video_path = waiting.pop(0)
+            cap = cv2.VideoCapture(str(video_path))
+            if not cap.isOpened():
+                yield video_path, None
+                continue
+            active.append(_VideoStream(video_path, cap))
+        
+        # Gather this round's crops; keyframes are resolved right away so
+        # the video's later frames in the round already have a box
+        crops, owners = [], []
+        for video in active:
+            for _ in range(frames_per_video):
+                timestamp, frame = read_frame(video.cap)
+                if frame is None:
+                    video.done = True
+                    break
+                stream = video.stream
+                stream["timestamps"].append(timestamp)
+                if video.matrix is None:
+                    stream["frames"].append(keyframe(video, frame))
+                    continue
+                crops.append(cut_crop(frame, video.matrix))
+                owners.append((video, len(stream["frames"]), frame, video.matrix))
+                stream["frames"].append(None)
+        
+        if crops:
+            landmarks, scores = landmarker.infer(np.stack(crops))
+            for (video, index, frame, matrix), points, score in zip(owners, landmarks, scores):
+                if score >= score_threshold:
+                    frame_landmarks = crop_to_frame(points, matrix, frame.shape)
+                    video.stream["frames"][index] = frame_landmarks
+                    video.matrix = crop_transform(frame_landmarks, frame.shape)
+                else:
+                    # Face left the box: find it again on the full frame
+                    video.stream["frames"][index] = keyframe(video, frame)
+        
+        for video in [video for video in active if video.done]:
+            video.cap.release()
+            active.remove(video)
+            yield video.video_path, video.stream
+
+def _facemesh_detector():
+    """Full-frame FaceMesh as (detect function, FaceMesh) for keyframes and reference runs"""
+    import mediapipe as mp
+    
+    face_mesh = mp.solutions.face_mesh.FaceMesh(
+        max_num_faces=1, refine_landmarks=False,
+        min_detection_confidence=0.5, min_tracking_confidence=0.5
+    )
+    
+    def detect(frame):
+        results = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if not results.multi_face_landmarks:
+            return None
+        return landmarks_to_array(results.multi_face_landmarks[0].landmark)
+    return detect
+
+def per_frame_streams(video_paths):
+    """
+    Reference landmark streams with per-frame FaceMesh (a fresh instance per
+    video, as the extractor tracks each video from its first frame)
+    
+    Returns:
+        ({video_path: frames}, video frames processed, seconds)
+    """
+    streams = {}
+    frame_count = 0
+    start = time.perf_counter()
+    for video_path in video_paths:
+        detect = _facemesh_detector()
+        cap = cv2.VideoCapture(str(video_path))
+        if not cap.isOpened():
+            continue
+        frames = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(detect(frame))
+        cap.release()
+        streams[video_path] = frames
+        frame_count += len(frames)
+    return streams, frame_count, time.perf_counter() - start
+
+def batched_streams(video_paths, landmarker, streams=None, frames_per_video=4):
+    """
+    Landmark streams with the batched engine
+    
+    Returns:
+        ({video_path: frames}, video frames processed, seconds)
+    """
+    detect = _facemesh_detector()
+    results = {}
+    frame_count = 0
+    start = time.perf_counter()
+    for video_path, stream in extract_videos(video_paths, landmarker, detect, streams, frames_per_video):
+        if stream is None:
+            continue
+        results[video_path] = stream["frames"]
+        frame_count += len(stream["frames"])
+    return results, frame_count, time.perf_counter() - start
+
+def landmark_agreement(reference, candidate, frame_shapes):
+    """
+    Pixel error of the feature landmarks between two sets of streams
+    
+    Args:
+        reference, candidate: {video_path: frames} (frames may be None)
+        frame_shapes: {video_path: (height, width)}
+    
+    Returns:
+        Dictionary with mean/p95/max pixel error over frames where both
+        found a face, and the number of frames where only one did
+    """
+    errors = []
+    only_reference = only_candidate = 0
+    for video_path, frames in reference.items():
+        height, width = frame_shapes[video_path]
+        for expected, found in zip(frames, candidate.get(video_path, [])):
+            if expected is None or found is None:
+                only_reference += expected is not None
+                only_candidate += found is not None
+                continue
+            difference = (found[FEATURE_LANDMARKS, :2] - expected[FEATURE_LANDMARKS, :2]) * (width, height)
+            errors.append(np.linalg.norm(difference, axis=1))
+    errors = np.concatenate(errors) if errors else np.zeros(0)
+    return {
+        "compared_frames": len(errors) // len(FEATURE_LANDMARKS),
+        "mean_px": float(errors.mean()) if errors.size else None,
+        "p95_px": float(np.percentile(errors, 95)) if errors.size else None,
+        "max_px": float(errors.max()) if errors.size else None,
+        "face_only_in_facemesh": only_reference,
+        "face_only_in_batched": only_candidate
+    }
+
+def tune_batch_size(video_paths, model_path=None, candidates=BATCH_SIZE_CANDIDATES,
+                    num_threads=None, max_crops=256, repeats=3):
+    """
+    Crops/sec of the network at each batch size, on real face crops
+    
+    Returns:
+        (best batch size, {batch size: crops per second})
+    """
+    detect = _facemesh_detector()
+    crops = []
+    for video_path in video_paths:
+        cap = cv2.VideoCapture(str(video_path))
+        while len(crops) < max_crops:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            landmarks = detect(frame)
+            if landmarks is not None:
+                crops.append(cut_crop(frame, crop_transform(landmarks, frame.shape)))
+        cap.release()
+        if len(crops) >= max_crops:
+            break
+    if not crops:
+        raise ValueError("No face found in the given videos")
+    crops = np.stack(crops)
+    
+    throughput = {}
+    for batch_size in candidates:
+        landmarker = BatchedFaceLandmarker(model_path, batch_size, num_threads)
+        # Whole batches only (crops repeated if needed), so padding doesn't
+        # count against large sizes
+        count = max(batch_size, len(crops) // batch_size * batch_size)
+        sample = np.resize(crops, (count,) + crops.shape[1:])
+        landmarker.infer(sample[:batch_size])  # Warm-up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            landmarker.infer(sample)
+        throughput[batch_size] = repeats * len(sample) / (time.perf_counter() - start)
+    best = max(throughput, key=throughput.get)
+    return best, throughput
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched face-landmark inference: agreement and speed vs FaceMesh")
+    parser.add_argument("videos", nargs="*",
+                        help="Videos to process (default: everything under videos/)")
+    parser.add_argument("--landmark-model", help="face_landmark.tflite (default: from mediapipe)")
+    parser.add_argument("--batch-size", type=int, default=16, help="Crops per interpreter call")
+    parser.add_argument("--streams", type=int, default=None,
+                        help="Videos read in lockstep (default: batch size / frames per video)")
+    parser.add_argument("--frames-per-video", type=int, default=4,
+                        help="Frames each video contributes per round")
+    parser.add_argument("--threads", type=int, default=None, help="Interpreter threads")
+    parser.add_argument("--tune", action="store_true",
+                        help="Measure crops/sec per batch size first and use the fastest")
+    parser.add_argument("--save", metavar="JSON", help="Write the report to this file")
+    args = parser.parse_args()
+    
+    videos = args.videos or sorted(
+        str(path) for path in (Path(__file__).parent / "videos").glob("*/*")
+        if path.suffix.lower() in (".mp4", ".avi", ".mov")
+    )
+    
+    print("\n" + "="*60)
+    print(" "*13 + "BATCHED LANDMARK INFERENCE")
+    print("="*60)
+    print(f"\n{len(videos)} videos")
+    
+    report = {}
+    batch_size = args.batch_size
+    if args.tune:
+        print("\nBatch size tuning (network only):")
+        batch_size, throughput = tune_batch_size(videos, args.landmark_model, num_threads=args.threads)
+        for size, rate in throughput.items():
+            marker = "  <- fastest" if size == batch_size else ""
+            print(f"  batch {size:3}: {rate:8.1f} crops/sec{marker}")
+        report["tuning"] = {str(size): rate for size, rate in throughput.items()}
+    
+    landmarker = BatchedFaceLandmarker(args.landmark_model, batch_size, args.threads)
+    print(f"\nModel: {landmarker.model_path}")
+    print(f"Batch size {batch_size}, frames per video {args.frames_per_video}")
+    
+    print("\nPer-frame FaceMesh...")
+    reference, reference_frames, reference_time = per_frame_streams(videos)
+    print("Batched engine...")
+    batched, batched_frames, batched_time = batched_streams(
+        videos, landmarker, args.streams, args.frames_per_video
+    )
+    
+    frame_shapes = {}
+    for video_path in reference:
+        cap = cv2.VideoCapture(str(video_path))
+        frame_shapes[video_path] = (cap.get(cv2.CAP_PROP_FRAME_HEIGHT), cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        cap.release()
+    agreement = landmark_agreement(reference, batched, frame_shapes)
+    
+    reference_fps = reference_frames / reference_time if reference_time > 0 else 0.0
+    batched_fps = batched_frames / batched_time if batched_time > 0 else 0.0
+    report.update({
+        "batch_size": batch_size,
+        "frames_per_video": args.frames_per_video,
+        "per_frame": {"frames": reference_frames, "seconds": reference_time, "fps": reference_fps},
+        "batched": {
+            "frames": batched_frames, "seconds": batched_time, "fps": batched_fps,
+            "network_calls": landmarker.calls, "crops": landmarker.crops,
+            "network_seconds": landmarker.inference_time
+        },
+        "speedup": batched_fps / reference_fps if reference_fps > 0 else None,
+        "agreement": agreement
+    })
+    
+    print("\n" + "-"*60)
+    print(f"Per-frame FaceMesh: {reference_frames} frames in {reference_time:.1f}s ({reference_fps:.1f} fps)")
+    print(f"Batched engine:     {batched_frames} frames in {batched_time:.1f}s ({batched_fps:.1f} fps), "
+          f"{landmarker.crops} crops in {landmarker.calls} network calls")
+    if report["speedup"] is not None:
+        print(f"Speedup:            {report['speedup']:.2f}x")
+    if agreement["mean_px"] is not None:
+        print(f"\nFeature landmark agreement over {agreement['compared_frames']} frames:")
+        print(f"  mean {agreement['mean_px']:.2f}px, p95 {agreement['p95_px']:.2f}px, "
+              f"max {agreement['max_px']:.2f}px")
+    print(f"  Face only found by FaceMesh: {agreement['face_only_in_facemesh']} frames, "
+          f"only by the batched engine: {agreement['face_only_in_batched']} frames")
+    
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to: {args.save}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+CLASSICAL-ML GESTURE BACKEND
+============================
+Gradient boosting / random forest on handcrafted window features, as a
+TensorFlow-free alternative to the LSTM in 3_train_model.py.
+
+Usage:
+    python classical_backend.py                       # Train both, keep the best
+    python classical_backend.py --estimator forest    # Train one estimator only
+
+What it does:
+    - Turns each (15, 9) window into a compact feature vector in one
+      vectorized NumPy pass:
+        per channel: variance, range, zero-crossings, dominant frequency,
+                     mean absolute velocity
+        per window:  vertical-to-horizontal energy ratio, total energy
+      The energy ratio compares the channels that move in a nod with the
+      ones that move in a shake, looked up per feature mode
+    - Trains scikit-learn gradient boosting and random forest models on the
+      same train/validation split as 3_train_model.py
+    - Benchmarks accuracy and inference time against the LSTM
+
+Drop-in use:
+    ClassicalGestureModel.predict(X, verbose=0) mirrors Keras' model.predict,
+    so it replaces the LSTM wherever that is called:
+        GESTURE_BACKEND=classical python predict_gesture.py "<sequence>"
+        python 4_test_model.py --backend classical
+
+Output:
+    - models/gesture_classifier_classical.pkl: Trained estimator
+    - models/classical_info.json: Accuracy and latency benchmark
+"""
+
+import json
+import time
+import pickle
+import argparse
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+
+from head_pose import POSE_FEATURE_NAMES
+from keypoint_source import KEYPOINT_FEATURE_NAMES
+from motion_gate import VERTICAL_CHANNELS, HORIZONTAL_CHANNELS
+from dataset_io import DATASET_DIR, load_training_data
+
+CLASSICAL_MODEL_FILE = Path(__file__).parent / "models" / "gesture_classifier_classical.pkl"
+FRAME_RATE = 30
+
+# (vertical, horizontal) channels of each feature mode's column layout
+ENERGY_CHANNELS = {
+    "coords": (VERTICAL_CHANNELS, HORIZONTAL_CHANNELS),
+    "head_pose": ([POSE_FEATURE_NAMES.index("pitch")], [POSE_FEATURE_NAMES.index("yaw")]),
+    "keypoints": (
+        [i for i, name in enumerate(KEYPOINT_FEATURE_NAMES) if name.endswith("_y")],
+        [i for i, name in enumerate(KEYPOINT_FEATURE_NAMES) if name.endswith("_x")]
+    )
+}
+
+def window_features(X, feature_mode="coords", frame_rate=FRAME_RATE):
+    """
+    Handcrafted features for a batch of windows
+    
+    Args:
+        X: Windows of shape (num_windows, sequence_length, num_features)
+        feature_mode: Feature mode of X, selects the energy ratio channels
+    
+    Returns:
+        Array of shape (num_windows, 5 * num_features + 2)
+    """
+    X = np.asarray(X, dtype=np.float32)
+    centered = X - X.mean(axis=1, keepdims=True)
+    
+    variance = centered.var(axis=1)
+    value_range = np.ptp(X, axis=1)
+    zero_crossings = np.count_nonzero(np.diff(np.signbit(centered), axis=1), axis=1)
+    velocity = np.abs(np.diff(X, axis=1)).mean(axis=1)
+    
+    # Dominant non-DC frequency of each channel in Hz
+    spectrum = np.abs(np.fft.rfft(centered, axis=1))
+    dominant_bin = np.argmax(spectrum[:, 1:], axis=1) + 1
+    dominant_frequency = dominant_bin * frame_rate / X.shape[1]
+    
+    vertical_channels, horizontal_channels = ENERGY_CHANNELS[feature_mode]
+    vertical_energy = variance[:, vertical_channels].sum(axis=1)
+    horizontal_energy = variance[:, horizontal_channels].sum(axis=1)
+    energy_ratio = np.log((vertical_energy + 1e-12) / (horizontal_energy + 1e-12))
+    total_energy = np.log(variance.sum(axis=1) + 1e-12)
+    
+    return np.concatenate([
+        variance, value_range, zero_crossings, dominant_frequency, velocity,
+        energy_ratio[:, None], total_energy[:, None]
+    ], axis=1)
+
+def create_estimator(kind):
+    """Create an unfitted scikit-learn estimator ('boosting' or 'forest')"""
+    if kind == 'boosting':
+        from sklearn.ensemble import HistGradientBoostingClassifier
+        return HistGradientBoostingClassifier(
+            max_iter=200, learning_rate=0.1, max_leaf_nodes=15,
+            class_weight='balanced', random_state=42
+        )
+    if kind == 'forest':
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(
+            n_estimators=100, min_samples_leaf=2,
+            class_weight='balanced', n_jobs=1, random_state=42
+        )
+    raise ValueError(f"Unknown estimator: {kind}")
+
+class ClassicalGestureModel:
+    """Feature extraction + fitted estimator with a Keras-like predict()"""
+    
+    def __init__(self, estimator, kind, metadata=None):
+        """
+        Args:
+            estimator: Fitted scikit-learn classifier
+            kind: 'boosting' or 'forest'
+            metadata: What the model was trained on - feature_mode,
+                      label_map (class index -> name), input_shape, classes
+                      (the estimator's classes_), training_date, val_accuracy
+        """
+        self.estimator = estimator
+        self.kind = kind
+        self.metadata = dict(metadata or {})
+        self.metadata.setdefault("feature_mode", "coords")
+        self.metadata.setdefault("label_map", {"0": "YES", "1": "NO", "2": "NEUTRAL"})
+        self.metadata.setdefault("classes", [int(c) for c in estimator.classes_])
+        self.feature_mode = self.metadata["feature_mode"]
+        self.classes = np.asarray(self.metadata["classes"], dtype=int)
+        self.num_classes = len(self.metadata["label_map"])
+    
+    def predict(self, X, verbose=0):
+        """
+        Class probabilities for a batch of windows
+        
+        Args:
+            X: Windows of shape (num_windows, sequence_length, num_features)
+            verbose: Ignored; accepted for Keras compatibility
+        
+        Returns:
+            Probabilities of shape (num_windows, num_classes), one column
+            per label_map class (0 for classes missing from training)
+        """
+        probabilities = np.zeros((len(X), self.num_classes))
+        probabilities[:, self.classes] = self.estimator.predict_proba(window_features(X, self.feature_mode))
+        return probabilities
+    
+    def save(self, path=CLASSICAL_MODEL_FILE):
+        with open(str(path), 'wb') as f:
+            pickle.dump({"kind": self.kind, "estimator": self.estimator, "metadata": self.metadata}, f)
+    
+    @classmethod
+    def load(cls, path=CLASSICAL_MODEL_FILE):
+        """Load a trained estimator (imports scikit-learn, not TensorFlow)"""
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(
+                f"Classical model not found: {path}\n"
+                "Please train it first using 'python classical_backend.py'"
+            )
+        with open(str(path), 'rb') as f:
+            saved = pickle.load(f)
+        if "metadata" not in saved:
+            raise ValueError(
+                f"{path} doesn't record its feature mode and classes\n"
+                "Please retrain it using 'python classical_backend.py'"
+            )
+        return cls(saved["estimator"], saved["kind"], saved.get("metadata"))
+
+def benchmark_predict(model, X_val, y_val, repeats=20):
+    """Accuracy, batch per-window latency and batch-1 latency"""
+    probabilities = model.predict(X_val, verbose=0)
+    accuracy = float(np.mean(np.argmax(probabilities, axis=1) == y_val))
+    
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.predict(X_val, verbose=0)
+    batch_ms = (time.perf_counter() - start) / (repeats * len(X_val)) * 1000
+    
+    single = X_val[:1]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.predict(single, verbose=0)
+    single_ms = (time.perf_counter() - start) / repeats * 1000
+    
+    return {
+        "val_accuracy": accuracy,
+        "batch_ms_per_window": batch_ms,
+        "batch1_ms": single_ms
+    }
+
+def train_classical(data_path="data", model_path="models", estimators=("boosting", "forest")):
+    """Train classical estimators and benchmark them against the LSTM"""
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import classification_report
+    
+    data = load_training_data(data_path)
+    if data is None:
+        print("[ERROR] Training data not found!")
+        print(f"   Looking for: {Path(data_path) / DATASET_DIR}")
+        print("\n   Please run '2_extract_features.py' first")
+        return None
+    
+    X, y, metadata = data
+    X = X.astype(np.float32)
+    label_map = {str(v): k.upper() for k, v in metadata.get("label_map", {"yes": 0, "no": 1, "neutral": 2}).items()}
+    
+    # Same split as 3_train_model.py so accuracies are comparable
+    X_train, X_val, y_train, y_val = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    
+    print("\n" + "="*60)
+    print(" "*14 + "CLASSICAL BACKEND TRAINING")
+    print("="*60)
+    print(f"\nTraining windows:   {len(X_train)}")
+    print(f"Validation windows: {len(X_val)}")
+    
+    feature_mode = metadata.get("feature_mode", "coords")
+    start = time.perf_counter()
+    F_train = window_features(X_train, feature_mode)
+    feature_ms = (time.perf_counter() - start) / len(X_train) * 1000
+    print(f"Feature vector:     {F_train.shape[1]} values ({feature_ms:.4f} ms/window)")
+    
+    results = {}
+    best = None
+    for kind in estimators:
+        start = time.perf_counter()
+        estimator = create_estimator(kind)
+        estimator.fit(F_train, y_train)
+        fit_time = time.perf_counter() - start
+        
+        model = ClassicalGestureModel(estimator, kind, {
+            "feature_mode": feature_mode,
+            "label_map": label_map,
+            "input_shape": list(X.shape[1:]),
+            "classes": [int(c) for c in estimator.classes_]
+        })
+        results[kind] = benchmark_predict(model, X_val, y_val)
+        model.metadata["val_accuracy"] = results[kind]["val_accuracy"]
+        results[kind]["training_time_seconds"] = fit_time
+        
+        print(f"\n  {kind:9}: {results[kind]['val_accuracy']*100:.2f}% val accuracy, "
+              f"{results[kind]['batch_ms_per_window']:.4f} ms/window batched, "
+              f"{results[kind]['batch1_ms']:.3f} ms batch-1")
+        
+        if best is None or results[kind]['val_accuracy'] > results[best.kind]['val_accuracy']:
+            best = model
+    
+    # LSTM reference on the same validation windows
+    lstm = None
+    model_file = Path(model_path) / "gesture_classifier.h5"
+    if model_file.exists():
+        try:
+            import tensorflow as tf
+            lstm_model = tf.keras.models.load_model(str(model_file), compile=False)
+            lstm = benchmark_predict(lstm_model, X_val, y_val, repeats=3)
+        except ImportError:
+            print("\nTensorFlow not installed - using stored LSTM accuracy only")
+    if lstm is None:
+        info_file = Path(model_path) / "model_info.json"
+        if info_file.exists():
+            with open(str(info_file), 'r') as f:
+                lstm = {"val_accuracy": json.load(f)["val_accuracy"]}
+    
+    if lstm is not None:
+        print(f"\n  {'lstm':9}: {lstm['val_accuracy']*100:.2f}% val accuracy", end="")
+        if "batch_ms_per_window" in lstm:
+            print(f", {lstm['batch_ms_per_window']:.4f} ms/window batched, {lstm['batch1_ms']:.3f} ms batch-1")
+        else:
+            print(" (from model_info.json)")
+    
+    y_pred = np.argmax(best.predict(X_val), axis=1)
+    print("\n" + "-"*60)
+    print(f"Classification Report ({best.kind}):")
+    print("-"*60)
+    print(classification_report(
+        y_val, y_pred, labels=sorted(np.unique(y)),
+        target_names=[label_map[str(i)] for i in sorted(np.unique(y))], digits=3
+    ))
+    
+    model_file = Path(model_path) / CLASSICAL_MODEL_FILE.name
+    best.metadata["training_date"] = datetime.now().isoformat()
+    best.save(model_file)
+    
+    info = {
+        "training_date": best.metadata["training_date"],
+        "estimator": best.kind,
+        "feature_mode": best.feature_mode,
+        "input_shape": list(X.shape[1:]),
+        "feature_vector_size": int(F_train.shape[1]),
+        "feature_extraction_ms_per_window": feature_ms,
+        "label_map": label_map,
+        "results": results,
+        "lstm": lstm
+    }
+    info_file = Path(model_path) / "classical_info.json"
+    with open(str(info_file), 'w') as f:
+        json.dump(info, f, indent=2)
+    
+    print(f"Model saved to: {model_file}")
+    print(f"Benchmark saved to: {info_file}")
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the classical-ML gesture backend")
+    parser.add_argument("--estimator", choices=["boosting", "forest", "both"], default="both")
+    args = parser.parse_args()
+    
+    estimators = ("boosting", "forest") if args.estimator == "both" else (args.estimator,)
+    train_classical(estimators=estimators)
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,45 @@
 Convert Keras H5 model to TensorFlow.js format for browser deployment
 Run this script to convert the model for use in the frontend
 
+Usage:
+    python convert_to_tfjs.py                          # float32 layers model
+    python convert_to_tfjs.py --quantize float16       # half-size weights
+    python convert_to_tfjs.py --format graph --quantize uint8 --shard-size-mb 1
+
+Options:
+    --format          layers (default) or graph (converted via SavedModel)
+    --quantize        none (default), float16 or uint8 weight quantization
+    --shard-size-mb   Weight shard size (default 4 MB)
+    --max-deviation   Refuse to deploy if any output probability differs from
+                      the Keras model by more than this (default 0.01)
+    --samples         Training windows used for the check
+    --no-deploy       Convert and validate only
+
+Before deploying, the converted artifact is validated: total download size,
+shard count and the maximum probability deviation from the Keras model on
+a sample of the training windows are reported. The deviation is measured
+on the written model.json and weight shards themselves - layers models are
+loaded back with tensorflowjs, graph models have their dequantized shards
+put back into the GraphDef, which is then run with TensorFlow.
+
 Note: This requires tensorflowjs to be installed. If conversion fails,
 the frontend will automatically fall back to backend Python prediction.
 """
 
 import tensorflow as tf
+import numpy as np
 from pathlib import Path
+import argparse
+import json
+import tempfile
 import shutil
 import os
 import sys
 
+from google.protobuf import json_format
+
+from dataset_io import DATASET_DIR, load_training_data
+
 # Try to import tensorflowjs, handle compatibility issues
 try:
     import tensorflowjs as tfjs
@@ -27,8 +56,142 @@ except Exception as e:
     print("\nNote: The frontend will use backend Python prediction as fallback.")
     sys.exit(1)
 
-def convert_model():
-    """Convert H5 model to TensorFlow.js format and deploy to frontend"""
+# Activations the graph converter folds into _FusedMatMul nodes
+FUSED_ACTIVATIONS = {"Relu", "Relu6", "Elu", "Sigmoid", "Tanh", "LeakyRelu"}
+
+def load_sample_windows(model, num_samples, data_path):
+    """Random sample of training windows for the parity check"""
+    data = load_training_data(data_path, lazy=True)
+    rng = np.random.default_rng(0)
+    
+    if data is not None:
+        X = data[0]
+        indices = rng.choice(len(X), size=min(num_samples, len(X)), replace=False)
+        return X[indices].astype(np.float32)
+    
+    print(f"⚠ {data_path / DATASET_DIR} not found - checking parity on random windows")
+    _, sequence_length, num_features = model.input_shape
+    return rng.uniform(-1.0, 1.0, size=(num_samples, sequence_length, num_features)).astype(np.float32)
+
+def artifact_size_report(output_path):
+    """Total download size and weight shard count of a converted model"""
+    files = [f for f in output_path.iterdir() if f.is_file()]
+    shards = [f for f in files if f.suffix == ".bin"]
+    return {
+        "total_bytes": sum(f.stat().st_size for f in files),
+        "model_json_bytes": (output_path / "model.json").stat().st_size,
+        "weight_bytes": sum(f.stat().st_size for f in shards),
+        "shard_count": len(shards)
+    }
+
+def unfuse_matmuls(graph_def):
+    """
+    Split _FusedMatMul nodes back into MatMul, AddV2 and activation ops
+    
+    The graph converter fuses a MatMul with any following add, including
+    the broadcasting adds inside LSTM cells. TensorFlow.js executes those,
+    but TensorFlow's own _FusedMatMul kernel only accepts a 1-D bias.
+    """
+    nodes = []
+    for node in graph_def.node:
+        if node.op != "_FusedMatMul":
+            nodes.append(node)
+            continue
+        
+        fused_ops = [op.decode() for op in node.attr["fused_ops"].list.s]
+        activations = fused_ops[1:]
+        if fused_ops[0] != "BiasAdd" or len(activations) > 1 or not set(activations) <= FUSED_ACTIVATIONS:
+            raise ValueError(f"Can't execute fused ops {fused_ops} of {node.name}")
+        
+        inputs = [name for name in node.input if not name.startswith("^")]
+        control_inputs = [name for name in node.input if name.startswith("^")]
+        add_name = f"{node.name}/BiasAdd" if activations else node.name
+        
+        matmul = tf.compat.v1.NodeDef(name=f"{node.name}/MatMul", op="MatMul",
+                                      input=inputs[:2] + control_inputs)
+        for key in ("T", "transpose_a", "transpose_b"):
+            matmul.attr[key].CopyFrom(node.attr[key])
+        add = tf.compat.v1.NodeDef(name=add_name, op="AddV2", input=[matmul.name, inputs[2]])
+        add.attr["T"].CopyFrom(node.attr["T"])
+        nodes.extend([matmul, add])
+        
+        if activations:
+            activation = tf.compat.v1.NodeDef(name=node.name, op=activations[0], input=[add_name])
+            activation.attr["T"].CopyFrom(node.attr["T"])
+            if activations[0] == "LeakyRelu":
+                activation.attr["alpha"].f = node.attr["leakyrelu_alpha"].f
+            nodes.append(activation)
+    
+    del graph_def.node[:]
+    graph_def.node.extend(nodes)
+    return graph_def
+
+def load_graph_model(output_path):
+    """
+    Executable version of a converted graph model, built from the artifact
+    
+    The weight shards are read (and dequantized) through the manifest in
+    model.json and written back into the stripped Const nodes of its
+    GraphDef, so what runs is exactly what the browser downloads.
+    
+    Returns:
+        Function mapping a float32 batch of windows to probabilities
+    """
+    with open(output_path / "model.json") as f:
+        artifact = json.load(f)
+    
+    graph_def = json_format.ParseDict(artifact["modelTopology"], tf.compat.v1.GraphDef())
+    weights = tfjs.read_weights.read_weights(artifact["weightsManifest"], str(output_path), flatten=True)
+    values = {weight["name"]: weight["data"] for weight in weights}
+    
+    for node in graph_def.node:
+        if node.op == "Const" and node.name in values:
+            node.attr["value"].tensor.CopyFrom(tf.make_tensor_proto(values[node.name]))
+    unfuse_matmuls(graph_def)
+    
+    imported = tf.compat.v1.wrap_function(
+        lambda: tf.compat.v1.import_graph_def(graph_def, name=""), []
+    )
+    signature = artifact["signature"]
+    predict = imported.prune(
+        [tensor["name"] for tensor in signature["inputs"].values()],
+        [tensor["name"] for tensor in signature["outputs"].values()]
+    )
+    return lambda X: predict(tf.constant(X))[0].numpy()
+
+def max_probability_deviation(model, output_path, model_format, X_sample):
+    """
+    Largest absolute difference between Keras and converted-model probabilities
+    
+    Both formats are executed from the written artifact, so quantization
+    and any graph optimizations applied by the converter are accounted for.
+    """
+    reference = model.predict(X_sample, verbose=0)
+    
+    if model_format == "layers":
+        converted = tfjs.converters.load_keras_model(str(output_path / "model.json"))
+        predictions = converted.predict(X_sample, verbose=0)
+    else:
+        predictions = load_graph_model(output_path)(X_sample)
+    
+    return float(np.max(np.abs(reference - predictions)))
+
+def convert_model(model_format="layers", quantize="none", shard_size_mb=4.0,
+                  max_deviation=0.01, num_samples=256, deploy=True):
+    """
+    Convert H5 model to TensorFlow.js format, validate it and deploy to frontend
+    
+    Args:
+        model_format: "layers" or "graph"
+        quantize: "none", "float16" or "uint8"
+        shard_size_mb: Weight shard size in megabytes
+        max_deviation: Maximum allowed probability deviation from Keras
+        num_samples: Training windows used for the parity check
+        deploy: Copy to frontend/public/models when validation passes
+    
+    Returns:
+        True if the model was converted (and deployed, if requested)
+    """
     script_dir = Path(__file__).parent
     model_path = script_dir / "models" / "gesture_classifier.h5"
     output_path = script_dir / "models" / "tfjs_model"
@@ -43,14 +206,58 @@ def convert_model():
     model = tf.keras.models.load_model(str(model_path))
     
     print(f"Converting to TensorFlow.js format...")
+    print(f"  Format:       {model_format} model")
+    print(f"  Quantization: {quantize}")
+    print(f"  Shard size:   {shard_size_mb} MB")
     print(f"Output directory: {output_path}")
     
+    if output_path.exists():
+        shutil.rmtree(output_path)
+    
+    quantization_dtype_map = None if quantize == "none" else {quantize: True}
+    weight_shard_size_bytes = int(shard_size_mb * 1024 * 1024)
+    
     # Convert to TensorFlow.js format
-    tfjs.converters.save_keras_model(model, str(output_path))
+    if model_format == "graph":
+        with tempfile.TemporaryDirectory() as saved_model_dir:
+            tf.saved_model.save(model, saved_model_dir)
+            tfjs.converters.convert_tf_saved_model(
+                saved_model_dir, str(output_path),
+                quantization_dtype_map=quantization_dtype_map,
+                weight_shard_size_bytes=weight_shard_size_bytes
+            )
+    else:
+        tfjs.converters.save_keras_model(
+            model, str(output_path),
+            quantization_dtype_map=quantization_dtype_map,
+            weight_shard_size_bytes=weight_shard_size_bytes
+        )
     
     print("✅ Model converted successfully!")
     print(f"TensorFlow.js model saved to: {output_path}")
     
+    # Validate the artifact before it goes anywhere near the frontend
+    print(f"\nValidating converted model...")
+    size = artifact_size_report(output_path)
+    X_sample = load_sample_windows(model, num_samples, script_dir / "data")
+    deviation = max_probability_deviation(model, output_path, model_format, X_sample)
+    
+    print(f"  Total download size: {size['total_bytes'] / 1024:.1f} KB "
+          f"(model.json {size['model_json_bytes'] / 1024:.1f} KB + "
+          f"weights {size['weight_bytes'] / 1024:.1f} KB)")
+    print(f"  Weight shards:       {size['shard_count']}")
+    print(f"  Max probability deviation vs Keras: {deviation:.6f} "
+          f"(on {len(X_sample)} windows, limit {max_deviation})")
+    
+    if deviation > max_deviation:
+        print(f"\n❌ Deviation {deviation:.6f} exceeds {max_deviation} - NOT deploying.")
+        print("   Try a milder quantization (e.g. --quantize float16) or raise --max-deviation.")
+        return False
+    
+    if not deploy:
+        print("\n✅ Validation passed (deployment skipped)")
+        return True
+    
     # Copy to frontend/public/models/
     print(f"\nDeploying to frontend...")
     print(f"Target directory: {frontend_public}")
@@ -72,10 +279,32 @@ def convert_model():
     print(f"✅ Model available at: {target_model_path}")
     print(f"✅ Frontend will load from: /models/tfjs_model/model.json")
     print("\nThe model is now ready to use in the browser!")
+    
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the gesture model to TensorFlow.js")
+    parser.add_argument("--format", choices=["layers", "graph"], default="layers")
+    parser.add_argument("--quantize", choices=["none", "float16", "uint8"], default="none")
+    parser.add_argument("--shard-size-mb", type=float, default=4.0)
+    parser.add_argument("--max-deviation", type=float, default=0.01)
+    parser.add_argument("--samples", type=int, default=256)
+    parser.add_argument("--no-deploy", action="store_true")
+    args = parser.parse_args()
+    
+    return convert_model(
+        model_format=args.format,
+        quantize=args.quantize,
+        shard_size_mb=args.shard_size_mb,
+        max_deviation=args.max_deviation,
+        num_samples=args.samples,
+        deploy=not args.no_deploy
+    )
 
 if __name__ == "__main__":
     try:
-        convert_model()
+        if not main():
+            sys.exit(1)
     except ImportError:
         print("❌ tensorflowjs not installed. Install it with:")
         print("   pip install tensorflowjs")
@@ -0,0 +1,358 @@
+"""
+SHARDED TRAINING DATASET
+========================
+Training windows on disk in fixed-size shards, written as they are produced
+and read back lazily.
+
+extract_all_features used to gather every window in one Python list, turn
+it into one array and save training_data.npz at the end: peak memory grew
+with the dataset and doubled during the copy. ShardedDatasetWriter only
+holds the shard being filled; ShardedDataset memory-maps the shards and
+gathers just the windows asked for.
+
+Layout (data/dataset/):
+    - index.json:      Window shape and dtype, total and per-label counts,
+                       dataset metadata (sequence_length, feature_mode,
+                       label_map, extraction_profile) and, per shard, its
+                       files, window count and label counts
+    - X_00000.npy ...: (<= shard_size, sequence_length, num_features) windows
+    - y_00000.npy ...: (<= shard_size,) int64 labels
+
+A dataset is written to dataset.partial/ and renamed when complete, so a
+reader never sees half of one and shards of an older, larger dataset don't
+linger.
+
+Shards are plain .npy files (no compression, no pickled objects), so
+np.load(mmap_mode='r') opens them instantly; all metadata is JSON. Windows
+can be stored as float32 or float16 (--dtype) to halve or quarter the
+size; readers cast batches back to float32, and the largest rounding error
+is recorded in the index.
+
+Usage:
+    python dataset_io.py                                  # Describe data/dataset
+    python dataset_io.py --convert data/training_data.npz --dtype float16
+
+Used by:
+    - 2_extract_features.py (writes data/dataset)
+    - 3_train_model.py (reads batches lazily)
+    - classical_backend.py, early_decision.py, motion_gate.py,
+      streaming_model.py, convert_to_tfjs.py (load_training_data)
+"""
+
+import json
+import shutil
+import argparse
+import numpy as np
+from pathlib import Path
+
+DATASET_DIR = "dataset"
+LEGACY_DATA_FILE = "training_data.npz"
+INDEX_FILE = "index.json"
+INDEX_VERSION = 1
+DEFAULT_SHARD_SIZE = 4096
+STORAGE_DTYPES = ["float64", "float32", "float16"]
+
+def _label_counts(labels):
+    values, counts = np.unique(labels, return_counts=True)
+    return {str(int(value)): int(count) for value, count in zip(values, counts)}
+
+class ShardedDatasetWriter:
+    """Appends windows to fixed-size .npy shards; one shard in memory at a time"""
+    
+    def __init__(self, path, shard_size=DEFAULT_SHARD_SIZE, metadata=None, dtype=None):
+        """
+        Args:
+            path: Dataset folder (e.g. data/dataset), replaced on close()
+            shard_size: Windows per shard
+            metadata: JSON-serializable dataset metadata for the index
+            dtype: Storage dtype of the windows, one of STORAGE_DTYPES
+                   (None = as appended)
+        """
+        self.path = Path(path)
+        self.staging = self.path.with_name(self.path.name + ".partial")
+        self.shard_size = shard_size
+        self.metadata = dict(metadata or {})
+        self.dtype = None if dtype is None else np.dtype(dtype)
+        self.max_cast_error = 0.0
+        self.shards = []
+        self.windows = None
+        self.labels = None
+        self.filled = 0
+        
+        if self.staging.exists():
+            shutil.rmtree(self.staging)
+        self.staging.mkdir(parents=True)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+    
+    def append(self, windows, label):
+        """
+        Add windows that share a label (e.g. one video's sequences)
+        
+        Args:
+            windows: Iterable of (sequence_length, num_features) arrays
+            label: Integer class label
+        """
+        for window in windows:
+            window = np.asarray(window)
+            if self.windows is None:
+                self.windows = np.empty((self.shard_size,) + window.shape, dtype=self.dtype or window.dtype)
+                self.labels = np.empty(self.shard_size, dtype=np.int64)
+            self.windows[self.filled] = window
+            if self.windows.dtype != window.dtype:
+                error = np.max(np.abs(self.windows[self.filled] - window), initial=0.0)
+                if not np.isfinite(error):
+                    raise ValueError(f"Window values don't fit in {self.windows.dtype}")
+                self.max_cast_error = max(self.max_cast_error, float(error))
+            self.labels[self.filled] = label
+            self.filled += 1
+            if self.filled == self.shard_size:
+                self._flush()
+    
+    def _flush(self):
+        if self.filled == 0:
+            return
+        number = len(self.shards)
+        shard = {
+            "X": f"X_{number:05d}.npy",
+            "y": f"y_{number:05d}.npy",
+            "count": self.filled,
+            "label_counts": _label_counts(self.labels[:self.filled])
+        }
+        np.save(str(self.staging / shard["X"]), self.windows[:self.filled])
+        np.save(str(self.staging / shard["y"]), self.labels[:self.filled])
+        self.shards.append(shard)
+        self.filled = 0
+    
+    def close(self):
+        """
+        Write the last shard and the index, then move the dataset into place
+        
+        Returns:
+            ShardedDataset of the written dataset
+        """
+        self._flush()
+        label_counts = {}
+        for shard in self.shards:
+            for label, count in shard["label_counts"].items():
+                label_counts[label] = label_counts.get(label, 0) + count
+        index = {
+            "version": INDEX_VERSION,
+            "total": sum(shard["count"] for shard in self.shards),
+            "window_shape": None if self.windows is None else list(self.windows.shape[1:]),
+            "dtype": None if self.windows is None else self.windows.dtype.str,
+            "max_cast_error": self.max_cast_error,
+            "label_counts": label_counts,
+            "metadata": self.metadata,
+            "shards": self.shards
+        }
+        with open(str(self.staging / INDEX_FILE), 'w') as f:
+            json.dump(index, f, indent=2)
+        
+        if self.path.exists():
+            shutil.rmtree(self.path)
+        self.staging.rename(self.path)
+        self.windows = self.labels = None
+        return ShardedDataset(self.path)
+    
+    def abort(self):
+        """Drop everything written so far (the previous dataset stays)"""
+        shutil.rmtree(self.staging, ignore_errors=True)
+        self.windows = self.labels = None
+
+class ShardedDataset:
+    """Read-only view of a sharded dataset; windows are gathered on demand"""
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(str(self.path / INDEX_FILE), 'r') as f:
+            self.index = json.load(f)
+        if self.index.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported dataset index version in {self.path}")
+        
+        self.metadata = self.index["metadata"]
+        self.shards = self.index["shards"]
+        self.offsets = np.cumsum([0] + [shard["count"] for shard in self.shards])
+        self._windows = [None] * len(self.shards)
+    
+    def __len__(self):
+        return self.index["total"]
+    
+    @property
+    def shape(self):
+        return (len(self),) + tuple(self.index["window_shape"] or ())
+    
+    @property
+    def dtype(self):
+        return np.dtype(self.index["dtype"] or np.float64)
+    
+    @property
+    def label_counts(self):
+        return {int(label): count for label, count in self.index["label_counts"].items()}
+    
+    def shard(self, number):
+        """Windows of one shard, memory-mapped"""
+        if self._windows[number] is None:
+            self._windows[number] = np.load(str(self.path / self.shards[number]["X"]), mmap_mode='r')
+        return self._windows[number]
+    
+    def labels(self):
+        """All labels (small: one integer per window)"""
+        if not self.shards:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.load(str(self.path / shard["y"])) for shard in self.shards])
+    
+    def __getitem__(self, indices):
+        """
+        Windows by position: an int, a slice or an index array (any order)
+        
+        Returns:
+            In-memory array; only the shards holding the windows are read
+        """
+        if isinstance(indices, (int, np.integer)):
+            number = int(np.searchsorted(self.offsets, indices, side='right') - 1)
+            return np.array(self.shard(number)[indices - self.offsets[number]])
+        if isinstance(indices, slice):
+            indices = np.arange(len(self))[indices]
+        
+        indices = np.asarray(indices, dtype=np.int64)
+        windows = np.empty((len(indices),) + self.shape[1:], dtype=self.dtype)
+        numbers = np.searchsorted(self.offsets, indices, side='right') - 1
+        for number in np.unique(numbers):
+            selected = numbers == number
+            windows[selected] = self.shard(number)[indices[selected] - self.offsets[number]]
+        return windows
+    
+    def load(self):
+        """
+        Whole dataset in memory
+        
+        Returns:
+            X: (num_windows, sequence_length, num_features)
+            y: (num_windows,) labels
+        """
+        if not self.shards:
+            return np.zeros(self.shape, dtype=self.dtype), self.labels()
+        return np.concatenate([self.shard(i) for i in range(len(self.shards))]), self.labels()
+
+def dataset_file(data_path="data"):
+    """Where the training data of a data folder lives (index or legacy npz), or None"""
+    index = Path(data_path) / DATASET_DIR / INDEX_FILE
+    if index.exists():
+        return index
+    legacy = Path(data_path) / LEGACY_DATA_FILE
+    return legacy if legacy.exists() else None
+
+def load_training_data(data_path="data", lazy=False):
+    """
+    Training windows of a data folder
+    
+    Reads data/dataset, or data/training_data.npz written by older versions.
+    
+    Args:
+        data_path: Folder 2_extract_features.py wrote to
+        lazy: Return X as a ShardedDataset (windows read on demand) when the
+              data is sharded
+    
+    Returns:
+        (X, y, metadata), or None if there is no training data. metadata
+        holds whichever of sequence_length, feature_mode, label_map and
+        extraction_profile (a dict) were saved
+    """
+    source = dataset_file(data_path)
+    if source is None:
+        return None
+    
+    if source.name == INDEX_FILE:
+        dataset = ShardedDataset(source.parent)
+        if lazy:
+            return dataset, dataset.labels(), dict(dataset.metadata)
+        X, y = dataset.load()
+        return X, y, dict(dataset.metadata)
+    
+    return load_legacy(source)
+
+def load_legacy(npz_file):
+    """
+    Read a training_data.npz written by older versions
+    
+    Returns:
+        (X, y, metadata) like load_training_data
+    """
+    with np.load(str(npz_file), allow_pickle=True) as data:
+        X, y = data['X'], data['y']
+        metadata = {}
+        if 'sequence_length' in data.files:
+            metadata["sequence_length"] = int(data['sequence_length'])
+        if 'feature_mode' in data.files:
+            metadata["feature_mode"] = str(data['feature_mode'])
+        if 'label_map' in data.files:
+            metadata["label_map"] = data['label_map'].item()
+        if 'extraction_profile' in data.files:
+            metadata["extraction_profile"] = json.loads(str(data['extraction_profile']))
+    return X, y, metadata
+
+def convert_legacy(npz_file, output_path, dtype=None, shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Rewrite a training_data.npz as a sharded dataset
+    
+    Args:
+        npz_file: Legacy training_data.npz
+        output_path: Dataset folder to write (e.g. data/dataset)
+        dtype: Storage dtype (None = keep the npz's)
+        shard_size: Windows per shard
+    
+    Returns:
+        ShardedDataset of the written dataset
+    """
+    X, y, metadata = load_legacy(npz_file)
+    with ShardedDatasetWriter(output_path, shard_size, metadata, dtype) as writer:
+        for label, window in zip(y, X):
+            writer.append([window], int(label))
+    return ShardedDataset(output_path)
+
+def describe(dataset):
+    """Print size, storage and label counts of a dataset"""
+    files = [dataset.path / shard[key] for shard in dataset.shards for key in ("X", "y")]
+    size = sum(f.stat().st_size for f in files)
+    print(f"Dataset:      {dataset.path}")
+    print(f"Windows:      {dataset.shape} {dataset.dtype.name}")
+    print(f"Shards:       {len(dataset.shards)} ({size / 1024 / 1024:.2f} MB on disk)")
+    if dataset.index.get("max_cast_error"):
+        print(f"Rounding:     max error {dataset.index['max_cast_error']:.2e} from {dataset.dtype.name} storage")
+    names = {value: name for name, value in dataset.metadata.get("label_map", {}).items()}
+    for label, count in sorted(dataset.label_counts.items()):
+        print(f"  {names.get(label, str(label)).upper():8}: {count} windows")
+
+def main():
+    parser = argparse.ArgumentParser(description="Describe or convert training datasets")
+    parser.add_argument("--data-path", default="data",
+                        help="Data folder (dataset goes to DATA_PATH/dataset)")
+    parser.add_argument("--convert", metavar="NPZ",
+                        help="Convert a legacy training_data.npz to a sharded dataset")
+    parser.add_argument("--dtype", choices=STORAGE_DTYPES, default=None,
+                        help="Storage dtype of the converted windows (default: unchanged)")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE,
+                        help="Windows per shard")
+    args = parser.parse_args()
+    
+    dataset_path = Path(args.data_path) / DATASET_DIR
+    if args.convert:
+        dataset = convert_legacy(args.convert, dataset_path, args.dtype, args.shard_size)
+        print(f"Converted {args.convert} ({Path(args.convert).stat().st_size / 1024 / 1024:.2f} MB)")
+    elif (dataset_path / INDEX_FILE).exists():
+        dataset = ShardedDataset(dataset_path)
+    else:
+        print(f"[ERROR] No dataset in {dataset_path}")
+        return
+    describe(dataset)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""
+EARLY-DECISION GESTURE CLASSIFIER
+=================================
+Anytime gesture classification on partially filled frame buffers.
+
+Usage:
+    python early_decision.py            # Train, calibrate and report
+    python early_decision.py --min-frames 6
+
+What it does:
+    - Trains an LSTM on window PREFIXES (the first k frames of each window,
+      k = min_frames..sequence_length), left-padded and masked
+    - Splits whole windows into train / validation (early stopping) /
+      calibration / test sets
+    - Calibrates confidence per prefix length with temperature scaling on
+      the calibration windows
+    - Simulates the commit rule: commit as soon as the calibrated
+      confidence passes a threshold, otherwise wait for the full window;
+      picks the fastest threshold that keeps full-window accuracy on the
+      calibration windows
+    - Reports accuracy vs time-to-decision on the test windows, which
+      played no part in training, calibration or the threshold choice
+
+Runtime:
+    EarlyDecisionClassifier.predict(frames) accepts 5-15 buffered frames and
+    returns (class, confidence, probabilities, committed). 4_test_model.py
+    uses it with the --early flag: one decision per gesture, after which the
+    buffer starts over.
+
+Output:
+    - models/early/gesture_classifier.h5: Prefix-trained model
+    - models/early/calibration.json: Temperatures and commit threshold
+    - models/early/decision_report.json: Accuracy vs time-to-decision curve
+    - models/early/decision_curve.png: The same curve as a plot
+"""
+
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+
+from dataset_io import DATASET_DIR, load_training_data
+
+EARLY_MODEL_DIR = Path(__file__).parent / "models" / "early"
+FRAME_RATE = 30
+
+def pad_prefix(frames, sequence_length):
+    """
+    Left-pad a (k, num_features) prefix with zeros to the full window length
+    
+    Zero rows are skipped by the model's Masking layer.
+    """
+    frames = np.asarray(frames, dtype=np.float32)
+    padded = np.zeros((sequence_length, frames.shape[-1]), dtype=np.float32)
+    padded[sequence_length - len(frames):] = frames
+    return padded
+
+def make_prefix_dataset(X, y, min_frames):
+    """
+    Expand full windows into all their prefixes
+    
+    Args:
+        X: Windows of shape (num_windows, sequence_length, num_features)
+        y: Labels of shape (num_windows,)
+        min_frames: Shortest prefix to include
+    
+    Returns:
+        X_prefix: (num_windows * num_lengths, sequence_length, num_features)
+        y_prefix: Matching labels
+        lengths: Prefix length of each row
+    """
+    sequence_length = X.shape[1]
+    prefixes, labels, lengths = [], [], []
+    
+    for k in range(min_frames, sequence_length + 1):
+        padded = np.zeros_like(X, dtype=np.float32)
+        padded[:, sequence_length - k:] = X[:, :k]
+        prefixes.append(padded)
+        labels.append(y)
+        lengths.append(np.full(len(y), k))
+    
+    return np.concatenate(prefixes), np.concatenate(labels), np.concatenate(lengths)
+
+def apply_temperature(probabilities, temperature):
+    """Temperature-scale softmax outputs (works on single rows or batches)"""
+    logits = np.log(np.clip(probabilities, 1e-12, 1.0)) / temperature
+    logits -= np.max(logits, axis=-1, keepdims=True)
+    scaled = np.exp(logits)
+    return scaled / np.sum(scaled, axis=-1, keepdims=True)
+
+def fit_temperature(probabilities, labels):
+    """Grid-search the temperature that minimizes negative log-likelihood"""
+    best_temperature, best_nll = 1.0, np.inf
+    for temperature in np.linspace(0.5, 5.0, 91):
+        scaled = apply_temperature(probabilities, temperature)
+        nll = -np.mean(np.log(scaled[np.arange(len(labels)), labels] + 1e-12))
+        if nll < best_nll:
+            best_temperature, best_nll = float(temperature), nll
+    return best_temperature
+
+def simulate_decisions(probs_by_length, y, threshold, min_frames, sequence_length):
+    """
+    Replay the commit rule over held-out windows
+    
+    Args:
+        probs_by_length: {k: calibrated probabilities of shape (num_windows, num_classes)}
+        y: True labels
+        threshold: Commit once calibrated confidence >= threshold
+    
+    Returns:
+        (accuracy, mean frames to decision, fraction committed early)
+    """
+    decided = np.zeros(len(y), dtype=bool)
+    decision_frames = np.full(len(y), sequence_length)
+    predictions = np.argmax(probs_by_length[sequence_length], axis=1)
+    
+    for k in range(min_frames, sequence_length + 1):
+        probs = probs_by_length[k]
+        commit = ~decided & ((np.max(probs, axis=1) >= threshold) | (k == sequence_length))
+        predictions[commit] = np.argmax(probs[commit], axis=1)
+        decision_frames[commit] = k
+        decided |= commit
+    
+    accuracy = float(np.mean(predictions == y))
+    early = float(np.mean(decision_frames < sequence_length))
+    return accuracy, float(np.mean(decision_frames)), early
+
+class EarlyDecisionClassifier:
+    """Calibrated predictions from partially filled frame buffers"""
+    
+    def __init__(self, model_dir=EARLY_MODEL_DIR):
+        import tensorflow as tf
+        
+        model_dir = Path(model_dir)
+        model_file = model_dir / "gesture_classifier.h5"
+        calibration_file = model_dir / "calibration.json"
+        if not model_file.exists() or not calibration_file.exists():
+            raise FileNotFoundError(
+                f"Early-decision model not found in {model_dir}\n"
+                "Please train it first using 'python early_decision.py'"
+            )
+        
+        self.model = tf.keras.models.load_model(str(model_file), compile=False)
+        with open(str(calibration_file), 'r') as f:
+            calibration = json.load(f)
+        
+        self.sequence_length = calibration['sequence_length']
+        self.min_frames = calibration['min_frames']
+        self.threshold = calibration['threshold']
+        self.temperatures = {int(k): v for k, v in calibration['temperatures'].items()}
+    
+    def predict(self, frames):
+        """
+        Predict from the frames buffered so far
+        
+        Args:
+            frames: Sequence of k feature vectors (oldest first)
+        
+        Returns:
+            (predicted_class, confidence, probabilities, committed), or None if
+            fewer than min_frames frames are available. committed is True when
+            confidence passed the threshold or the window is full.
+        """
+        frames = list(frames)[-self.sequence_length:]
+        k = len(frames)
+        if k < self.min_frames:
+            return None
+        
+        sequence = np.expand_dims(pad_prefix(frames, self.sequence_length), axis=0)
+        raw = self.model(sequence, training=False).numpy()[0]
+        probabilities = apply_temperature(raw, self.temperatures[k])
+        
+        predicted_class = int(np.argmax(probabilities))
+        confidence = float(probabilities[predicted_class])
+        committed = confidence >= self.threshold or k == self.sequence_length
+        return predicted_class, confidence, probabilities, committed
+
+def create_early_model(input_shape, num_classes=3):
+    """
+    Create a masked LSTM that accepts left-padded prefixes
+    
+    Architecture:
+        Input -> Masking -> LSTM(64) -> LSTM(32) -> Dense(32) -> Output(3)
+    """
+    from tensorflow import keras
+    
+    model = keras.Sequential([
+        keras.layers.Input(shape=input_shape),
+        keras.layers.Masking(mask_value=0.0),
+        keras.layers.LSTM(64, return_sequences=True),
+        keras.layers.Dropout(0.2),
+        keras.layers.LSTM(32),
+        keras.layers.Dropout(0.2),
+        keras.layers.Dense(32, activation='relu'),
+        keras.layers.Dense(num_classes, activation='softmax')
+    ], name='EarlyDecisionModel')
+    
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=0.001),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    return model
+
+def prefix_probabilities(model, X, min_frames, temperatures=None):
+    """
+    Model probabilities for every prefix length of held-out windows
+    
+    Args:
+        model: Early-decision Keras model
+        X: Full windows of shape (num_windows, sequence_length, num_features)
+        min_frames: Shortest prefix
+        temperatures: {k: temperature} to calibrate with, or None for raw
+                      probabilities
+    
+    Returns:
+        {k: probabilities of shape (num_windows, num_classes)}
+    """
+    sequence_length = X.shape[1]
+    probs_by_length = {}
+    for k in range(min_frames, sequence_length + 1):
+        padded = np.zeros_like(X)
+        padded[:, sequence_length - k:] = X[:, :k]
+        raw = model.predict(padded, verbose=0)
+        probs_by_length[k] = raw if temperatures is None else apply_temperature(raw, temperatures[k])
+    return probs_by_length
+
+def decision_curve(probs_by_length, y, min_frames, sequence_length):
+    """Accuracy vs time-to-decision of the commit rule for a range of thresholds"""
+    curve = []
+    for threshold in np.round(np.arange(0.50, 1.0, 0.05), 2).tolist() + [0.99]:
+        accuracy, mean_frames, early = simulate_decisions(
+            probs_by_length, y, threshold, min_frames, sequence_length
+        )
+        curve.append({
+            "threshold": threshold,
+            "accuracy": accuracy,
+            "mean_frames_to_decision": mean_frames,
+            "mean_ms_to_decision": mean_frames / FRAME_RATE * 1000,
+            "early_commit_rate": early
+        })
+    return curve
+
+def train_early_model(data_path="data", model_dir=EARLY_MODEL_DIR, min_frames=5,
+                      epochs=100, batch_size=64, validation_split=0.2, calibration_split=0.15,
+                      test_split=0.15):
+    """
+    Train, calibrate and evaluate the early-decision classifier
+    
+    Args:
+        validation_split: Share of windows for early stopping
+        calibration_split: Share of windows the temperatures and the commit
+                           threshold are fit on
+        test_split: Share of windows the reported curve is measured on
+    """
+    from tensorflow import keras
+    from sklearn.model_selection import train_test_split
+    import matplotlib.pyplot as plt
+    
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    
+    data = load_training_data(data_path)
+    if data is None:
+        print("[ERROR] Training data not found!")
+        print(f"   Looking for: {Path(data_path) / DATASET_DIR}")
+        print("\n   Please run '2_extract_features.py' first")
+        return None
+    
+    X, y, _ = data
+    X = X.astype(np.float32)
+    sequence_length = X.shape[1]
+    min_frames = min(min_frames, sequence_length)
+    
+    # Split whole windows first so prefixes of one window never leak across
+    # splits; early stopping, calibration and the reported curve each get
+    # their own windows so none of them is judged on data it was tuned on
+    X_rest, X_test, y_rest, y_test = train_test_split(
+        X, y, test_size=test_split, random_state=42, stratify=y
+    )
+    X_rest, X_cal, y_rest, y_cal = train_test_split(
+        X_rest, y_rest, test_size=calibration_split / (1 - test_split), random_state=42, stratify=y_rest
+    )
+    X_train, X_val, y_train, y_val = train_test_split(
+        X_rest, y_rest, test_size=validation_split / (1 - test_split - calibration_split),
+        random_state=42, stratify=y_rest
+    )
+    X_train_p, y_train_p, _ = make_prefix_dataset(X_train, y_train, min_frames)
+    X_val_p, y_val_p, _ = make_prefix_dataset(X_val, y_val, min_frames)
+    
+    print("\n" + "="*60)
+    print(" "*14 + "EARLY-DECISION MODEL TRAINING")
+    print("="*60)
+    print(f"\nPrefix lengths: {min_frames}-{sequence_length} frames")
+    print(f"Training prefixes:   {len(X_train_p)} (from {len(X_train)} windows)")
+    print(f"Validation prefixes: {len(X_val_p)} (from {len(X_val)} windows)")
+    print(f"Calibration windows: {len(X_cal)}  |  Test windows: {len(X_test)}")
+    
+    model = create_early_model((sequence_length, X.shape[2]), num_classes=len(np.unique(y)))
+    
+    start_time = time.time()
+    model.fit(
+        X_train_p, y_train_p,
+        validation_data=(X_val_p, y_val_p),
+        epochs=epochs,
+        batch_size=batch_size,
+        callbacks=[keras.callbacks.EarlyStopping(
+            monitor='val_loss', patience=10, restore_best_weights=True, verbose=1
+        )],
+        verbose=1
+    )
+    training_time = time.time() - start_time
+    
+    model_file = model_dir / "gesture_classifier.h5"
+    model.save(str(model_file))
+    
+    # Calibrate each prefix length on the calibration windows
+    raw_cal = prefix_probabilities(model, X_cal, min_frames)
+    temperatures = {k: fit_temperature(raw, y_cal) for k, raw in raw_cal.items()}
+    cal_probs = {k: apply_temperature(raw, temperatures[k]) for k, raw in raw_cal.items()}
+    
+    # Fastest threshold that keeps full-window accuracy (within one point),
+    # chosen on the calibration windows
+    cal_full_accuracy = float(np.mean(np.argmax(raw_cal[sequence_length], axis=1) == y_cal))
+    cal_curve = decision_curve(cal_probs, y_cal, min_frames, sequence_length)
+    acceptable = [c for c in cal_curve if c["accuracy"] >= cal_full_accuracy - 0.01]
+    threshold = (min(acceptable, key=lambda c: c["mean_frames_to_decision"]) if acceptable else cal_curve[-1])["threshold"]
+    
+    # Everything reported is measured on the untouched test windows
+    test_probs = prefix_probabilities(model, X_test, min_frames, temperatures)
+    per_length = [{
+        "frames": k,
+        "accuracy": float(np.mean(np.argmax(probs, axis=1) == y_test)),
+        "temperature": temperatures[k]
+    } for k, probs in test_probs.items()]
+    full_accuracy = per_length[-1]["accuracy"]
+    curve = decision_curve(test_probs, y_test, min_frames, sequence_length)
+    chosen = next(c for c in curve if c["threshold"] == threshold)
+    
+    calibration = {
+        "sequence_length": sequence_length,
+        "min_frames": min_frames,
+        "threshold": chosen["threshold"],
+        "temperatures": {str(k): t for k, t in temperatures.items()}
+    }
+    with open(str(model_dir / "calibration.json"), 'w') as f:
+        json.dump(calibration, f, indent=2)
+    
+    report = {
+        "training_date": datetime.now().isoformat(),
+        "training_time_seconds": training_time,
+        "validation_windows": int(len(X_val)),
+        "calibration_windows": int(len(X_cal)),
+        "test_windows": int(len(X_test)),
+        "full_window_accuracy": full_accuracy,
+        "accuracy_by_frames": per_length,
+        "decision_curve": curve,
+        "chosen": chosen
+    }
+    with open(str(model_dir / "decision_report.json"), 'w') as f:
+        json.dump(report, f, indent=2)
+    
+    print("\n" + "-"*60)
+    print("Test accuracy by frames seen:")
+    print("-"*60)
+    for row in per_length:
+        print(f"  {row['frames']:2} frames ({row['frames']/FRAME_RATE*1000:4.0f} ms): "
+              f"{row['accuracy']*100:5.1f}%  (T={row['temperature']:.2f})")
+    
+    print("\n" + "-"*60)
+    print("Test accuracy vs time-to-decision (threshold chosen on calibration windows):")
+    print("-"*60)
+    print(f"  {'Threshold':>9} {'Accuracy':>9} {'Mean ms':>8} {'Early':>7}")
+    for row in curve:
+        marker = "  <- chosen" if row is chosen else ""
+        print(f"  {row['threshold']:9.2f} {row['accuracy']*100:8.1f}% "
+              f"{row['mean_ms_to_decision']:8.0f} {row['early_commit_rate']*100:6.1f}%{marker}")
+    
+    # Plot the curve
+    fig, ax = plt.subplots(figsize=(7, 5))
+    ax.plot([c["mean_ms_to_decision"] for c in curve], [c["accuracy"] for c in curve],
+            marker='o', linewidth=2, label='Early commit')
+    ax.plot([r["frames"] / FRAME_RATE * 1000 for r in per_length], [r["accuracy"] for r in per_length],
+            marker='s', linewidth=1, linestyle='--', label='Fixed prefix length')
+    ax.set_title('Accuracy vs Time to Decision', fontsize=14, fontweight='bold')
+    ax.set_xlabel('Mean time to decision (ms)', fontsize=12)
+    ax.set_ylabel('Accuracy', fontsize=12)
+    ax.legend(fontsize=10)
+    ax.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(str(model_dir / "decision_curve.png"), dpi=150, bbox_inches='tight')
+    plt.close()
+    
+    print(f"\nModel saved to: {model_file}")
+    print(f"Calibration saved to: {model_dir / 'calibration.json'}")
+    print(f"Report saved to: {model_dir / 'decision_report.json'}")
+    print(f"Commit threshold: {chosen['threshold']:.2f} "
+          f"({chosen['mean_ms_to_decision']:.0f} ms mean vs "
+          f"{sequence_length/FRAME_RATE*1000:.0f} ms full window)")
+    
+    return model
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the early-decision gesture classifier")
+    parser.add_argument("--min-frames", type=int, default=5,
+                        help="Shortest buffer (frames) allowed to produce a prediction")
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    
+    train_early_model(min_frames=args.min_frames, epochs=args.epochs, batch_size=args.batch_size)
+
+if __name__ == "__main__":
+    main()
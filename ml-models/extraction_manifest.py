@@ -0,0 +1,210 @@
+"""
+EXTRACTION MANIFEST
+===================
+Bookkeeping for incremental feature extraction (2_extract_features.py).
+
+The manifest (data/extraction_manifest.json) records every processed video:
+    - path, size, mtime and SHA-256 content hash
+    - per set of extraction parameters (feature mode, sequence length,
+      stride): number of sequences, detection rate and the result file
+
+Per-video results live in data/per_video/<params key>/<content hash>.npz,
+so the training set is reassembled from them without touching the videos.
+A video counts as up to date when its size and mtime are unchanged (or, if
+only the mtime changed, its content hash still matches) and a result for
+the current parameters exists. Switching parameters back and forth reuses
+the results of both.
+
+Because each video's result is stored as soon as it finishes, an
+interrupted run (Ctrl-C, out of memory, crash) resumes where it stopped.
+Videos that fail are quarantined with their error and skipped until the
+file changes (or --retry-quarantined is given).
+"""
+
+import os
+import json
+import time
+import hashlib
+import numpy as np
+from pathlib import Path
+
+MANIFEST_VERSION = 1
+
+def params_key(params):
+    """Short stable key for a set of extraction parameters"""
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+class ExtractionManifest:
+    """Processed videos and their per-parameter results"""
+    
+    def __init__(self, output_path):
+        self.output_path = Path(output_path)
+        self.manifest_file = self.output_path / "extraction_manifest.json"
+        self.results_path = self.output_path / "per_video"
+        self.videos = {}
+        self.quarantine = {}
+        self.last_save = 0.0
+        # Content hashes computed this run: path -> (size, mtime, hash)
+        self.hashes = {}
+        
+        if self.manifest_file.exists():
+            with open(str(self.manifest_file), 'r') as f:
+                saved = json.load(f)
+            if saved.get("version") == MANIFEST_VERSION:
+                self.videos = saved["videos"]
+                self.quarantine = saved.get("quarantine", {})
+    
+    def save(self):
+        # Write-then-rename so an interrupted save never corrupts the manifest
+        temp_file = self.manifest_file.with_suffix(".json.tmp")
+        with open(str(temp_file), 'w') as f:
+            json.dump({
+                "version": MANIFEST_VERSION,
+                "videos": self.videos,
+                "quarantine": self.quarantine
+            }, f, indent=2)
+        os.replace(str(temp_file), str(self.manifest_file))
+        self.last_save = time.time()
+    
+    def checkpoint(self, interval=2.0):
+        """Save if the last save is more than `interval` seconds old"""
+        if time.time() - self.last_save >= interval:
+            self.save()
+    
+    @staticmethod
+    def _key(video_path):
+        return Path(video_path).as_posix()
+    
+    def _result_file(self, content_hash, params):
+        return self.results_path / params_key(params) / f"{content_hash}.npz"
+    
+    def content_hash(self, video_path):
+        """
+        SHA-256 of a video, reading the file at most once per run
+        
+        The manifest's hash is reused while size and mtime are unchanged
+        (the same rule as is_up_to_date).
+        """
+        from landmark_archive import video_content_hash
+        
+        key = self._key(video_path)
+        stat = Path(video_path).stat()
+        cached = self.hashes.get(key)
+        if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime):
+            return cached[2]
+        
+        entry = self.videos.get(key)
+        if entry is not None and (entry["size"], entry["mtime"]) == (stat.st_size, stat.st_mtime):
+            content_hash = entry["content_hash"]
+        else:
+            content_hash = video_content_hash(video_path)
+        self.hashes[key] = (stat.st_size, stat.st_mtime, content_hash)
+        return content_hash
+    
+    def is_up_to_date(self, video_path, params):
+        """
+        Whether a stored result for these parameters matches the video on disk
+        
+        The content hash is only computed when size and mtime don't settle it.
+        """
+        entry = self.videos.get(self._key(video_path))
+        if entry is None or params_key(params) not in entry["results"]:
+            return False
+        if not self._result_file(entry["content_hash"], params).exists():
+            return False
+        
+        stat = Path(video_path).stat()
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime == entry["mtime"]:
+            return True
+        
+        # Touched but maybe not modified (copied, checked out again)
+        if self.content_hash(video_path) != entry["content_hash"]:
+            return False
+        entry["mtime"] = stat.st_mtime
+        return True
+    
+    def record(self, video_path, category, params, sequences, detection_rate):
+        """Store one video's result and update its manifest entry"""
+        video_path = Path(video_path)
+        stat = video_path.stat()
+        content_hash = self.content_hash(video_path)
+        
+        result_file = self._result_file(content_hash, params)
+        result_file.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            str(result_file),
+            sequences=np.array(sequences) if sequences else np.zeros((0,)),
+            detection_rate=detection_rate
+        )
+        
+        entry = self.videos.get(self._key(video_path))
+        if entry is None or entry["content_hash"] != content_hash:
+            entry = {"results": {}}
+        entry.update({
+            "category": category,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "content_hash": content_hash
+        })
+        entry["results"][params_key(params)] = {
+            "params": params,
+            "sequences": len(sequences),
+            "detection_rate": detection_rate
+        }
+        self.videos[self._key(video_path)] = entry
+        self.quarantine.pop(self._key(video_path), None)
+    
+    def add_to_quarantine(self, video_path, error):
+        """Remember a video that failed, so later runs skip it until it changes"""
+        stat = Path(video_path).stat()
+        self.quarantine[self._key(video_path)] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "error": error,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+    
+    def is_quarantined(self, video_path):
+        """Whether the video failed before and hasn't changed since"""
+        entry = self.quarantine.get(self._key(video_path))
+        if entry is None:
+            return False
+        stat = Path(video_path).stat()
+        return stat.st_size == entry["size"] and stat.st_mtime == entry["mtime"]
+    
+    def load_result(self, video_path, params):
+        """
+        Stored result of a video
+        
+        Returns:
+            (sequences, detection_rate) like FeatureExtractor.process_video
+        """
+        entry = self.videos[self._key(video_path)]
+        with np.load(str(self._result_file(entry["content_hash"], params))) as data:
+            sequences = list(data["sequences"]) if data["sequences"].ndim == 3 else []
+            return sequences, float(data["detection_rate"])
+    
+    def prune(self, current_videos):
+        """
+        Forget videos that no longer exist and delete unreferenced results
+        
+        Returns:
+            Paths of the removed videos
+        """
+        current = {self._key(video) for video in current_videos}
+        removed = [path for path in self.videos if path not in current]
+        for path in removed:
+            del self.videos[path]
+        for path in [path for path in self.quarantine if path not in current]:
+            del self.quarantine[path]
+        
+        referenced = {
+            self.results_path / key / f"{entry['content_hash']}.npz"
+            for entry in self.videos.values() for key in entry["results"]
+        }
+        for result_file in self.results_path.glob("*/*.npz"):
+            if result_file not in referenced:
+                result_file.unlink()
+        return removed
@@ -0,0 +1,161 @@
+"""
+FACE REGION OF INTEREST
+=======================
+Runs FaceMesh on a crop around the face instead of the whole frame.
+
+A 1280x720 frame is mostly background, yet every frame gets color-converted
+and handed to FaceMesh in full. FaceROI keeps a padded square box around
+the face found in the previous frame; only that crop is converted and
+processed, and the landmarks are mapped back to full-frame normalized
+coordinates, so features mean exactly what they meant before.
+
+How it works:
+    - No box yet (first frame, face lost): the whole frame is processed
+    - The box is a square around the face outline (forehead, chin, cheeks),
+      padded by `padding` of the face size on every side
+    - The box is sticky: it only moves when the face gets close to its edge
+      or becomes much smaller than it, so FaceMesh's own frame-to-frame
+      tracking keeps working in a stable coordinate system
+    - If the crop has no face, the same frame is retried in full and the
+      box is dropped
+
+Mapping back (crop box x0, y0 and size w x h, frame W x H):
+    x = (x_crop * w + x0) / W,  y = (y_crop * h + y0) / H,  z = z_crop * w / W
+    (MediaPipe scales z like x)
+
+Used by:
+    - 2_extract_features.py --roi
+    - 4_test_model.py / 5_accuracy_test.py / 6_team_accuracy_test.py --roi
+"""
+
+import cv2
+import numpy as np
+
+# Face outline extremes: forehead top, chin, left and right cheek
+FACE_EXTENT_LANDMARKS = [10, 152, 234, 454]
+
+def _bgr_to_rgb(image):
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+class FaceROI:
+    """FaceMesh on a sticky face crop, with full-frame fallback"""
+    
+    def __init__(self, face_mesh, padding=0.5, min_size=128, edge_margin=0.1):
+        """
+        Args:
+            face_mesh: MediaPipe FaceMesh instance
+            padding: Space around the face on each side, as a fraction of
+                     the face size
+            min_size: Smallest crop side in pixels
+            edge_margin: Move the box once the face comes within this
+                         fraction of the box size of an edge
+        """
+        self.face_mesh = face_mesh
+        self.padding = padding
+        self.min_size = min_size
+        self.edge_margin = edge_margin
+        self.box = None
+        self.crops = 0
+        self.full_frames = 0
+    
+    def reset(self):
+        """Forget the face (start of a new video)"""
+        self.box = None
+    
+    def process(self, frame, map_landmarks=True, prepare=_bgr_to_rgb):
+        """
+        FaceMesh on the face crop of a frame
+        
+        Args:
+            frame: Full BGR frame
+            map_landmarks: Rewrite the landmarks in the results to full-frame
+                           coordinates. Pass False to map an array with
+                           to_frame() instead (much cheaper than rewriting
+                           478 protobuf landmarks)
+            prepare: BGR image -> FaceMesh input (default: RGB conversion)
+        
+        Returns:
+            (results, box): FaceMesh results and the crop box they refer to
+            ((x0, y0, x1, y1) in pixels, None = full frame)
+        """
+        box = self.box
+        if box is not None:
+            x0, y0, x1, y1 = box
+            results = self.face_mesh.process(prepare(frame[y0:y1, x0:x1]))
+            self.crops += 1
+            if not results.multi_face_landmarks:
+                # Face left the crop (fast move, occlusion): retry in full
+                box = self.box = None
+        if box is None:
+            results = self.face_mesh.process(prepare(frame))
+            self.full_frames += 1
+        
+        if not results.multi_face_landmarks:
+            self.box = None
+            return results, None
+        
+        face_landmarks = results.multi_face_landmarks[0]
+        self._update_box(face_landmarks, box, frame.shape)
+        
+        if map_landmarks and box is not None:
+            x0, y0, x1, y1 = box
+            height, width = frame.shape[:2]
+            for landmark in face_landmarks.landmark:
+                landmark.x = (landmark.x * (x1 - x0) + x0) / width
+                landmark.y = (landmark.y * (y1 - y0) + y0) / height
+                landmark.z = landmark.z * (x1 - x0) / width
+        return results, box
+    
+    @staticmethod
+    def to_frame(points, box, frame_shape):
+        """
+        Map crop-normalized landmarks to full-frame normalized coordinates
+        
+        Args:
+            points: Landmarks of shape (..., 3), normalized to the crop
+            box: Crop box from process() (None = already full frame)
+            frame_shape: (height, width, ...) of the full frame
+        """
+        if box is None:
+            return points
+        x0, y0, x1, y1 = box
+        height, width = frame_shape[:2]
+        scale = np.array([(x1 - x0) / width, (y1 - y0) / height, (x1 - x0) / width])
+        offset = np.array([x0 / width, y0 / height, 0.0])
+        return points * scale + offset
+    
+    def _update_box(self, face_landmarks, box, frame_shape):
+        """Keep the current box while the face is well inside it, else re-center"""
+        height, width = frame_shape[:2]
+        points = np.array([
+            [face_landmarks.landmark[idx].x, face_landmarks.landmark[idx].y]
+            for idx in FACE_EXTENT_LANDMARKS
+        ])
+        if box is None:
+            points *= (width, height)
+        else:
+            x0, y0, x1, y1 = box
+            points = points * (x1 - x0, y1 - y0) + (x0, y0)
+        
+        (left, top), (right, bottom) = points.min(axis=0), points.max(axis=0)
+        face_size = max(right - left, bottom - top)
+        
+        if self.box is not None:
+            x0, y0, x1, y1 = self.box
+            margin = self.edge_margin * (x1 - x0)
+            inside = (left - x0 > margin and x1 - right > margin and
+                      top - y0 > margin and y1 - bottom > margin)
+            # A face that shrank (moved away) would waste most of the crop
+            if inside and face_size * (1 + 2 * self.padding) > 0.6 * (x1 - x0):
+                return
+        
+        side = int(max(face_size * (1 + 2 * self.padding), self.min_size))
+        if side >= min(width, height):
+            self.box = None
+            return
+        
+        # Square around the face center, shifted to stay inside the frame
+        center_x, center_y = (left + right) / 2, (top + bottom) / 2
+        x0 = int(np.clip(center_x - side / 2, 0, width - side))
+        y0 = int(np.clip(center_y - side / 2, 0, height - side))
+        self.box = (x0, y0, x0 + side, y0 + side)
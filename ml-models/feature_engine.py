@@ -0,0 +1,415 @@
+"""
+DERIVED FEATURE ENGINE
+======================
+Tries new feature ideas on the archived landmarks of every video at once -
+no video decoding, no FaceMesh, no per-frame Python.
+
+A candidate feature set used to mean editing 2_extract_features.py and
+re-running extraction. Here a feature set is a small expression built from
+composable definitions, computed in one vectorized pass over the face
+frames of all videos together, then cut into the same training windows
+and dataset shards as extraction - ready for 3_train_model.py.
+
+Usage:
+    python feature_engine.py                           # Every feature set: frames/sec + windows
+    python feature_engine.py --sets nose_relative --write
+                                                       # Dataset in data/engine/nose_relative/
+    python 3_train_model.py --data-path data/engine/nose_relative --model-path models/engine/nose_relative
+    python feature_engine.py --list                    # Feature sets and their columns
+
+Needs archived landmarks (python 2_extract_features.py --archive).
+
+How it works:
+    - Only the landmarks the requested sets read are gathered from each
+      memory-mapped archive entry (face frames only), then all videos are
+      concatenated into one (frames, landmarks, 3) array
+    - Definitions compose: landmark() / centroid() / distance() read
+      landmarks; "-" makes positions relative, "/" scales them (e.g. by the
+      inter-ocular distance), .velocity() and .smooth(n) work along time and
+      restart at every video boundary, concat() joins columns
+    - Every definition is computed once per batch, however many sets share it
+    - Windows use the extractor's stride and short-video padding, so the
+      "coords" set reproduces a --from-archive coords dataset
+
+Feature sets:
+    coords:              The 9 model features (same as extraction)
+    coords_velocity:     coords + their frame-to-frame change
+    normalized:          coords relative to the face center, divided by the
+                         inter-ocular distance (landmarks 33 and 263)
+    normalized_velocity: normalized + its velocity
+    nose_relative:       nose relative to the face center / inter-ocular
+                         distance, and its velocity
+    smoothed_velocity:   normalized and its velocity, both 3-frame smoothed
+
+Models trained on engine sets are for comparing validation accuracy; the
+real-time scripts only compute the extraction feature modes.
+"""
+
+import time
+import json
+import argparse
+import numpy as np
+from pathlib import Path
+
+from dataset_io import DATASET_DIR, DEFAULT_SHARD_SIZE, STORAGE_DTYPES, ShardedDataset, ShardedDatasetWriter
+from landmark_archive import ARCHIVE_ROOT, LandmarkArchive, video_content_hash
+from model_bundle import COORDS_FEATURE_SPEC
+
+# Same windowing as 2_extract_features.py
+WINDOW_STRIDE = 10
+VIDEO_EXTENSIONS = ["*.mp4", "*.avi", "*.mov", "*.MOV"]
+LABEL_MAP = {"yes": 0, "no": 1, "neutral": 2}
+OUTPUT_ROOT = Path(__file__).parent / "data" / "engine"
+
+_AXES = "xyz"
+
+class FrameBatch:
+    """Gathered landmarks of the face frames of one or more videos"""
+    
+    def __init__(self, points, landmarks, starts):
+        """
+        Args:
+            points: (num_frames, len(landmarks), 3) float64 array
+            landmarks: Landmark index of each points column
+            starts: (num_frames,) bool, True on the first frame of each video
+        """
+        self.points = points
+        self.rows = {idx: row for row, idx in enumerate(landmarks)}
+        self.starts = np.asarray(starts, dtype=bool)
+        if len(self.starts):
+            self.starts[0] = True
+        self.cache = {}
+    
+    def __len__(self):
+        return len(self.points)
+    
+    def landmark(self, idx):
+        """(num_frames, 3) x/y/z of one landmark"""
+        return self.points[:, self.rows[idx]]
+    
+    def video_starts(self):
+        """Index of the first frame of each frame's video"""
+        return np.maximum.accumulate(np.where(self.starts, np.arange(len(self.starts)), 0))
+
+class Feature:
+    """
+    A composable per-frame feature definition
+    
+    Calling it on a FrameBatch gives a (num_frames, len(columns)) array.
+    """
+    
+    def __init__(self, columns, landmarks, compute, axes=None):
+        """
+        Args:
+            columns: Name of each output column
+            landmarks: Landmark indices compute() reads
+            compute: Function FrameBatch -> (num_frames, len(columns)) array
+            axes: Axis ("x"/"y"/"z") of each column, None where a column
+                  isn't a coordinate
+        """
+        self.columns = list(columns)
+        self.landmarks = set(landmarks)
+        self.compute = compute
+        self.axes = list(axes) if axes is not None else [None] * len(self.columns)
+    
+    @property
+    def width(self):
+        return len(self.columns)
+    
+    def __call__(self, batch):
+        key = id(self)
+        if key not in batch.cache:
+            batch.cache[key] = (self, self.compute(batch))
+        return batch.cache[key][1]
+    
+    def _aligned(self, other):
+        """other's values matched to this feature's columns"""
+        if other.width == 1 or other.axes == self.axes:
+            return other
+        if other.axes == list(_AXES) and all(axis is not None for axis in self.axes):
+            index = [_AXES.index(axis) for axis in self.axes]
+            return Feature(
+                [other.columns[i] for i in index], other.landmarks,
+                lambda batch: other(batch)[:, index], self.axes
+            )
+        raise ValueError(f"Can't align {other.columns} with {self.columns}")
+    
+    def __sub__(self, origin):
+        """Positions relative to origin (same axes, or one column)"""
+        origin = self._aligned(origin)
+        return Feature(
+            [f"({name}-{base})" for name, base in zip(self.columns, origin.columns * self.width)],
+            self.landmarks | origin.landmarks,
+            lambda batch: self(batch) - origin(batch), self.axes
+        )
+    
+    def __truediv__(self, scale):
+        """Values divided by scale (same axes, or one column, e.g. a distance)"""
+        scale = self._aligned(scale)
+        return Feature(
+            [f"{name}/{unit}" for name, unit in zip(self.columns, scale.columns * self.width)],
+            self.landmarks | scale.landmarks,
+            lambda batch: self(batch) / scale(batch), self.axes
+        )
+    
+    def velocity(self):
+        """Change since the previous frame of the same video (0 on its first frame)"""
+        def compute(batch):
+            values = self(batch)
+            change = np.diff(values, axis=0, prepend=values[:1])
+            change[batch.starts] = 0.0
+            return change
+        return Feature([f"d({name})" for name in self.columns], self.landmarks, compute)
+    
+    def smooth(self, window):
+        """Mean of the last `window` frames of the same video (causal, like real time)"""
+        def compute(batch):
+            values = self(batch)
+            totals = np.concatenate([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+            end = np.arange(1, len(values) + 1)
+            begin = np.maximum(end - window, batch.video_starts())
+            return (totals[end] - totals[begin]) / (end - begin)[:, None]
+        return Feature([f"avg{window}({name})" for name in self.columns], self.landmarks, compute, self.axes)
+
+def landmark(idx, axes=_AXES):
+    """Coordinates of one landmark, e.g. landmark(1, "y") = nose y"""
+    index = [_AXES.index(axis) for axis in axes]
+    return Feature(
+        [f"lm{idx}.{axis}" for axis in axes], [idx],
+        lambda batch: batch.landmark(idx)[:, index], list(axes)
+    )
+
+def centroid(indices, name="center"):
+    """x/y/z mean of several landmarks"""
+    return Feature(
+        [f"{name}.{axis}" for axis in _AXES], indices,
+        lambda batch: np.mean([batch.landmark(idx) for idx in indices], axis=0), list(_AXES)
+    )
+
+def distance(a, b, name=None):
+    """Image-plane (x/y) distance between two landmarks, one column"""
+    return Feature(
+        [name or f"dist({a},{b})"], [a, b],
+        lambda batch: np.linalg.norm(batch.landmark(a)[:, :2] - batch.landmark(b)[:, :2], axis=1, keepdims=True)
+    )
+
+def concat(*features):
+    """Columns of several features side by side"""
+    return Feature(
+        [name for feature in features for name in feature.columns],
+        set().union(*(feature.landmarks for feature in features)),
+        lambda batch: np.concatenate([feature(batch) for feature in features], axis=1),
+        [axis for feature in features for axis in feature.axes]
+    )
+
+# ---------------------------------------------------------------------------
+# Feature sets
+# ---------------------------------------------------------------------------
+
+COORDS = concat(*[landmark(idx, axis) for idx, axis in
+                  zip(COORDS_FEATURE_SPEC["landmarks"], COORDS_FEATURE_SPEC["axes"])])
+NOSE = landmark(1)
+# Forehead, chin and the outer eye corners
+FACE_CENTER = centroid([10, 152, 33, 263], "face_center")
+INTER_OCULAR = distance(33, 263, "iod")
+
+NORMALIZED = (COORDS - FACE_CENTER) / INTER_OCULAR
+NOSE_RELATIVE = (NOSE - FACE_CENTER) / INTER_OCULAR
+SMOOTHED = NORMALIZED.smooth(3)
+
+FEATURE_SETS = {
+    "coords": COORDS,
+    "coords_velocity": concat(COORDS, COORDS.velocity()),
+    "normalized": NORMALIZED,
+    "normalized_velocity": concat(NORMALIZED, NORMALIZED.velocity()),
+    "nose_relative": concat(NOSE_RELATIVE, NOSE_RELATIVE.velocity()),
+    "smoothed_velocity": concat(SMOOTHED, SMOOTHED.velocity().smooth(3))
+}
+
+# ---------------------------------------------------------------------------
+# Archive loading and windowing
+# ---------------------------------------------------------------------------
+
+def archived_videos(video_root="videos", archive_root=ARCHIVE_ROOT, key_suffix=""):
+    """
+    Archive entries of the training videos
+    
+    Args:
+        video_root: Folder with yes/ no/ neutral/ subfolders
+        archive_root: Landmark archive folder
+        key_suffix: Archive key suffix of the extraction profile
+                    (e.g. "fast" or "roi", see FeatureExtractor.archive_key)
+    
+    Returns:
+        (found, missing): found is a list of (video, category, archive
+        key); missing lists videos with no archive entry
+    """
+    archive = LandmarkArchive(archive_root)
+    found, missing = [], []
+    for category in LABEL_MAP:
+        videos = set()
+        for pattern in VIDEO_EXTENSIONS:
+            videos.update((Path(video_root) / category).glob(pattern))
+        for video in sorted(videos):
+            key = video_content_hash(video) + (f"-{key_suffix}" if key_suffix else "")
+            if archive.contains(key):
+                found.append((video, category, key))
+            else:
+                missing.append(video)
+    return found, missing
+
+def load_batch(entries, landmarks, archive_root=ARCHIVE_ROOT):
+    """
+    Gather the given landmarks of every face frame of every video
+    
+    Args:
+        entries: (video, category, archive key) list from archived_videos()
+        landmarks: Landmark indices to gather
+    
+    Returns:
+        (batch, lengths): FrameBatch over all videos and the face frame
+        count of each video
+    """
+    archive = LandmarkArchive(archive_root)
+    landmarks = sorted(landmarks)
+    parts = []
+    for _, _, key in entries:
+        entry = archive.load(key)
+        mask = np.asarray(entry["mask"])
+        parts.append(np.asarray(entry["landmarks"][:, landmarks][mask], dtype=np.float64))
+    
+    lengths = np.array([len(part) for part in parts], dtype=np.int64)
+    points = np.concatenate(parts) if parts else np.zeros((0, len(landmarks), 3))
+    starts = np.zeros(len(points), dtype=bool)
+    starts[np.cumsum(lengths)[:-1][lengths[1:] > 0]] = True
+    return FrameBatch(points, landmarks, starts), lengths
+
+def make_windows(frame_features, sequence_length, stride=WINDOW_STRIDE):
+    """
+    Training windows of one video, like assemble_sequences in 2_extract_features.py
+    
+    Returns:
+        (num_windows, sequence_length, num_features) array
+    """
+    num_frames, num_features = frame_features.shape
+    if num_frames >= sequence_length:
+        windows = np.lib.stride_tricks.sliding_window_view(frame_features, sequence_length, axis=0)
+        return windows[::stride].transpose(0, 2, 1)
+    if num_frames > sequence_length // 2:
+        # Pad short videos by repeating the last frame
+        padded = np.concatenate([frame_features, np.repeat(frame_features[-1:], sequence_length - num_frames, axis=0)])
+        return padded[None]
+    return np.zeros((0, sequence_length, num_features))
+
+def compute_sets(batch, feature_sets):
+    """
+    Compute feature sets over a batch, timing each one
+    
+    Returns:
+        Dictionary of set name -> (features, seconds); definitions shared
+        between sets are only computed (and timed) once
+    """
+    computed = {}
+    for name, feature in feature_sets.items():
+        start = time.perf_counter()
+        computed[name] = (feature(batch), time.perf_counter() - start)
+    return computed
+
+def write_dataset(name, feature, features, entries, lengths, output_root=OUTPUT_ROOT,
+                  sequence_length=15, shard_size=DEFAULT_SHARD_SIZE, dtype=None):
+    """
+    Write one feature set's windows as a training dataset
+    
+    Args:
+        name, feature: Feature set name and definition
+        features: Its (total face frames, width) values over all videos
+        entries, lengths: From archived_videos() / load_batch()
+    
+    Returns:
+        The ShardedDataset in <output_root>/<name>/dataset
+    """
+    dataset_path = Path(output_root) / name / DATASET_DIR
+    with ShardedDatasetWriter(dataset_path, shard_size, metadata={
+        "sequence_length": sequence_length,
+        "label_map": LABEL_MAP,
+        "feature_mode": f"engine:{name}",
+        "feature_columns": feature.columns,
+        "stride": WINDOW_STRIDE,
+        "source": "landmark archive"
+    }, dtype=dtype) as writer:
+        for (_, category, _), video_features in zip(entries, np.split(features, np.cumsum(lengths)[:-1])):
+            writer.append(make_windows(video_features, sequence_length), LABEL_MAP[category])
+    return ShardedDataset(dataset_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute derived feature sets from archived landmarks")
+    parser.add_argument("--sets", nargs="+", choices=sorted(FEATURE_SETS), default=sorted(FEATURE_SETS),
+                        help="Feature sets to compute (default: all)")
+    parser.add_argument("--list", action="store_true", help="List the feature sets and their columns")
+    parser.add_argument("--write", action="store_true",
+                        help="Write each set's training dataset to <output-root>/<set>/dataset")
+    parser.add_argument("--sequence-length", type=int, default=15)
+    parser.add_argument("--video-path", default="videos")
+    parser.add_argument("--archive-root", default=str(ARCHIVE_ROOT))
+    parser.add_argument("--key-suffix", default="",
+                        help="Archive entries of this extraction profile (e.g. fast, roi)")
+    parser.add_argument("--output-root", default=str(OUTPUT_ROOT))
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument("--dtype", choices=STORAGE_DTYPES, default=None, help="Storage dtype of the windows")
+    args = parser.parse_args()
+    
+    print("\n" + "="*60)
+    print(" "*18 + "DERIVED FEATURE ENGINE")
+    print("="*60)
+    
+    feature_sets = {name: FEATURE_SETS[name] for name in args.sets}
+    if args.list:
+        for name, feature in feature_sets.items():
+            print(f"\n{name} ({feature.width} features, landmarks {sorted(feature.landmarks)}):")
+            print("  " + ", ".join(feature.columns))
+        return
+    
+    entries, missing = archived_videos(args.video_path, args.archive_root, args.key_suffix)
+    if missing:
+        print(f"\n[WARNING] {len(missing)} videos aren't archived - run 2_extract_features.py --archive")
+    if not entries:
+        print("\n[ERROR] No archived videos found")
+        return
+    
+    landmarks = set().union(*(feature.landmarks for feature in feature_sets.values()))
+    start = time.perf_counter()
+    batch, lengths = load_batch(entries, landmarks, args.archive_root)
+    load_seconds = time.perf_counter() - start
+    frames = len(batch)
+    print(f"\n{len(entries)} videos, {frames} face frames, {len(landmarks)} landmarks gathered "
+          f"in {load_seconds:.2f}s ({frames / max(load_seconds, 1e-9):,.0f} frames/sec)")
+    
+    report = {"videos": len(entries), "frames": frames, "load_seconds": load_seconds, "sets": {}}
+    print(f"\n{'Set':22} {'Features':>8} {'Windows':>8} {'ms':>8} {'Frames/sec':>14}")
+    for name, (features, seconds) in compute_sets(batch, feature_sets).items():
+        windows = sum(len(make_windows(part, args.sequence_length))
+                      for part in np.split(features, np.cumsum(lengths)[:-1]))
+        report["sets"][name] = {
+            "features": features.shape[1],
+            "windows": windows,
+            "seconds": seconds,
+            "frames_per_sec": frames / max(seconds, 1e-9)
+        }
+        print(f"{name:22} {features.shape[1]:8} {windows:8} {seconds * 1000:8.2f} "
+              f"{frames / max(seconds, 1e-9):14,.0f}")
+        
+        if args.write:
+            dataset = write_dataset(name, feature_sets[name], features, entries, lengths, args.output_root,
+                                    args.sequence_length, args.shard_size, args.dtype)
+            report["sets"][name]["dataset"] = str(dataset.path)
+    
+    if args.write:
+        report_file = Path(args.output_root) / "engine_stats.json"
+        with open(str(report_file), 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nDatasets written to {args.output_root}/<set>/{DATASET_DIR}")
+        print(f"Train one with: python 3_train_model.py --data-path {args.output_root}/<set> "
+              f"--model-path models/engine/<set>")
+
+if __name__ == "__main__":
+    main()
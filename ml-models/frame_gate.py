@@ -0,0 +1,258 @@
+"""
+MOTION-GATED LANDMARK REUSE
+===========================
+Skips FaceMesh on frames that barely differ from the last frame it ran on,
+and reuses that frame's landmarks.
+
+During NEUTRAL stretches - and in the still head-and-shoulders clips
+extract_neutral_frames.py cuts - consecutive frames are nearly identical,
+yet FaceMesh runs on every one of them. A downsampled frame difference is
+a tiny fraction of that cost.
+
+Usage:
+    python frame_gate.py                          # Skip rate + landmark error on every video
+    python frame_gate.py --threshold 1 2 4        # Compare thresholds
+    python 2_extract_features.py --gate 2.0       # Extract with the gate
+    python 2_extract_features.py --benchmark-gate # Skip rate + accuracy per threshold
+
+How it works:
+    - Every frame is shrunk to GATE_WIDTH pixels wide and averaged over its
+      color channels (INTER_AREA also averages away sensor noise)
+    - The difference is the mean absolute gray-level change (0-255) against
+      the last frame FaceMesh ran on - not the previous frame, so a slow
+      drift still adds up - inside the padded face box
+    - Below `threshold` the previous landmarks are reused; a frame without a
+      face is never reused, and after `max_reuse` reused frames in a row
+      FaceMesh runs anyway
+    - Reused frames are tagged: "reused" per frame in the extractor's
+      landmark streams and archive entries, counts in extraction_stats.json
+      and the real-time overlay
+
+Used by:
+    - 2_extract_features.py --gate THRESHOLD
+    - 4_test_model.py / 5_accuracy_test.py / 6_team_accuracy_test.py --gate THRESHOLD
+"""
+
+import json
+import argparse
+import numpy as np
+from pathlib import Path
+
+import cv2
+
+from face_roi import FACE_EXTENT_LANDMARKS
+
+GATE_WIDTH = 160
+DEFAULT_THRESHOLD = 2.0
+DEFAULT_MAX_REUSE = 15
+
+def results_points(results):
+    """
+    Points outlining the face in FaceMesh-style results
+    
+    Returns:
+        (N, 2) normalized x/y (face outline for FaceMesh, every keypoint
+        for the face detector), or None if no face
+    """
+    if not results.multi_face_landmarks:
+        return None
+    landmark = results.multi_face_landmarks[0].landmark
+    indices = FACE_EXTENT_LANDMARKS if len(landmark) > max(FACE_EXTENT_LANDMARKS) else range(len(landmark))
+    return np.array([[landmark[idx].x, landmark[idx].y] for idx in indices])
+
+class FrameGate:
+    """Reuse the last landmarks while the frame barely changes"""
+    
+    def __init__(self, threshold=DEFAULT_THRESHOLD, max_reuse=DEFAULT_MAX_REUSE, padding=0.25,
+                 keep_flags=False):
+        """
+        Args:
+            threshold: Mean absolute gray-level difference (0-255) below
+                       which a frame reuses the previous landmarks
+            max_reuse: Most frames in a row that may reuse landmarks
+            padding: Space around the face box, as a fraction of its size
+            keep_flags: Record a reused flag per frame in .flags (until reset)
+        """
+        self.threshold = threshold
+        self.keep_flags = keep_flags
+        self.max_reuse = max_reuse
+        self.padding = padding
+        self.frames = 0
+        self.reused = 0
+        self.reset()
+    
+    def reset(self):
+        """Forget the reference frame (start of a new video)"""
+        self.reference = None
+        self.current = None
+        self.region = None
+        self.landmarks = None
+        self.reused_in_row = 0
+        self.last_difference = None
+        self.last_reused = False
+        self.flags = []
+    
+    def check(self, frame):
+        """
+        Whether this frame can reuse the previous landmarks
+        
+        Call update() after running FaceMesh on a frame that can't.
+        """
+        self.frames += 1
+        small = cv2.resize(frame, (GATE_WIDTH, round(frame.shape[0] * GATE_WIDTH / frame.shape[1])),
+                           interpolation=cv2.INTER_AREA)
+        self.current = small.mean(axis=2, dtype=np.float32) if small.ndim == 3 else small.astype(np.float32)
+        
+        reuse = False
+        self.last_difference = None
+        if self.reference is not None and self.region is not None and self.reused_in_row < self.max_reuse:
+            x0, y0, x1, y1 = self.region
+            self.last_difference = float(np.mean(np.abs(self.current[y0:y1, x0:x1] - self.reference[y0:y1, x0:x1])))
+            reuse = self.last_difference < self.threshold
+        
+        self.reused_in_row = self.reused_in_row + 1 if reuse else 0
+        self.reused += reuse
+        self.last_reused = reuse
+        if self.keep_flags:
+            self.flags.append(reuse)
+        return reuse
+    
+    def update(self, points):
+        """
+        Make the frame just checked the reference
+        
+        Args:
+            points: Normalized (N, 2+) face points found on it, None if no face
+        """
+        self.reference = self.current
+        if points is None:
+            self.region = None
+            return
+        height, width = self.current.shape
+        points = np.asarray(points)[:, :2] * (width, height)
+        low, high = points.min(axis=0), points.max(axis=0)
+        pad = (high - low) * self.padding
+        x0, y0 = np.clip(np.floor(low - pad), 0, None).astype(int)
+        x1, y1 = np.ceil(high + pad).astype(int)
+        self.region = (x0, y0, min(x1, width), min(y1, height))
+        if self.region[2] <= x0 or self.region[3] <= y0:
+            self.region = None
+    
+    def process(self, frame, detect):
+        """
+        Landmarks of a frame, reused while it barely changes
+        
+        Args:
+            frame: BGR frame
+            detect: Function frame -> (N, 3) landmark array or None
+        
+        Returns:
+            The landmark array (the previous one's object when reused)
+        """
+        if self.check(frame):
+            return self.landmarks
+        self.landmarks = detect(frame)
+        self.update(self.landmarks)
+        return self.landmarks
+    
+    @property
+    def skip_rate(self):
+        """Share of frames that reused landmarks"""
+        return self.reused / self.frames if self.frames else 0.0
+
+def measure_reuse(video_path, threshold=DEFAULT_THRESHOLD, max_reuse=DEFAULT_MAX_REUSE):
+    """
+    Run FaceMesh on every frame next to the gate and measure what reuse costs
+    
+    Returns:
+        Dictionary with frame counts, skip rate and the pixel error of the
+        reused landmarks against fresh FaceMesh (feature landmarks only),
+        or None if the video can't be opened
+    """
+    import mediapipe as mp
+    from landmark_tracker import TRACKED_LANDMARKS, facemesh_detector
+    
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        return None
+    
+    detect = facemesh_detector(mp.solutions.face_mesh.FaceMesh(
+        max_num_faces=1, refine_landmarks=True,
+        min_detection_confidence=0.5, min_tracking_confidence=0.5
+    ))
+    indices = sorted(set(TRACKED_LANDMARKS["coords"]) | set(TRACKED_LANDMARKS["head_pose"]))
+    gate = FrameGate(threshold, max_reuse)
+    errors = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        expected = detect(frame)
+        if gate.check(frame):
+            if expected is not None:
+                pixels = np.array(frame.shape[1::-1], dtype=np.float64)
+                difference = (gate.landmarks[indices, :2] - expected[indices, :2]) * pixels
+                errors.append(np.linalg.norm(difference, axis=1))
+        else:
+            gate.landmarks = expected
+            gate.update(expected)
+    cap.release()
+    
+    errors = np.array(errors).reshape(-1, len(indices))
+    return {
+        "video": str(video_path),
+        "threshold": threshold,
+        "frames": gate.frames,
+        "reused_frames": gate.reused,
+        "skip_rate": gate.skip_rate,
+        "reused_mean_px": float(errors.mean()) if errors.size else None,
+        "reused_p95_px": float(np.percentile(errors, 95)) if errors.size else None,
+        "reused_max_px": float(errors.max()) if errors.size else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure motion-gated landmark reuse against FaceMesh on every frame")
+    parser.add_argument("videos", nargs="*",
+                        help="Videos to measure (default: everything under videos/)")
+    parser.add_argument("--threshold", type=float, nargs="+", default=[DEFAULT_THRESHOLD],
+                        help="Gray-level difference threshold(s) to compare")
+    parser.add_argument("--max-reuse", type=int, default=DEFAULT_MAX_REUSE,
+                        help="Most frames in a row that may reuse landmarks")
+    parser.add_argument("--save", metavar="JSON", help="Write the full report to this file")
+    args = parser.parse_args()
+    
+    videos = args.videos or sorted(
+        str(path) for path in (Path(__file__).parent / "videos").glob("*/*")
+        if path.suffix.lower() in (".mp4", ".avi", ".mov")
+    )
+    
+    print("\n" + "="*60)
+    print(" "*15 + "MOTION-GATED LANDMARK REUSE")
+    print("="*60)
+    
+    report = []
+    for threshold in args.threshold:
+        print(f"\nThreshold {threshold}:")
+        for video in videos:
+            result = measure_reuse(video, threshold, args.max_reuse)
+            if result is None:
+                print(f"  {Path(video).name}: could not open")
+                continue
+            report.append(result)
+            error = ("n/a" if result["reused_mean_px"] is None else
+                     f"{result['reused_mean_px']:.2f}px mean, {result['reused_p95_px']:.2f}px p95")
+            print(f"  {Path(video).name:30} reused {result['skip_rate'] * 100:5.1f}%  error {error}")
+        
+        measured = [r for r in report if r["threshold"] == threshold]
+        if measured:
+            frames = sum(r["frames"] for r in measured)
+            reused = sum(r["reused_frames"] for r in measured)
+            print(f"  Overall: FaceMesh skipped on {reused / max(frames, 1) * 100:.1f}% of frames")
+    
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to: {args.save}")
+
+if __name__ == "__main__":
+    main()
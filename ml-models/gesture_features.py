@@ -0,0 +1,298 @@
+"""
+GESTURE FEATURES
+================
+The one place where landmarks become model features - for extraction, the
+landmark archive and every real-time script.
+
+The coords features used to be rebuilt by hand in each script with a
+Python loop per landmark group and .tolist() / np.array round trips. Here
+every feature mode is a single fancy-indexing kernel over a landmark
+array:
+    - face_features():           one frame of MediaPipe results (real time);
+                                 only the landmarks the mode reads are copied
+    - features_from_landmarks(): (num_frames, 478, 3) landmark arrays
+                                 (extraction, archive, batches)
+    - landmarks_to_array():      MediaPipe landmark list -> (N, 3) array in
+                                 one pass
+
+Usage:
+    python gesture_features.py                    # Parity with the old per-landmark code + timings
+    python gesture_features.py --video clip.mp4   # Same on real FaceMesh results
+
+Feature modes (see model_bundle.py for the specs):
+    coords:    9 values - y of nose/forehead/chin, x of nose/eyes, z of
+               nose/forehead/chin
+    head_pose: 6 values - pitch, yaw, roll and their velocity (head_pose.py)
+    keypoints: 10 values from the face detector's keypoints (keypoint_source.py)
+"""
+
+import time
+import argparse
+import itertools
+from operator import attrgetter
+from collections import namedtuple
+from types import SimpleNamespace
+
+import numpy as np
+
+from head_pose import POSE_LANDMARKS, HeadPoseFeatures, estimate_head_pose, pose_sequence_features
+from model_bundle import COORDS_FEATURE_SPEC
+from keypoint_source import keypoint_features
+
+_AXIS_INDEX = {"x": 0, "y": 1, "z": 2}
+
+# (landmark, axis) of every coords feature, in model input order
+COORDS_INDEX = np.array(COORDS_FEATURE_SPEC["landmarks"])
+COORDS_AXES = np.array([_AXIS_INDEX[axis] for axis in COORDS_FEATURE_SPEC["axes"]])
+
+# Landmarks each feature mode reads (nose, forehead, chin, eye corners /
+# pose points / all six detector keypoints)
+FEATURE_LANDMARKS = {
+    "coords": sorted(set(COORDS_FEATURE_SPEC["landmarks"])),
+    "head_pose": list(POSE_LANDMARKS),
+    "keypoints": list(range(6))
+}
+
+# Rows of the coords features within the FEATURE_LANDMARKS["coords"] subset
+_COORDS_ROWS = np.searchsorted(FEATURE_LANDMARKS["coords"], COORDS_INDEX)
+
+_xyz = attrgetter("x", "y", "z")
+
+def landmarks_to_array(landmarks, indices=None):
+    """
+    MediaPipe landmarks -> array in one pass
+    
+    Args:
+        landmarks: Landmark list (face_landmarks.landmark)
+        indices: Only these landmarks, in this order (None = all)
+    
+    Returns:
+        (N, 3) float64 array of normalized x/y/z
+    """
+    if indices is not None:
+        return np.array([_xyz(landmarks[idx]) for idx in indices])
+    return np.fromiter(
+        itertools.chain.from_iterable(map(_xyz, landmarks)), dtype=np.float64, count=3 * len(landmarks)
+    ).reshape(-1, 3)
+
+def coords_features(landmarks):
+    """
+    coords features with a single fancy-indexing operation
+    
+    Args:
+        landmarks: (..., 478, 3) or (..., 468, 3) landmark array(s)
+    
+    Returns:
+        (..., 9) features
+    """
+    return np.asarray(landmarks)[..., COORDS_INDEX, COORDS_AXES]
+
+def features_from_landmarks(landmarks, feature_mode, frame_shape):
+    """
+    Per-frame features for all face frames of a video in one vectorized pass
+    
+    Args:
+        landmarks: Raw landmarks of the frames with a face, in order,
+                   shape (num_frames, 478, 3) - or (num_frames, 6, 3)
+                   detector keypoints for "keypoints"
+        feature_mode: "coords", "head_pose" or "keypoints"
+        frame_shape: (height, width, ...) of the video frames
+    
+    Returns:
+        coords:    (num_frames, 9) - y of nose/forehead/chin (YES moves these),
+                   x of nose/eyes (NO moves these), z of nose/forehead/chin
+        head_pose: (num_frames, 6) - pitch, yaw, roll and their velocity
+                   relative to the previous face frame
+        keypoints: (num_frames, 10) - see keypoint_source.py
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    
+    if feature_mode == "head_pose":
+        height, width = frame_shape[:2]
+        angles = estimate_head_pose(landmarks[:, POSE_LANDMARKS], aspect_ratio=width / height)
+        return pose_sequence_features(angles)
+    
+    if feature_mode == "keypoints":
+        # Archived keypoints sit in the first 6 rows
+        return keypoint_features(landmarks[:, :6])
+    
+    return coords_features(landmarks)
+
+def face_features(face_landmarks, feature_mode, frame_shape, pose=None):
+    """
+    One frame's features from MediaPipe results (real-time scripts)
+    
+    Only the landmarks the mode reads are copied out of MediaPipe's list.
+    
+    Args:
+        face_landmarks: results.multi_face_landmarks[0] (FaceMesh, or
+                        DetectorKeypoints for "keypoints")
+        feature_mode: "coords", "head_pose" or "keypoints"
+        frame_shape: Shape of the frame the landmarks came from
+        pose: HeadPoseFeatures holding the previous frame (head_pose only)
+    
+    Returns:
+        numpy array of shape (num_features,)
+    """
+    points = landmarks_to_array(face_landmarks.landmark, FEATURE_LANDMARKS[feature_mode])
+    return points_features(points, feature_mode, frame_shape, pose)
+
+def points_features(points, feature_mode, frame_shape, pose=None):
+    """
+    face_features from the FEATURE_LANDMARKS[feature_mode] rows of a frame
+    
+    Args:
+        points: (len(FEATURE_LANDMARKS[feature_mode]), 3) array
+        feature_mode, frame_shape, pose: As for face_features
+    """
+    if feature_mode == "head_pose":
+        return pose.from_points(points, frame_shape)
+    if feature_mode == "keypoints":
+        return keypoint_features(points[None])[0]
+    return points[_COORDS_ROWS, COORDS_AXES]
+
+# ---------------------------------------------------------------------------
+# Parity check and micro-benchmark
+# ---------------------------------------------------------------------------
+
+_Landmark = namedtuple("_Landmark", ["x", "y", "z"])
+
+def _loop_coords_features(face_landmarks):
+    """The per-landmark loop the real-time scripts used before (reference)"""
+    vertical_positions = []
+    horizontal_positions = []
+    for idx in [1, 10, 152]:
+        landmark = face_landmarks.landmark[idx]
+        vertical_positions.append([landmark.x, landmark.y, landmark.z])
+    for idx in [1, 33, 263]:
+        landmark = face_landmarks.landmark[idx]
+        horizontal_positions.append([landmark.x, landmark.y, landmark.z])
+    vertical_positions = np.array(vertical_positions)
+    horizontal_positions = np.array(horizontal_positions)
+    
+    features = []
+    features.extend(vertical_positions[:, 1].tolist())
+    features.extend(horizontal_positions[:, 0].tolist())
+    features.extend(vertical_positions[:, 2].tolist())
+    return np.array(features)
+
+def synthetic_faces(num_frames=300, seed=0):
+    """MediaPipe-like landmark lists of a slowly nodding face"""
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(0.3, 0.7, size=(478, 3)) * (1, 1, 0.1)
+    faces = []
+    for t in range(num_frames):
+        frame = base + (0, 0.02 * np.sin(t / 5), 0) + rng.normal(0, 0.001, size=base.shape)
+        faces.append(SimpleNamespace(landmark=[_Landmark(*map(float, row)) for row in frame]))
+    return faces
+
+def video_faces(video_path, max_frames=300):
+    """FaceMesh results (real protobuf landmark lists) of a video's face frames"""
+    import cv2
+    import mediapipe as mp
+    
+    face_mesh = mp.solutions.face_mesh.FaceMesh(
+        max_num_faces=1, refine_landmarks=True,
+        min_detection_confidence=0.5, min_tracking_confidence=0.5
+    )
+    faces = []
+    cap = cv2.VideoCapture(str(video_path))
+    while len(faces) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        results = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if results.multi_face_landmarks:
+            faces.append(results.multi_face_landmarks[0])
+    cap.release()
+    face_mesh.close()
+    return faces
+
+def _time_per_call(fn, items, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for item in items:
+            fn(item)
+    return (time.perf_counter() - start) / (repeats * len(items))
+
+def check_parity(faces, frame_shape=(720, 1280)):
+    """
+    Compare the kernels against the old per-landmark code and each other
+    
+    Returns:
+        Dictionary of check -> max absolute difference
+    """
+    arrays = np.array([landmarks_to_array(face.landmark) for face in faces])
+    report = {
+        "array_vs_attributes": float(np.max(np.abs(
+            arrays - [[_xyz(landmark) for landmark in face.landmark] for face in faces]
+        ))),
+        "coords_vs_loop": float(np.max(np.abs(
+            np.array([face_features(face, "coords", frame_shape) for face in faces])
+            - [_loop_coords_features(face) for face in faces]
+        ))),
+        "coords_batch_vs_frame": float(np.max(np.abs(
+            features_from_landmarks(arrays, "coords", frame_shape)
+            - [face_features(face, "coords", frame_shape) for face in faces]
+        )))
+    }
+    pose = HeadPoseFeatures()
+    report["head_pose_batch_vs_frame"] = float(np.max(np.abs(
+        features_from_landmarks(arrays, "head_pose", frame_shape)
+        - [face_features(face, "head_pose", frame_shape, pose) for face in faces]
+    )))
+    return report
+
+def benchmark(faces, repeats=20):
+    """
+    Per-frame cost of each way to get features
+    
+    Returns:
+        Dictionary of method -> microseconds per frame
+    """
+    frame_shape = (720, 1280)
+    arrays = np.array([landmarks_to_array(face.landmark) for face in faces])
+    pose = HeadPoseFeatures()
+    timings = {
+        "coords_loop (old)": _time_per_call(_loop_coords_features, faces, repeats),
+        "coords face_features": _time_per_call(lambda f: face_features(f, "coords", frame_shape), faces, repeats),
+        "full landmarks_to_array": _time_per_call(lambda f: landmarks_to_array(f.landmark), faces, repeats),
+        "head_pose face_features": _time_per_call(
+            lambda f: face_features(f, "head_pose", frame_shape, pose), faces, repeats
+        )
+    }
+    for mode in ("coords", "head_pose"):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            features_from_landmarks(arrays, mode, frame_shape)
+        timings[f"{mode} batch (per frame)"] = (time.perf_counter() - start) / (repeats * len(faces))
+    return {name: seconds * 1e6 for name, seconds in timings.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the gesture feature kernels")
+    parser.add_argument("--video", help="Use FaceMesh results of this video instead of synthetic landmarks")
+    parser.add_argument("--frames", type=int, default=300, help="Frames to check and time")
+    parser.add_argument("--repeats", type=int, default=20, help="Timing repetitions")
+    args = parser.parse_args()
+    
+    print("\n" + "="*60)
+    print(" "*17 + "GESTURE FEATURE KERNELS")
+    print("="*60)
+    
+    faces = video_faces(args.video, args.frames) if args.video else synthetic_faces(args.frames)
+    if not faces:
+        print("[ERROR] No face frames to check")
+        return
+    print(f"\n{len(faces)} frames ({'FaceMesh on ' + args.video if args.video else 'synthetic landmarks'})")
+    
+    print("\nParity (max absolute difference):")
+    parity = check_parity(faces)
+    for name, difference in parity.items():
+        print(f"  {name:28} {difference:.2e}  {'OK' if difference < 1e-9 else 'MISMATCH'}")
+    
+    print("\nCost per frame:")
+    for name, microseconds in benchmark(faces, args.repeats).items():
+        print(f"  {name:28} {microseconds:8.2f} us")
+
+if __name__ == "__main__":
+    main()
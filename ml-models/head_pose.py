@@ -0,0 +1,139 @@
+"""
+HEAD POSE FEATURES
+==================
+Pitch / yaw / roll per frame from a handful of MediaPipe landmarks, plus
+angular velocity - a 6-value alternative to the 9 raw coordinates.
+
+Nodding (YES) is a pitch rotation and shaking (NO) is a yaw rotation, so
+these features describe the gestures directly and don't depend on where
+the face sits in the frame or how far it is from the camera.
+
+How it works:
+    - Six landmarks (nose tip, chin, eye outer corners, mouth corners) are
+      matched to a generic 3D face model
+    - Observed points are converted to a common scale using the frame aspect
+      ratio, centered (removes position) and rigidly aligned to the model
+      with a batched Kabsch/Procrustes solve (one SVD per frame, vectorized
+      over any number of frames)
+    - Euler angles are read from the rotation matrix; angular velocity is the
+      frame-to-frame difference
+
+Used by:
+    - 2_extract_features.py --feature-mode head_pose
+    - 3_train_model.py (picks a tiny model for 6-feature input)
+    - The real-time scripts, when model_info.json says feature_mode=head_pose
+"""
+
+import numpy as np
+
+FEATURE_MODES = ["coords", "head_pose", "keypoints"]
+
+# MediaPipe indices: nose tip, chin, eye outer corners, mouth corners
+POSE_LANDMARKS = [1, 152, 33, 263, 61, 291]
+
+# Generic 3D face model (x right, y up, z toward the camera), same order
+MODEL_POINTS = np.array([
+    [0.0, 0.0, 0.0],          # nose tip
+    [0.0, -330.0, -65.0],     # chin
+    [-225.0, 170.0, -135.0],  # eye outer corner (image left)
+    [225.0, 170.0, -135.0],   # eye outer corner (image right)
+    [-150.0, -150.0, -125.0], # mouth corner (image left)
+    [150.0, -150.0, -125.0]   # mouth corner (image right)
+], dtype=np.float64)
+
+_MODEL_CENTERED = MODEL_POINTS - MODEL_POINTS.mean(axis=0)
+
+POSE_FEATURE_NAMES = ["pitch", "yaw", "roll", "pitch_velocity", "yaw_velocity", "roll_velocity"]
+
+def estimate_head_pose(points, aspect_ratio=16 / 9):
+    """
+    Estimate head rotation for one or many frames
+
+    Args:
+        points: Normalized MediaPipe coordinates of POSE_LANDMARKS,
+                shape (..., 6, 3)
+        aspect_ratio: Frame width / height (normalized x and y use different
+                      pixel scales)
+
+    Returns:
+        Angles in degrees, shape (..., 3): pitch, yaw, roll
+    """
+    points = np.asarray(points, dtype=np.float64)
+
+    # Same units on every axis, y up, z toward the camera
+    observed = np.empty_like(points)
+    observed[..., 0] = points[..., 0] * aspect_ratio
+    observed[..., 1] = -points[..., 1]
+    observed[..., 2] = -points[..., 2] * aspect_ratio
+    observed -= observed.mean(axis=-2, keepdims=True)
+
+    # Kabsch: rotation that best maps the model onto the observed points
+    covariance = np.swapaxes(_MODEL_CENTERED, -1, -2) @ observed
+    u, _, vt = np.linalg.svd(covariance)
+    v = np.swapaxes(vt, -1, -2)
+    ut = np.swapaxes(u, -1, -2)
+    d = np.sign(np.linalg.det(v @ ut))
+    correction = np.zeros(d.shape + (3, 3))
+    correction[..., 0, 0] = 1.0
+    correction[..., 1, 1] = 1.0
+    correction[..., 2, 2] = d
+    rotation = v @ correction @ ut
+
+    pitch = np.arctan2(rotation[..., 2, 1], rotation[..., 2, 2])
+    yaw = np.arcsin(np.clip(-rotation[..., 2, 0], -1.0, 1.0))
+    roll = np.arctan2(rotation[..., 1, 0], rotation[..., 0, 0])
+    return np.degrees(np.stack([pitch, yaw, roll], axis=-1))
+
+def pose_sequence_features(angles):
+    """
+    Add angular velocity to a sequence of angles
+
+    Args:
+        angles: Shape (num_frames, 3)
+
+    Returns:
+        Features of shape (num_frames, 6); the first frame has zero velocity
+    """
+    angles = np.asarray(angles)
+    velocity = np.diff(angles, axis=0, prepend=angles[:1])
+    return np.concatenate([angles, velocity], axis=-1)
+
+class HeadPoseFeatures:
+    """Per-frame head pose features with velocity from the previous frame"""
+
+    def __init__(self):
+        self.previous = None
+
+    def reset(self):
+        """Forget the previous frame (start of a new video)"""
+        self.previous = None
+
+    def __call__(self, face_landmarks, frame_shape):
+        """
+        Args:
+            face_landmarks: MediaPipe face landmarks (results.multi_face_landmarks[0])
+            frame_shape: Shape of the frame the landmarks came from
+
+        Returns:
+            numpy array of shape (6,): pitch, yaw, roll and their velocities
+        """
+        points = np.array([
+            [face_landmarks.landmark[idx].x, face_landmarks.landmark[idx].y, face_landmarks.landmark[idx].z]
+            for idx in POSE_LANDMARKS
+        ])
+        return self.from_points(points, frame_shape)
+
+    def from_points(self, points, frame_shape):
+        """
+        Same as calling with MediaPipe landmarks, from a landmark array
+
+        Args:
+            points: Normalized coordinates of POSE_LANDMARKS, shape (6, 3)
+            frame_shape: Shape of the frame the landmarks came from
+        """
+        height, width = frame_shape[:2]
+        angles = estimate_head_pose(points, aspect_ratio=width / height)
+
+        velocity = angles - self.previous if self.previous is not None else np.zeros(3)
+        self.previous = angles
+        return np.concatenate([angles, velocity])
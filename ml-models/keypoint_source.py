@@ -0,0 +1,108 @@
+"""
+FACE DETECTOR KEYPOINTS
+=======================
+A cheap landmark source: MediaPipe's short-range face detector and its six
+keypoints instead of the 478-point FaceMesh.
+
+The gesture features only follow a few points (nose, eyes, forehead,
+chin). The face detector already finds six of them - eyes, nose tip, mouth
+center and ears - for a fraction of FaceMesh's cost, especially with
+refine_landmarks=True. Feature mode "keypoints" builds a motion feature set
+from them; it needs its own trained model.
+
+Usage:
+    python 2_extract_features.py --feature-mode keypoints
+    python 3_train_model.py --model-path models/keypoints
+    python 4_test_model.py --model-path models/keypoints
+    python 2_extract_features.py --benchmark-sources   # Cost + accuracy vs FaceMesh
+
+Features (10 per frame):
+    - y of nose tip, mouth center, right eye, left eye   (nodding moves these)
+    - x of nose tip, mouth center, right eye, left eye   (shaking moves these)
+    - pitch ratio: where the nose sits between eye line and mouth (0..1)
+    - yaw ratio:   where the nose sits between the ears, centered on 0
+
+DetectorKeypoints.process() returns results shaped like FaceMesh results
+(multi_face_landmarks[0].landmark[i].x/.y/.z, z = 0), so the extractor, the
+real-time scripts and the keyframe tracker use it unchanged.
+"""
+
+from collections import namedtuple
+from types import SimpleNamespace
+
+import numpy as np
+
+# Keypoint order of MediaPipe face detection
+KEYPOINT_NAMES = ["right_eye", "left_eye", "nose_tip", "mouth_center", "right_ear", "left_ear"]
+RIGHT_EYE, LEFT_EYE, NOSE_TIP, MOUTH_CENTER, RIGHT_EAR, LEFT_EAR = range(6)
+
+KEYPOINT_FEATURE_NAMES = [
+    "nose_y", "mouth_y", "right_eye_y", "left_eye_y",
+    "nose_x", "mouth_x", "right_eye_x", "left_eye_x",
+    "pitch_ratio", "yaw_ratio"
+]
+
+_Keypoint = namedtuple("_Keypoint", ["x", "y", "z"])
+
+def keypoint_features(keypoints):
+    """
+    Per-frame features from detector keypoints, vectorized over frames
+    
+    Args:
+        keypoints: Normalized keypoints, shape (num_frames, 6, 2 or 3)
+    
+    Returns:
+        Features of shape (num_frames, 10), see KEYPOINT_FEATURE_NAMES
+    """
+    keypoints = np.asarray(keypoints, dtype=np.float64)
+    x = keypoints[..., 0]
+    y = keypoints[..., 1]
+    points = [NOSE_TIP, MOUTH_CENTER, RIGHT_EYE, LEFT_EYE]
+    
+    eye_line = (y[:, RIGHT_EYE] + y[:, LEFT_EYE]) / 2
+    eye_to_mouth = y[:, MOUTH_CENTER] - eye_line
+    ear_span = x[:, LEFT_EAR] - x[:, RIGHT_EAR]
+    
+    # Ratios of tiny spans are noise; report them as neutral (0.5 / 0)
+    pitch_ratio = np.where(
+        np.abs(eye_to_mouth) > 1e-6,
+        (y[:, NOSE_TIP] - eye_line) / np.where(np.abs(eye_to_mouth) > 1e-6, eye_to_mouth, 1.0),
+        0.5
+    )
+    yaw_ratio = np.where(
+        np.abs(ear_span) > 1e-6,
+        (x[:, NOSE_TIP] - x[:, RIGHT_EAR]) / np.where(np.abs(ear_span) > 1e-6, ear_span, 1.0) - 0.5,
+        0.0
+    )
+    return np.concatenate([y[:, points], x[:, points], pitch_ratio[:, None], yaw_ratio[:, None]], axis=1)
+
+class DetectorKeypoints:
+    """Short-range face detector with a FaceMesh-compatible process()"""
+    
+    def __init__(self, min_detection_confidence=0.5):
+        import mediapipe as mp
+        
+        # model_selection=0: short-range model (faces within ~2 m, webcam distance)
+        self.detector = mp.solutions.face_detection.FaceDetection(
+            model_selection=0,
+            min_detection_confidence=min_detection_confidence
+        )
+    
+    def process(self, rgb_frame):
+        """
+        Detect the most confident face
+        
+        Returns:
+            Object with multi_face_landmarks (None if no face); the face's
+            .landmark holds the six keypoints with z = 0
+        """
+        results = self.detector.process(rgb_frame)
+        if not results.detections:
+            return SimpleNamespace(multi_face_landmarks=None)
+        
+        detection = max(results.detections, key=lambda d: d.score[0])
+        keypoints = [_Keypoint(kp.x, kp.y, 0.0) for kp in detection.location_data.relative_keypoints]
+        return SimpleNamespace(multi_face_landmarks=[SimpleNamespace(landmark=keypoints)])
+    
+    def close(self):
+        self.detector.close()
@@ -0,0 +1,165 @@
+"""
+RAW LANDMARK ARCHIVE
+====================
+Keeps everything FaceMesh found in a video so feature changes never require
+decoding video again.
+
+Usage:
+    python 2_extract_features.py --archive                # Extract + archive landmarks
+    python 2_extract_features.py --from-archive --feature-mode head_pose
+                                                          # Derive a dataset in seconds
+    python landmark_archive.py                            # List archived videos
+
+Layout (data/landmarks/<hash[:2]>/<content hash>/):
+    - landmarks.npy:  (478, num_frames, 3) float16, normalized MediaPipe x/y/z,
+                      landmark-major (zeros where no face was found, and for
+                      the 10 iris points when extracted without
+                      refine_landmarks; keypoints-mode entries use the
+                      first 6 landmarks)
+    - mask.npy:       (num_frames,) bool, face detected
+    - timestamps.npy: (num_frames,) float64, frame time in milliseconds
+    - reused.npy:     (num_frames,) bool, landmarks reused from the previous
+                      frame (only for entries extracted with --gate)
+    - meta.json:      Source video, category, frame size, fps, layout
+
+Entries are keyed by the SHA-256 of the video file, so a renamed or moved
+video is still found and an edited one is re-extracted. Extraction profiles
+other than "full" (downscaled / decimated) get their own entry,
+<hash>-<profile>. Every array is a
+plain .npy file and is opened with mmap_mode='r'. Storing landmarks
+landmark-major makes each landmark's track one contiguous block, so deriving
+features from a handful of landmarks only pages in those blocks instead of
+every frame's full 478-point row. load() hands out a (num_frames, 478, 3)
+view either way; entries written before the layout was recorded in
+meta.json are frame-major on disk and still load.
+
+float16 keeps ~3 significant digits: about 0.3 px on a 1280x720 frame,
+well below FaceMesh's own frame-to-frame jitter.
+"""
+
+import json
+import shutil
+import hashlib
+import argparse
+import numpy as np
+from pathlib import Path
+
+NUM_LANDMARKS = 478
+LANDMARK_MAJOR = "landmark_major"
+ARCHIVE_ROOT = Path(__file__).parent / "data" / "landmarks"
+
+def video_content_hash(video_path, chunk_size=1 << 20):
+    """SHA-256 of a video file's bytes"""
+    digest = hashlib.sha256()
+    with open(str(video_path), 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class LandmarkArchive:
+    """Content-addressed store of per-video raw landmarks"""
+    
+    def __init__(self, root=ARCHIVE_ROOT):
+        self.root = Path(root)
+    
+    def entry_path(self, content_hash):
+        return self.root / content_hash[:2] / content_hash
+    
+    def contains(self, content_hash):
+        return (self.entry_path(content_hash) / "meta.json").exists()
+    
+    def write(self, content_hash, frames, timestamps, meta, reused=None):
+        """
+        Archive one video
+        
+        Args:
+            content_hash: video_content_hash of the source video (plus the
+                          profile suffix, see FeatureExtractor.archive_key)
+            frames: One (478, 3) or (468, 3) landmark array per frame, None
+                    where no face
+            timestamps: Frame times in milliseconds
+            meta: Source information (video, category, frame_shape, fps)
+            reused: Per-frame flags of frames that reused the previous
+                    landmarks (motion gate, frame_gate.py), or None
+        """
+        landmarks = np.zeros((NUM_LANDMARKS, len(frames), 3), dtype=np.float16)
+        mask = np.zeros(len(frames), dtype=bool)
+        for i, frame in enumerate(frames):
+            if frame is not None:
+                landmarks[:len(frame), i] = frame
+                mask[i] = True
+        
+        entry = self.entry_path(content_hash)
+        
+        # Write next to the final location, then rename, so readers never
+        # see a half-written entry
+        staging = entry.with_name(entry.name + ".partial")
+        if staging.exists():
+            shutil.rmtree(staging)
+        staging.mkdir(parents=True)
+        np.save(str(staging / "landmarks.npy"), landmarks)
+        np.save(str(staging / "mask.npy"), mask)
+        np.save(str(staging / "timestamps.npy"), np.asarray(timestamps, dtype=np.float64))
+        if reused is not None:
+            np.save(str(staging / "reused.npy"), np.asarray(reused, dtype=bool))
+        with open(str(staging / "meta.json"), 'w') as f:
+            json.dump(dict(meta, content_hash=content_hash, frames=len(frames), layout=LANDMARK_MAJOR),
+                      f, indent=2)
+        
+        if entry.exists():
+            shutil.rmtree(entry)
+        staging.rename(entry)
+    
+    def load(self, content_hash):
+        """
+        Open an archived video (memory-mapped)
+        
+        Returns:
+            Dictionary with landmarks (a (num_frames, 478, 3) view), mask,
+            timestamps and meta (and reused for entries extracted with the
+            motion gate)
+        """
+        entry = self.entry_path(content_hash)
+        with open(str(entry / "meta.json"), 'r') as f:
+            meta = json.load(f)
+        landmarks = np.load(str(entry / "landmarks.npy"), mmap_mode='r')
+        if meta.get("layout") == LANDMARK_MAJOR:
+            landmarks = landmarks.transpose(1, 0, 2)
+        loaded = {
+            "landmarks": landmarks,
+            "mask": np.load(str(entry / "mask.npy"), mmap_mode='r'),
+            "timestamps": np.load(str(entry / "timestamps.npy"), mmap_mode='r'),
+            "meta": meta
+        }
+        if (entry / "reused.npy").exists():
+            loaded["reused"] = np.load(str(entry / "reused.npy"), mmap_mode='r')
+        return loaded
+    
+    def entries(self):
+        """Metadata of every archived video"""
+        metas = []
+        for meta_file in sorted(self.root.glob("*/*/meta.json")):
+            with open(str(meta_file), 'r') as f:
+                metas.append(json.load(f))
+        return metas
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the raw landmark archive")
+    parser.add_argument("--root", default=str(ARCHIVE_ROOT))
+    args = parser.parse_args()
+    
+    archive = LandmarkArchive(args.root)
+    entries = archive.entries()
+    print(f"\n{len(entries)} videos archived in {archive.root}")
+    
+    total_bytes = 0
+    for meta in entries:
+        entry = archive.entry_path(meta["content_hash"])
+        size = sum(f.stat().st_size for f in entry.iterdir())
+        total_bytes += size
+        print(f"  {meta['content_hash'][:12]}  {meta.get('category', '?'):8} "
+              f"{meta['frames']:6} frames  {size / 1024 / 1024:6.1f} MB  {meta.get('video', '')}")
+    print(f"\nTotal: {total_bytes / 1024 / 1024:.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+KEYFRAME LANDMARK TRACKER
+=========================
+FaceMesh on keyframes only; the few landmarks the features use are carried
+through the frames in between with pyramidal Lucas-Kanade optical flow.
+
+FaceMesh is the dominant per-frame cost in extraction and in the webcam
+loop, but the features only need 5-6 of its 478 landmarks. Optical flow
+moves those few points for a fraction of the cost.
+
+Usage:
+    python landmark_tracker.py                        # Drift on every video
+    python landmark_tracker.py videos/yes/clip.mp4 --interval 10
+    python landmark_tracker.py --feature-mode head_pose --interval 3 5 10
+
+How it works:
+    - A keyframe runs FaceMesh (every `keyframe_interval` frames, on the
+      first frame, after the face was lost, and whenever tracking quality
+      drops)
+    - In between, the tracked landmarks' x/y move with cv2.calcOpticalFlowPyrLK
+      on the grayscale frame; z keeps its keyframe value (flow can't see
+      depth) and every other landmark keeps its keyframe position
+    - Quality check per frame: every point must be found and tracking it
+      back to the previous frame must land within `max_fb_error` pixels
+      (forward-backward check); otherwise this frame becomes a keyframe
+
+Drift report:
+    Runs full FaceMesh on every frame next to the tracker and reports the
+    pixel error of the tracked landmarks, plus the share of keyframes - the
+    landmark-inference cost relative to running FaceMesh on every frame.
+
+Used by:
+    - 2_extract_features.py --track N
+    - 4_test_model.py --track N
+"""
+
+import json
+import argparse
+import numpy as np
+from pathlib import Path
+
+import cv2
+
+from head_pose import FEATURE_MODES
+from gesture_features import FEATURE_LANDMARKS, landmarks_to_array
+
+# The landmarks each feature mode reads are the only ones worth tracking
+TRACKED_LANDMARKS = FEATURE_LANDMARKS
+
+LK_PARAMS = dict(
+    winSize=(21, 21),
+    maxLevel=3,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 30, 0.01)
+)
+
+def facemesh_detector(face_mesh, face_roi=None):
+    """
+    Keyframe detector from a FaceMesh instance (optionally through FaceROI)
+    
+    Returns:
+        Function BGR frame -> (478, 3) full-frame landmark array or None
+    """
+    def detect(frame):
+        if face_roi is not None:
+            results, _ = face_roi.process(frame)
+        else:
+            results = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if not results.multi_face_landmarks:
+            return None
+        return landmarks_to_array(results.multi_face_landmarks[0].landmark)
+    return detect
+
+class KeyframeTracker:
+    """Landmarks from keyframe FaceMesh runs plus optical flow in between"""
+    
+    def __init__(self, detect, landmark_indices, keyframe_interval=5, max_fb_error=1.0):
+        """
+        Args:
+            detect: Function BGR frame -> (N, 3) normalized landmarks or None
+                    (see facemesh_detector)
+            landmark_indices: Landmarks to track between keyframes
+            keyframe_interval: Run FaceMesh at least every this many frames
+            max_fb_error: Forward-backward error (pixels) that forces a keyframe
+        """
+        self.detect = detect
+        self.landmark_indices = list(landmark_indices)
+        self.keyframe_interval = keyframe_interval
+        self.max_fb_error = max_fb_error
+        self.frames = 0
+        self.keyframes = 0
+        self.reset()
+    
+    def reset(self):
+        """Forget the face (start of a new video)"""
+        self.landmarks = None
+        self.previous_gray = None
+        self.since_keyframe = 0
+    
+    def _keyframe(self, frame, gray):
+        self.keyframes += 1
+        self.since_keyframe = 0
+        self.landmarks = self.detect(frame)
+        self.previous_gray = gray if self.landmarks is not None else None
+        return self.landmarks
+    
+    def process(self, frame):
+        """
+        Landmarks for the next frame
+        
+        Args:
+            frame: Full BGR frame
+        
+        Returns:
+            (N, 3) normalized landmark array (tracked rows updated, the rest
+            from the last keyframe), or None if no face
+        """
+        self.frames += 1
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.since_keyframe += 1
+        
+        if self.landmarks is None or self.since_keyframe >= self.keyframe_interval:
+            return self._keyframe(frame, gray)
+        
+        height, width = gray.shape
+        scale = np.array([width, height], dtype=np.float32)
+        previous = (self.landmarks[self.landmark_indices, :2] * scale).astype(np.float32).reshape(-1, 1, 2)
+        
+        current, status, _ = cv2.calcOpticalFlowPyrLK(self.previous_gray, gray, previous, None, **LK_PARAMS)
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.previous_gray, current, None, **LK_PARAMS)
+        fb_error = np.linalg.norm((back - previous).reshape(-1, 2), axis=1)
+        if not (status.all() and back_status.all() and fb_error.max() <= self.max_fb_error):
+            return self._keyframe(frame, gray)
+        
+        landmarks = self.landmarks.copy()
+        landmarks[self.landmark_indices, :2] = current.reshape(-1, 2) / scale
+        self.landmarks = landmarks
+        self.previous_gray = gray
+        return landmarks
+    
+    @property
+    def keyframe_ratio(self):
+        """Share of frames that ran FaceMesh (the inference cost left)"""
+        return self.keyframes / self.frames if self.frames else 0.0
+
+def measure_drift(video_path, landmark_indices, keyframe_interval=5, max_fb_error=1.0):
+    """
+    Compare the tracker with full FaceMesh on every frame of a video
+    
+    Returns:
+        Dictionary with frame counts, keyframe ratio and pixel errors of the
+        tracked landmarks (mean, p95, max, mean per landmark), or None if the
+        video can't be opened
+    """
+    import mediapipe as mp
+    
+    def face_mesh():
+        return mp.solutions.face_mesh.FaceMesh(
+            max_num_faces=1, refine_landmarks=True,
+            min_detection_confidence=0.5, min_tracking_confidence=0.5
+        )
+    
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        return None
+    
+    reference = facemesh_detector(face_mesh())
+    tracker = KeyframeTracker(facemesh_detector(face_mesh()), landmark_indices,
+                              keyframe_interval, max_fb_error)
+    errors = []
+    missed = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        expected = reference(frame)
+        tracked = tracker.process(frame)
+        if expected is None:
+            continue
+        if tracked is None:
+            missed += 1
+            continue
+        pixels = np.array(frame.shape[1::-1], dtype=np.float64)
+        difference = (tracked[landmark_indices, :2] - expected[landmark_indices, :2]) * pixels
+        errors.append(np.linalg.norm(difference, axis=1))
+    cap.release()
+    
+    errors = np.array(errors).reshape(-1, len(landmark_indices))
+    return {
+        "video": str(video_path),
+        "frames": tracker.frames,
+        "keyframe_interval": keyframe_interval,
+        "keyframe_ratio": tracker.keyframe_ratio,
+        "missed_faces": missed,
+        "mean_px": float(errors.mean()) if errors.size else None,
+        "p95_px": float(np.percentile(errors, 95)) if errors.size else None,
+        "max_px": float(errors.max()) if errors.size else None,
+        "mean_px_per_landmark": {
+            str(idx): float(errors[:, i].mean()) for i, idx in enumerate(landmark_indices)
+        } if errors.size else {}
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure keyframe tracker drift against full FaceMesh")
+    parser.add_argument("videos", nargs="*",
+                        help="Videos to measure (default: everything under videos/)")
+    parser.add_argument("--interval", type=int, nargs="+", default=[5],
+                        help="Keyframe interval(s) to compare")
+    parser.add_argument("--feature-mode", choices=FEATURE_MODES, default="coords")
+    parser.add_argument("--max-fb-error", type=float, default=1.0,
+                        help="Forward-backward error in pixels that forces a keyframe")
+    parser.add_argument("--save", metavar="JSON", help="Write the full report to this file")
+    args = parser.parse_args()
+    
+    videos = args.videos or sorted(
+        str(path) for path in (Path(__file__).parent / "videos").glob("*/*")
+        if path.suffix.lower() in (".mp4", ".avi", ".mov")
+    )
+    landmark_indices = TRACKED_LANDMARKS[args.feature_mode]
+    
+    print("\n" + "="*60)
+    print(" "*15 + "KEYFRAME TRACKER DRIFT")
+    print("="*60)
+    print(f"\nTracked landmarks: {landmark_indices} ({args.feature_mode})")
+    
+    report = []
+    for interval in args.interval:
+        print(f"\nKeyframe interval {interval}:")
+        for video in videos:
+            result = measure_drift(video, landmark_indices, interval, args.max_fb_error)
+            if result is None:
+                print(f"  {Path(video).name}: could not open")
+                continue
+            report.append(result)
+            if result["mean_px"] is None:
+                print(f"  {Path(video).name}: no face found")
+                continue
+            print(f"  {Path(video).name:30} keyframes {result['keyframe_ratio'] * 100:5.1f}%  "
+                  f"drift mean {result['mean_px']:.2f}px  p95 {result['p95_px']:.2f}px  "
+                  f"max {result['max_px']:.2f}px")
+        
+        measured = [r for r in report if r["keyframe_interval"] == interval and r["mean_px"] is not None]
+        if measured:
+            frames = sum(r["frames"] for r in measured)
+            keyframes = sum(r["keyframe_ratio"] * r["frames"] for r in measured)
+            print(f"  Overall: FaceMesh on {keyframes / frames * 100:.1f}% of frames "
+                  f"({frames / max(keyframes, 1):.1f}x fewer runs), "
+                  f"mean drift {np.mean([r['mean_px'] for r in measured]):.2f}px")
+    
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to: {args.save}")
+
+if __name__ == "__main__":
+    main()
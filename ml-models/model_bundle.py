@@ -0,0 +1,533 @@
+"""
+MODEL BUNDLE
+============
+Versioned, content-addressed model artifact that loads without HDF5 or
+TensorFlow.
+
+Usage:
+    python model_bundle.py export                # models/gesture_classifier.h5 -> bundle
+    python model_bundle.py verify                # Check bundle hash and parity with Keras
+    python model_bundle.py info                  # Print the current bundle manifest
+
+Layout (models/bundles/<content hash>/):
+    - bundle.json: Manifest
+        format_version, content_hash
+        input_signature: window shape and dtype
+        feature_spec:    how a frame becomes a feature vector (mode, landmark
+                         IDs, axes and order)
+        label_map:       class index -> gesture name
+        layers:          layer type, config and weight offsets
+    - weights.bin: All weights as raw little-endian float32, 64-byte aligned
+    - models/bundles/CURRENT: Name of the bundle consumers should load
+      (removed when a retrained model can't be exported)
+
+Consumers only use the bundle when its name matches the "bundle" hash in
+model_info.json (load_model_bundle()); otherwise they fall back to the H5
+file of the model that was actually trained last.
+
+Loading maps weights.bin with np.memmap (no parsing, no copies) and runs the
+network with a small NumPy runtime (LSTM, GRU, Conv1D, Dense,
+BatchNormalization, Dropout, Flatten, Cropping1D). A consumer passes the
+feature spec it produces; a model trained on different features is rejected
+at load time instead of silently producing wrong predictions.
+"""
+
+import json
+import shutil
+import hashlib
+import argparse
+import numpy as np
+from pathlib import Path
+
+from head_pose import POSE_LANDMARKS, POSE_FEATURE_NAMES
+from keypoint_source import KEYPOINT_FEATURE_NAMES
+
+FORMAT_VERSION = 1
+BUNDLE_ROOT = Path(__file__).parent / "models" / "bundles"
+WEIGHT_ALIGNMENT = 64
+
+# Feature specs: one entry per feature, in model input order
+COORDS_FEATURE_SPEC = {
+    "mode": "coords",
+    "landmarks": [1, 10, 152, 1, 33, 263, 1, 10, 152],
+    "axes": ["y", "y", "y", "x", "x", "x", "z", "z", "z"],
+    "names": ["nose_y", "forehead_y", "chin_y", "nose_x", "left_eye_x", "right_eye_x",
+              "nose_z", "forehead_z", "chin_z"]
+}
+
+HEAD_POSE_FEATURE_SPEC = {
+    "mode": "head_pose",
+    "landmarks": list(POSE_LANDMARKS),
+    "axes": None,
+    "names": list(POSE_FEATURE_NAMES)
+}
+
+# Face detector keypoints (keypoint_source.py) instead of FaceMesh landmarks
+KEYPOINTS_FEATURE_SPEC = {
+    "mode": "keypoints",
+    "landmarks": list(range(6)),
+    "axes": None,
+    "names": list(KEYPOINT_FEATURE_NAMES)
+}
+
+def feature_spec_for_mode(feature_mode):
+    """Feature spec produced by 2_extract_features.py for a feature mode"""
+    specs = {"coords": COORDS_FEATURE_SPEC, "head_pose": HEAD_POSE_FEATURE_SPEC,
+             "keypoints": KEYPOINTS_FEATURE_SPEC}
+    if feature_mode not in specs:
+        raise ValueError(f"Unknown feature mode '{feature_mode}'")
+    return dict(specs[feature_mode])
+
+def check_feature_spec(bundle_spec, expected_spec):
+    """Raise ValueError if a consumer's feature spec doesn't match the model's"""
+    for key in ("mode", "landmarks", "axes"):
+        if bundle_spec.get(key) != expected_spec.get(key):
+            raise ValueError(
+                f"Feature spec mismatch on '{key}':\n"
+                f"   model expects: {bundle_spec.get(key)}\n"
+                f"   consumer gives: {expected_spec.get(key)}\n"
+                "Re-extract features / retrain with the matching feature mode"
+            )
+
+# ---------------------------------------------------------------------------
+# NumPy runtime
+# ---------------------------------------------------------------------------
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "tanh": np.tanh,
+    "sigmoid": _sigmoid,
+    "softmax": _softmax
+}
+
+def _lstm(x, config, kernel, recurrent_kernel, bias=None):
+    units = config["units"]
+    activation = ACTIVATIONS[config["activation"]]
+    recurrent_activation = ACTIVATIONS[config["recurrent_activation"]]
+    
+    # Input projection for every timestep at once
+    projected = x @ kernel
+    if bias is not None:
+        projected = projected + bias
+    
+    h = np.zeros((x.shape[0], units), dtype=np.float32)
+    c = np.zeros_like(h)
+    outputs = []
+    for t in range(x.shape[1]):
+        z = projected[:, t] + h @ recurrent_kernel
+        i = recurrent_activation(z[:, :units])
+        f = recurrent_activation(z[:, units:2 * units])
+        g = activation(z[:, 2 * units:3 * units])
+        o = recurrent_activation(z[:, 3 * units:])
+        c = f * c + i * g
+        h = o * activation(c)
+        outputs.append(h)
+    return np.stack(outputs, axis=1) if config["return_sequences"] else h
+
+def _gru(x, config, kernel, recurrent_kernel, bias=None):
+    units = config["units"]
+    activation = ACTIVATIONS[config["activation"]]
+    recurrent_activation = ACTIVATIONS[config["recurrent_activation"]]
+    reset_after = config.get("reset_after", True)
+    
+    if bias is None:
+        input_bias = recurrent_bias = np.zeros(3 * units, dtype=np.float32)
+    elif reset_after:
+        input_bias, recurrent_bias = bias[0], bias[1]
+    else:
+        input_bias, recurrent_bias = bias, np.zeros(3 * units, dtype=np.float32)
+    projected = x @ kernel + input_bias
+    
+    h = np.zeros((x.shape[0], units), dtype=np.float32)
+    outputs = []
+    for t in range(x.shape[1]):
+        xz, xr, xh = np.split(projected[:, t], 3, axis=-1)
+        if reset_after:
+            hz, hr, hh = np.split(h @ recurrent_kernel + recurrent_bias, 3, axis=-1)
+            z = recurrent_activation(xz + hz)
+            r = recurrent_activation(xr + hr)
+            candidate = activation(xh + r * hh)
+        else:
+            hz, hr = np.split(h @ recurrent_kernel[:, :2 * units], 2, axis=-1)
+            z = recurrent_activation(xz + hz)
+            r = recurrent_activation(xr + hr)
+            candidate = activation(xh + (r * h) @ recurrent_kernel[:, 2 * units:])
+        h = z * h + (1 - z) * candidate
+        outputs.append(h)
+    return np.stack(outputs, axis=1) if config["return_sequences"] else h
+
+def _conv1d(x, config, kernel, bias=None):
+    kernel_size = kernel.shape[0]
+    dilation = config["dilation_rate"]
+    span = (kernel_size - 1) * dilation
+    
+    if config["padding"] == "causal":
+        x = np.pad(x, ((0, 0), (span, 0), (0, 0)))
+    elif config["padding"] == "same":
+        x = np.pad(x, ((0, 0), (span // 2, span - span // 2), (0, 0)))
+    
+    steps = x.shape[1] - span
+    out = np.zeros((x.shape[0], steps, kernel.shape[2]), dtype=np.float32)
+    for k in range(kernel_size):
+        out += x[:, k * dilation:k * dilation + steps] @ kernel[k]
+    if bias is not None:
+        out += bias
+    return ACTIVATIONS[config["activation"]](out)
+
+def _dense(x, config, kernel, bias=None):
+    out = x @ kernel
+    if bias is not None:
+        out = out + bias
+    return ACTIVATIONS[config["activation"]](out)
+
+def _batch_norm(x, config, *weights):
+    weights = list(weights)
+    gamma = weights.pop(0) if config["scale"] else 1.0
+    beta = weights.pop(0) if config["center"] else 0.0
+    mean, variance = weights
+    return (x - mean) / np.sqrt(variance + config["epsilon"]) * gamma + beta
+
+def _cropping1d(x, config):
+    start, end = config["cropping"]
+    return x[:, start:x.shape[1] - end]
+
+LAYER_RUNTIME = {
+    "LSTM": _lstm,
+    "GRU": _gru,
+    "Conv1D": _conv1d,
+    "Dense": _dense,
+    "BatchNormalization": _batch_norm,
+    "Cropping1D": _cropping1d,
+    "Flatten": lambda x, config: x.reshape(x.shape[0], -1),
+    "Dropout": lambda x, config: x
+}
+
+# Config keys each layer type needs at inference time
+LAYER_CONFIG_KEYS = {
+    "LSTM": ["units", "activation", "recurrent_activation", "return_sequences", "use_bias"],
+    "GRU": ["units", "activation", "recurrent_activation", "return_sequences", "use_bias", "reset_after"],
+    "Conv1D": ["kernel_size", "dilation_rate", "padding", "strides", "activation", "use_bias"],
+    "Dense": ["activation", "use_bias"],
+    "BatchNormalization": ["axis", "epsilon", "center", "scale"],
+    "Cropping1D": ["cropping"],
+    "Flatten": [],
+    "Dropout": []
+}
+
+def _layer_kind(layer):
+    """Runtime layer type, looking through subclasses such as CompatibleLSTM"""
+    for cls in type(layer).__mro__:
+        if cls.__name__ in LAYER_CONFIG_KEYS or cls.__name__ == "InputLayer":
+            return cls.__name__
+    raise ValueError(
+        f"Layer '{layer.name}' ({type(layer).__name__}) is not supported by the bundle runtime"
+    )
+
+def _layer_config(layer):
+    """Inference config of a Keras layer, or ValueError if the runtime can't run it"""
+    kind = _layer_kind(layer)
+    
+    full = layer.get_config()
+    config = {key: full[key] for key in LAYER_CONFIG_KEYS[kind] if key in full}
+    for key in ("kernel_size", "dilation_rate", "strides"):
+        if isinstance(config.get(key), (list, tuple)):
+            config[key] = config[key][0]
+    if isinstance(config.get("axis"), (list, tuple)):
+        config["axis"] = config["axis"][0]
+    
+    if full.get("go_backwards") or full.get("stateful"):
+        raise ValueError(f"Layer '{layer.name}': go_backwards/stateful RNNs are not supported")
+    if kind == "Conv1D" and config["strides"] != 1:
+        raise ValueError(f"Layer '{layer.name}': strided convolutions are not supported")
+    if kind == "BatchNormalization" and config["axis"] not in (-1, len(layer.input.shape) - 1):
+        raise ValueError(f"Layer '{layer.name}': only last-axis batch normalization is supported")
+    for key in ("activation", "recurrent_activation"):
+        if key in config and config[key] not in ACTIVATIONS:
+            raise ValueError(f"Layer '{layer.name}': activation '{config[key]}' is not supported")
+    return kind, config
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def _content_hash(manifest, weights_bytes):
+    manifest = {key: value for key, value in manifest.items() if key != "content_hash"}
+    digest = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode("utf-8"))
+    digest.update(weights_bytes)
+    return digest.hexdigest()
+
+def export_bundle(model, feature_spec, label_map, bundle_root=BUNDLE_ROOT):
+    """
+    Write a Keras model as a content-addressed bundle and make it CURRENT
+    
+    Args:
+        model: Trained Keras Sequential model
+        feature_spec: Feature spec of the training data (see feature_spec_for_mode)
+        label_map: Class index -> gesture name
+        bundle_root: Directory holding all bundles
+    
+    Returns:
+        Path of the bundle directory
+    """
+    bundle_root = Path(bundle_root)
+    layers = []
+    chunks = []
+    offset = 0
+    
+    for layer in model.layers:
+        if _layer_kind(layer) == "InputLayer":
+            continue
+        kind, config = _layer_config(layer)
+        weights = []
+        for variable, array in zip(layer.weights, layer.get_weights()):
+            array = np.ascontiguousarray(array, dtype="<f4")
+            padding = -offset % WEIGHT_ALIGNMENT
+            chunks.append(b"\0" * padding)
+            offset += padding
+            weights.append({
+                "name": variable.name.split("/")[-1].split(":")[0],
+                "offset": offset,
+                "shape": list(array.shape)
+            })
+            chunks.append(array.tobytes())
+            offset += array.nbytes
+        layers.append({"name": layer.name, "class": kind, "config": config, "weights": weights})
+    
+    weights_bytes = b"".join(chunks)
+    input_shape = [int(dim) for dim in model.input_shape[1:]]
+    if len(feature_spec["names"]) != input_shape[-1]:
+        raise ValueError(
+            f"Feature spec has {len(feature_spec['names'])} features but the model takes {input_shape[-1]}"
+        )
+    
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "input_signature": {"shape": input_shape, "dtype": "float32"},
+        "feature_spec": feature_spec,
+        "label_map": {str(k): v for k, v in label_map.items()},
+        "weights_file": "weights.bin",
+        "weights_bytes": len(weights_bytes),
+        "layers": layers
+    }
+    manifest["content_hash"] = _content_hash(manifest, weights_bytes)
+    
+    bundle_dir = bundle_root / manifest["content_hash"][:16]
+    if not bundle_dir.exists():
+        # Write to a temporary directory first so a half-written bundle is never visible
+        staging = bundle_root / (bundle_dir.name + ".partial")
+        if staging.exists():
+            shutil.rmtree(staging)
+        staging.mkdir(parents=True)
+        with open(str(staging / "weights.bin"), 'wb') as f:
+            f.write(weights_bytes)
+        with open(str(staging / "bundle.json"), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        staging.rename(bundle_dir)
+    
+    with open(str(bundle_root / "CURRENT"), 'w') as f:
+        f.write(bundle_dir.name + "\n")
+    return bundle_dir
+
+# ---------------------------------------------------------------------------
+# Loading
+# ---------------------------------------------------------------------------
+
+def resolve_bundle(path=BUNDLE_ROOT):
+    """Bundle directory for a bundle root (via CURRENT) or a bundle directory"""
+    path = Path(path)
+    if (path / "bundle.json").exists():
+        return path
+    current = path / "CURRENT"
+    if not current.exists():
+        raise FileNotFoundError(
+            f"No model bundle found in {path}\n"
+            "Train a model with '3_train_model.py' or run 'python model_bundle.py export'"
+        )
+    with open(str(current), 'r') as f:
+        return path / f.read().strip()
+
+def bundle_exists(path=BUNDLE_ROOT):
+    path = Path(path)
+    return (path / "bundle.json").exists() or (path / "CURRENT").exists()
+
+def clear_current(bundle_root=BUNDLE_ROOT):
+    """Stop serving the CURRENT bundle (e.g. the new model couldn't be exported)"""
+    current = Path(bundle_root) / "CURRENT"
+    if current.exists():
+        current.unlink()
+
+def load_model_bundle(model_path="models", expected_feature_spec=None):
+    """
+    The CURRENT bundle, if it is the bundle of the model in model_info.json
+    
+    A retrained model whose export failed (or an older bundle left behind)
+    must not be served in place of the H5 model that was just trained.
+    
+    Args:
+        model_path: Model folder with model_info.json and bundles/
+        expected_feature_spec: Passed to ModelBundle.load
+    
+    Returns:
+        ModelBundle, or None to fall back to gesture_classifier.h5
+    """
+    model_path = Path(model_path)
+    bundle_root = model_path / "bundles"
+    info_file = model_path / "model_info.json"
+    if not bundle_exists(bundle_root) or not info_file.exists():
+        return None
+    with open(str(info_file), 'r') as f:
+        expected = json.load(f).get("bundle")
+    if expected is None or resolve_bundle(bundle_root).name != expected:
+        return None
+    return ModelBundle.load(bundle_root, expected_feature_spec)
+
+class ModelBundle:
+    """Memory-mapped model bundle with a Keras-like predict()"""
+    
+    def __init__(self, bundle_dir, manifest, weights):
+        self.bundle_dir = Path(bundle_dir)
+        self.manifest = manifest
+        self.content_hash = manifest["content_hash"]
+        self.input_shape = tuple(manifest["input_signature"]["shape"])
+        self.feature_spec = manifest["feature_spec"]
+        self.feature_mode = self.feature_spec["mode"]
+        self.label_map = {int(k): v for k, v in manifest["label_map"].items()}
+        self._weights = weights
+        self._layers = [
+            (LAYER_RUNTIME[layer["class"]], layer["config"], [
+                weights[offset:offset + int(np.prod(shape))].reshape(shape)
+                for offset, shape in ((w["offset"] // 4, w["shape"]) for w in layer["weights"])
+            ])
+            for layer in manifest["layers"]
+        ]
+    
+    @classmethod
+    def load(cls, path=BUNDLE_ROOT, expected_feature_spec=None, verify=False):
+        """
+        Map a bundle into memory
+        
+        Args:
+            path: Bundle root (uses CURRENT) or a bundle directory
+            expected_feature_spec: Feature spec the caller will feed; a
+                                   mismatch raises ValueError
+            verify: Recompute the content hash (reads every weight byte)
+        
+        Returns:
+            ModelBundle
+        """
+        bundle_dir = resolve_bundle(path)
+        with open(str(bundle_dir / "bundle.json"), 'r') as f:
+            manifest = json.load(f)
+        
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported bundle format {manifest.get('format_version')} (expected {FORMAT_VERSION})"
+            )
+        
+        weights_file = bundle_dir / manifest["weights_file"]
+        if weights_file.stat().st_size != manifest["weights_bytes"]:
+            raise ValueError(f"{weights_file} is truncated or corrupted")
+        if manifest["weights_bytes"] > 0:
+            weights = np.memmap(str(weights_file), dtype="<f4", mode='r')
+        else:
+            weights = np.zeros(0, dtype="<f4")
+        
+        if verify and _content_hash(manifest, weights.tobytes()) != manifest["content_hash"]:
+            raise ValueError(f"Content hash mismatch for bundle {bundle_dir}")
+        
+        if expected_feature_spec is not None:
+            check_feature_spec(manifest["feature_spec"], expected_feature_spec)
+        
+        return cls(bundle_dir, manifest, weights)
+    
+    def predict(self, X, verbose=0):
+        """
+        Class probabilities for a batch of windows
+        
+        Args:
+            X: Windows of shape (num_windows,) + input_shape
+            verbose: Ignored; accepted for Keras compatibility
+        
+        Returns:
+            Probabilities of shape (num_windows, num_classes)
+        """
+        x = np.asarray(X, dtype=np.float32)
+        if x.shape[1:] != self.input_shape:
+            raise ValueError(f"Expected windows of shape {self.input_shape}, got {x.shape[1:]}")
+        for run, config, weights in self._layers:
+            x = run(x, config, *weights)
+        return x
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def export_from_h5(model_path="models"):
+    """Export the trained H5 model (with model_info.json) as the CURRENT bundle"""
+    from predict_gesture import load_keras_model
+    
+    model_path = Path(model_path)
+    with open(str(model_path / "model_info.json"), 'r') as f:
+        info = json.load(f)
+    model = load_keras_model(model_path / "gesture_classifier.h5")
+    
+    bundle_dir = export_bundle(
+        model, feature_spec_for_mode(info.get("feature_mode", "coords")),
+        info["label_map"], model_path / "bundles"
+    )
+    
+    # Consumers only load the bundle recorded for the trained model
+    info["bundle"] = bundle_dir.name
+    with open(str(model_path / "model_info.json"), 'w') as f:
+        json.dump(info, f, indent=2)
+    print(f"✅ Bundle written to: {bundle_dir}")
+    return bundle_dir
+
+def verify_bundle(model_path="models", num_samples=64):
+    """Check the CURRENT bundle's hash and its predictions against the H5 model"""
+    import time
+    from predict_gesture import load_keras_model
+    
+    model_path = Path(model_path)
+    start = time.perf_counter()
+    bundle = ModelBundle.load(model_path / "bundles", verify=True)
+    bundle_load = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    model = load_keras_model(model_path / "gesture_classifier.h5")
+    h5_load = time.perf_counter() - start
+    
+    X = np.random.default_rng(0).normal(size=(num_samples,) + bundle.input_shape).astype(np.float32)
+    deviation = float(np.max(np.abs(bundle.predict(X) - model.predict(X, verbose=0))))
+    
+    print(f"Bundle:    {bundle.bundle_dir.name} (hash verified)")
+    print(f"Load time: bundle {bundle_load*1000:.1f} ms  |  H5 {h5_load*1000:.1f} ms")
+    print(f"Max probability deviation vs Keras: {deviation:.2e} on {num_samples} windows")
+    return deviation
+
+def main():
+    parser = argparse.ArgumentParser(description="Export, verify or inspect model bundles")
+    parser.add_argument("command", choices=["export", "verify", "info"])
+    parser.add_argument("--model-path", default=str(Path(__file__).parent / "models"))
+    args = parser.parse_args()
+    
+    if args.command == "export":
+        export_from_h5(args.model_path)
+    elif args.command == "verify":
+        verify_bundle(args.model_path)
+    else:
+        bundle = ModelBundle.load(Path(args.model_path) / "bundles")
+        manifest = dict(bundle.manifest)
+        manifest["layers"] = [f"{layer['name']} ({layer['class']})" for layer in manifest["layers"]]
+        print(json.dumps(manifest, indent=2))
+
+if __name__ == "__main__":
+    main()
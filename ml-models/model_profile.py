@@ -0,0 +1,207 @@
+"""
+MODEL PERFORMANCE PROFILE
+=========================
+Measures what a trained model costs to run, so models can be compared on
+cost as well as accuracy. 3_train_model.py stores the result under
+"performance" in model_info.json.
+
+Usage:
+    python model_profile.py                     # Profile models/gesture_classifier.h5
+    python model_profile.py --model-path models/streaming
+    python model_profile.py --save              # Also update model_info.json
+
+What it measures:
+    - Batch-1 latency (p50 / p99) of model.predict, the real-time call
+    - Batch-64 throughput in windows per second
+    - FLOPs per window, counted analytically from the layer shapes
+      (one multiply-add = 2 FLOPs; activations and gates not counted)
+    - Model file size
+    - Peak resident memory of a fresh process after loading the model
+    - Training throughput in samples/sec per epoch (recorded by
+      3_train_model.py while fitting)
+"""
+
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import numpy as np
+from pathlib import Path
+
+def _layer_flops(layer):
+    """FLOPs of one layer for a single window"""
+    kinds = [cls.__name__ for cls in type(layer).__mro__]
+    input_shape = [int(dim) for dim in layer.input.shape[1:]]
+    output_shape = [int(dim) for dim in layer.output.shape[1:]]
+    
+    if "LSTM" in kinds or "GRU" in kinds:
+        gates = 4 if "LSTM" in kinds else 3
+        units = layer.units
+        steps, features = input_shape
+        return 2 * steps * gates * units * (features + units)
+    if "Conv1D" in kinds:
+        kernel = layer.kernel.shape
+        steps, filters = output_shape
+        return 2 * steps * int(kernel[0]) * int(kernel[1]) * filters
+    if "Dense" in kinds:
+        rows = int(np.prod(input_shape[:-1])) if len(input_shape) > 1 else 1
+        return 2 * rows * input_shape[-1] * output_shape[-1]
+    if "BatchNormalization" in kinds:
+        return 2 * int(np.prod(input_shape))
+    return 0
+
+def count_flops(model):
+    """Total FLOPs for one window through a Keras model"""
+    return int(sum(_layer_flops(layer) for layer in model.layers))
+
+def latency_profile(model, input_shape, runs=100, warmup=10, batch_size=64):
+    """
+    Batch-1 latency percentiles and batched throughput
+    
+    Args:
+        model: Anything with a Keras-style predict(X, verbose=0)
+        input_shape: Window shape (sequence_length, num_features)
+        runs: Timed batch-1 calls
+        warmup: Untimed calls first (graph tracing, caches)
+        batch_size: Batch size for the throughput measurement
+    
+    Returns:
+        Dictionary with latency and throughput numbers
+    """
+    rng = np.random.default_rng(0)
+    single = rng.normal(size=(1,) + tuple(input_shape)).astype(np.float32)
+    batch = rng.normal(size=(batch_size,) + tuple(input_shape)).astype(np.float32)
+    
+    for _ in range(warmup):
+        model.predict(single, verbose=0)
+    
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model.predict(single, verbose=0)
+        timings.append((time.perf_counter() - start) * 1000)
+    
+    model.predict(batch, verbose=0)
+    batch_runs = max(runs // 10, 5)
+    start = time.perf_counter()
+    for _ in range(batch_runs):
+        model.predict(batch, verbose=0)
+    batch_time = time.perf_counter() - start
+    
+    return {
+        "batch1_latency_ms_p50": float(np.percentile(timings, 50)),
+        "batch1_latency_ms_p99": float(np.percentile(timings, 99)),
+        f"batch{batch_size}_throughput_windows_per_sec": batch_runs * batch_size / batch_time
+    }
+
+# Loads the model in a clean interpreter and prints its peak RSS in MB
+_RSS_PROBE = """
+import os, sys, resource
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+sys.path.insert(0, sys.argv[2])
+from predict_gesture import load_keras_model
+load_keras_model(sys.argv[1])
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024)
+"""
+
+def peak_rss_after_load(model_file):
+    """
+    Peak resident memory (MB) of a fresh Python process that loads the model
+    
+    Returns None where the resource module isn't available (Windows).
+    """
+    if platform.system() == "Windows":
+        return None
+    
+    result = subprocess.run(
+        [sys.executable, "-c", _RSS_PROBE, str(model_file), str(Path(__file__).parent)],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(f"  Peak RSS measurement failed: {result.stderr.strip().splitlines()[-1:]}")
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+def profile_model(model, model_file, input_shape, epoch_throughput=None):
+    """
+    Full performance profile of a trained model
+    
+    Args:
+        model: Trained Keras model
+        model_file: Saved model file (size and load-memory measurements)
+        input_shape: Window shape (sequence_length, num_features)
+        epoch_throughput: Training samples/sec per epoch, if recorded
+    
+    Returns:
+        Dictionary for the "performance" section of model_info.json
+    """
+    model_file = Path(model_file)
+    profile = latency_profile(model, input_shape)
+    profile["flops_per_window"] = count_flops(model)
+    profile["model_file_bytes"] = model_file.stat().st_size
+    profile["peak_rss_mb_after_load"] = peak_rss_after_load(model_file)
+    if epoch_throughput is not None:
+        profile["training_samples_per_sec_per_epoch"] = [float(rate) for rate in epoch_throughput]
+    profile["machine"] = {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "python": platform.python_version()
+    }
+    return profile
+
+def print_profile(profile):
+    """Print a profile in the training-report style"""
+    throughput_key = next(key for key in profile if key.endswith("_throughput_windows_per_sec"))
+    print(f"  Batch-1 latency:   p50 {profile['batch1_latency_ms_p50']:.2f} ms  |  "
+          f"p99 {profile['batch1_latency_ms_p99']:.2f} ms")
+    print(f"  Batch throughput:  {profile[throughput_key]:.0f} windows/sec "
+          f"({throughput_key.split('_')[0]})")
+    print(f"  FLOPs per window:  {profile['flops_per_window']:,}")
+    print(f"  Model file size:   {profile['model_file_bytes'] / 1024:.1f} KB")
+    if profile.get("peak_rss_mb_after_load") is not None:
+        print(f"  Peak RSS on load:  {profile['peak_rss_mb_after_load']:.0f} MB")
+    if profile.get("training_samples_per_sec_per_epoch"):
+        rates = profile["training_samples_per_sec_per_epoch"]
+        print(f"  Training speed:    {np.median(rates):.0f} samples/sec "
+              f"(median of {len(rates)} epochs)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile a trained gesture model")
+    parser.add_argument("--model-path", default=str(Path(__file__).parent / "models"))
+    parser.add_argument("--save", action="store_true",
+                        help="Write the profile into model_info.json")
+    args = parser.parse_args()
+    
+    from predict_gesture import load_keras_model
+    
+    model_path = Path(args.model_path)
+    model_file = model_path / "gesture_classifier.h5"
+    info_file = model_path / "model_info.json"
+    model = load_keras_model(model_file)
+    
+    info = {}
+    if info_file.exists():
+        with open(str(info_file), 'r') as f:
+            info = json.load(f)
+    
+    # Keep training throughput from the training run; it can't be re-measured here
+    previous = info.get("performance", {})
+    profile = profile_model(
+        model, model_file, model.input_shape[1:],
+        previous.get("training_samples_per_sec_per_epoch")
+    )
+    
+    print("\nPerformance profile:")
+    print_profile(profile)
+    
+    if args.save:
+        info["performance"] = profile
+        with open(str(info_file), 'w') as f:
+            json.dump(info, f, indent=2)
+        print(f"\nProfile saved to: {info_file}")
+
+if __name__ == "__main__":
+    main()
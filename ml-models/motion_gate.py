@@ -0,0 +1,377 @@
+"""
+MOTION-STATISTICS GATE
+======================
+Cheap first stage of a two-stage cascade in front of the LSTM.
+
+Usage:
+    python motion_gate.py                  # Fit gate for 99% agreement with the model
+    python motion_gate.py --target 0.98    # Trade agreement for a higher hit rate
+
+What it does:
+    - Computes per-window motion statistics in one vectorized pass:
+      vertical range (nose/forehead/chin y) and horizontal range
+      (nose/eye x), plus their ratio
+    - Classifies obvious windows directly:
+        NEUTRAL: overall motion below a threshold
+        YES:     vertical motion dominates horizontal by a ratio
+        NO:      horizontal motion dominates vertical by a ratio
+    - Sends everything else (ambiguous windows) to the LSTM
+    - Fits the thresholds on the training data so each gate rule agrees
+      with the LSTM's own predictions at least `target` of the time
+    - Reports gate hit rate, agreement and the resulting average cost
+
+Output:
+    - models/motion_gate.json: Fitted thresholds, the feature mode and model
+      they were fit for, and the fit report
+
+Used by:
+    - predict_gesture.py, through CascadeClassifier; the gate is skipped
+      unless it was fit for the current coords model (MotionGate.matches)
+"""
+
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+
+from dataset_io import DATASET_DIR, load_training_data
+
+GATE_FILE = Path(__file__).parent / "models" / "motion_gate.json"
+
+# Feature layout of the 9-feature coordinate mode (see 2_extract_features.py)
+VERTICAL_CHANNELS = [0, 1, 2]     # nose_y, forehead_y, chin_y
+HORIZONTAL_CHANNELS = [3, 4, 5]   # nose_x, left_eye_x, right_eye_x
+
+LABEL_YES, LABEL_NO, LABEL_NEUTRAL = 0, 1, 2
+AMBIGUOUS = -1
+
+def motion_statistics(X, vertical_channels=VERTICAL_CHANNELS, horizontal_channels=HORIZONTAL_CHANNELS):
+    """
+    Per-window motion statistics
+    
+    Args:
+        X: Windows of shape (num_windows, sequence_length, num_features)
+    
+    Returns:
+        vertical: Mean peak-to-peak range of the vertical channels
+        horizontal: Mean peak-to-peak range of the horizontal channels
+    """
+    X = np.asarray(X)
+    ranges = np.ptp(X, axis=1)
+    vertical = ranges[:, vertical_channels].mean(axis=1)
+    horizontal = ranges[:, horizontal_channels].mean(axis=1)
+    return vertical, horizontal
+
+def _fit_threshold(scores, agrees, target):
+    """
+    Largest prefix of windows (sorted by score) whose agreement stays >= target
+    
+    Returns:
+        Threshold between the last accepted and first rejected score, or None
+    """
+    order = np.argsort(scores)
+    running = np.cumsum(agrees[order]) / np.arange(1, len(order) + 1)
+    accepted = np.nonzero(running >= target)[0]
+    if len(accepted) == 0:
+        return None
+    last = accepted[-1]
+    if last + 1 < len(order):
+        return float((scores[order[last]] + scores[order[last + 1]]) / 2)
+    return float(scores[order[last]])
+
+def model_identity(model_info):
+    """What identifies a trained model in model_info.json (bundle hash and training date)"""
+    return {"bundle": model_info.get("bundle"), "training_date": model_info.get("training_date")}
+
+class MotionGate:
+    """Vectorized rule gate; windows it can't decide are marked AMBIGUOUS"""
+    
+    def __init__(self, neutral_max, yes_ratio, no_ratio,
+                 vertical_channels=VERTICAL_CHANNELS, horizontal_channels=HORIZONTAL_CHANNELS,
+                 feature_mode=None, model=None, rule_agreement=None):
+        """
+        Args:
+            neutral_max, yes_ratio, no_ratio: Rule thresholds (None = rule off)
+            vertical_channels, horizontal_channels: Feature columns the
+                                                    statistics read
+            feature_mode: Feature mode of the windows the gate was fit on
+            model: model_identity() of the model it was fit against
+            rule_agreement: Label -> measured agreement of that rule with the
+                            model (the confidence of gated predictions)
+        """
+        self.neutral_max = neutral_max
+        self.yes_ratio = yes_ratio
+        self.no_ratio = no_ratio
+        self.vertical_channels = list(vertical_channels)
+        self.horizontal_channels = list(horizontal_channels)
+        self.feature_mode = feature_mode
+        self.model = model
+        self.rule_agreement = {int(k): v for k, v in (rule_agreement or {}).items()}
+    
+    @classmethod
+    def load(cls, gate_file=GATE_FILE):
+        """Load fitted thresholds"""
+        with open(str(gate_file), 'r') as f:
+            config = json.load(f)
+        return cls(
+            config['neutral_max'], config['yes_ratio'], config['no_ratio'],
+            config['vertical_channels'], config['horizontal_channels'],
+            config.get('feature_mode'), config.get('model'), config.get('rule_agreement')
+        )
+    
+    def to_dict(self):
+        return {
+            "neutral_max": self.neutral_max,
+            "yes_ratio": self.yes_ratio,
+            "no_ratio": self.no_ratio,
+            "vertical_channels": self.vertical_channels,
+            "horizontal_channels": self.horizontal_channels,
+            "feature_mode": self.feature_mode,
+            "model": self.model,
+            "rule_agreement": self.rule_agreement
+        }
+    
+    def matches(self, model_info):
+        """
+        Whether the gate was fit for this model
+        
+        Gates fit before the feature mode and model were recorded never match.
+        """
+        return (self.feature_mode == "coords"
+                and model_info.get("feature_mode", "coords") == self.feature_mode
+                and self.model == model_identity(model_info))
+    
+    def classify(self, X):
+        """
+        Classify windows by motion statistics
+        
+        Args:
+            X: Windows of shape (num_windows, sequence_length, num_features)
+        
+        Returns:
+            Labels of shape (num_windows,), AMBIGUOUS (-1) where undecided
+        """
+        vertical, horizontal = motion_statistics(X, self.vertical_channels, self.horizontal_channels)
+        motion = np.maximum(vertical, horizontal)
+        log_ratio = np.log((vertical + 1e-9) / (horizontal + 1e-9))
+        
+        labels = np.full(len(vertical), AMBIGUOUS)
+        moving = np.ones(len(vertical), dtype=bool)
+        if self.neutral_max is not None:
+            labels[motion < self.neutral_max] = LABEL_NEUTRAL
+            moving = motion >= self.neutral_max
+        if self.yes_ratio is not None:
+            labels[moving & (log_ratio >= np.log(self.yes_ratio))] = LABEL_YES
+        if self.no_ratio is not None:
+            labels[moving & (log_ratio <= np.log(self.no_ratio))] = LABEL_NO
+        return labels
+    
+    @classmethod
+    def fit(cls, X, model_predictions, target=0.99):
+        """
+        Fit thresholds so each rule agrees with the model >= target
+        
+        Args:
+            X: Training windows
+            model_predictions: Model class predictions for the same windows
+            target: Required agreement rate per gate rule
+        """
+        vertical, horizontal = motion_statistics(X)
+        motion = np.maximum(vertical, horizontal)
+        log_ratio = np.log((vertical + 1e-9) / (horizontal + 1e-9))
+        
+        # NEUTRAL: lowest-motion windows
+        neutral_max = _fit_threshold(motion, model_predictions == LABEL_NEUTRAL, target)
+        
+        moving = motion >= neutral_max if neutral_max is not None else np.ones(len(X), dtype=bool)
+        
+        # YES: highest vertical/horizontal ratios (sort descending via negation)
+        yes_ratio = None
+        yes_threshold = _fit_threshold(-log_ratio[moving], model_predictions[moving] == LABEL_YES, target)
+        if yes_threshold is not None:
+            yes_ratio = float(np.exp(-yes_threshold))
+        
+        # NO: lowest vertical/horizontal ratios
+        no_ratio = None
+        no_threshold = _fit_threshold(log_ratio[moving], model_predictions[moving] == LABEL_NO, target)
+        if no_threshold is not None:
+            no_ratio = float(np.exp(no_threshold))
+        
+        # The two ratio rules must not overlap
+        if yes_ratio is not None and no_ratio is not None and no_ratio >= yes_ratio:
+            no_ratio = None
+        
+        return cls(neutral_max, yes_ratio, no_ratio)
+
+class CascadeClassifier:
+    """
+    Gate first, model only for ambiguous windows
+    
+    predict() mirrors Keras' model.predict. A gated window's probability for
+    its label is the rule's measured agreement with the model, the rest is
+    spread evenly over the other classes. The model is only loaded once a
+    window needs it, so gated windows never pay for loading it.
+    """
+    
+    def __init__(self, gate, load_model, num_classes=3):
+        """
+        Args:
+            gate: MotionGate, or None to send every window to the model
+            load_model: Function returning the model (called at most once)
+            num_classes: Number of classes
+        """
+        self.gate = gate
+        self.load_model = load_model
+        self.model = None
+        self.num_classes = num_classes
+        self.gate_hits = 0
+        self.total = 0
+        self.last_gated = np.zeros(0, dtype=bool)
+    
+    def predict(self, X, verbose=0):
+        X = np.asarray(X)
+        if self.gate is not None:
+            labels = self.gate.classify(X)
+        else:
+            labels = np.full(len(X), AMBIGUOUS)
+        probabilities = np.zeros((len(X), self.num_classes), dtype=np.float32)
+        
+        hit = labels != AMBIGUOUS
+        for label in np.unique(labels[hit]):
+            confidence = self.gate.rule_agreement.get(int(label), 1.0)
+            rows = labels == label
+            probabilities[rows] = (1.0 - confidence) / (self.num_classes - 1)
+            probabilities[rows, label] = confidence
+        if not np.all(hit):
+            if self.model is None:
+                self.model = self.load_model()
+            probabilities[~hit] = self.model.predict(X[~hit], verbose=verbose)
+        
+        self.last_gated = hit
+        self.gate_hits += int(np.sum(hit))
+        self.total += len(X)
+        return probabilities
+
+def _time_per_window(fn, X, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(X)
+    return (time.perf_counter() - start) / (repeats * len(X))
+
+def fit_gate(data_path="data", model_path="models", target=0.99):
+    """Fit the gate against the trained LSTM and report hit rate and cost"""
+    import tensorflow as tf
+    
+    data = load_training_data(data_path)
+    model_file = Path(model_path) / "gesture_classifier.h5"
+    if data is None or not model_file.exists():
+        print("[ERROR] Need both training data and a trained model")
+        print(f"   Looking for: {Path(data_path) / DATASET_DIR}")
+        print(f"                {model_file}")
+        return None
+    
+    X, y, metadata = data
+    info_file = Path(model_path) / "model_info.json"
+    with open(str(info_file), 'r') as f:
+        model_info = json.load(f)
+    
+    # The rules read coords channels; other layouts would be gated on
+    # unrelated features
+    feature_mode = metadata.get("feature_mode", "coords")
+    if feature_mode != "coords" or model_info.get("feature_mode", "coords") != feature_mode:
+        print(f"[ERROR] The motion gate needs a coords model and dataset "
+              f"(data: {feature_mode}, model: {model_info.get('feature_mode', 'coords')})")
+        return None
+    
+    X = X.astype(np.float32)
+    model = tf.keras.models.load_model(str(model_file), compile=False)
+    
+    print("\n" + "="*60)
+    print(" "*18 + "MOTION GATE FITTING")
+    print("="*60)
+    print(f"\nWindows: {len(X)}  |  Target agreement: {target*100:.1f}%")
+    
+    model_predictions = np.argmax(model.predict(X, verbose=0), axis=1)
+    gate = MotionGate.fit(X, model_predictions, target=target)
+    labels = gate.classify(X)
+    hit = labels != AMBIGUOUS
+    gate.feature_mode = feature_mode
+    gate.model = model_identity(model_info)
+    gate.rule_agreement = {
+        label: float(np.mean(model_predictions[labels == label] == label))
+        for label in (LABEL_YES, LABEL_NO, LABEL_NEUTRAL) if np.any(labels == label)
+    }
+    
+    hit_rate = float(np.mean(hit))
+    gate_agreement = float(np.mean(labels[hit] == model_predictions[hit])) if np.any(hit) else 0.0
+    cascade_predictions = np.where(hit, labels, model_predictions)
+    cascade_agreement = float(np.mean(cascade_predictions == model_predictions))
+    cascade_accuracy = float(np.mean(cascade_predictions == y))
+    model_accuracy = float(np.mean(model_predictions == y))
+    
+    # Cost per window: vectorized gate vs batch-1 model call (the real-time case)
+    gate_cost = _time_per_window(gate.classify, X, repeats=20)
+    sample = X[:min(len(X), 50)]
+    model_cost = _time_per_window(
+        lambda batch: [model(window[None], training=False) for window in batch], sample, repeats=1
+    )
+    average_cost = gate_cost + (1 - hit_rate) * model_cost
+    
+    per_class = {}
+    for label, name in [(LABEL_YES, "YES"), (LABEL_NO, "NO"), (LABEL_NEUTRAL, "NEUTRAL")]:
+        per_class[name] = float(np.mean(labels == label))
+    
+    report = {
+        "target_agreement": target,
+        "windows": int(len(X)),
+        "gate_hit_rate": hit_rate,
+        "gate_hit_rate_by_class": per_class,
+        "gate_agreement_with_model": gate_agreement,
+        "cascade_agreement_with_model": cascade_agreement,
+        "cascade_accuracy": cascade_accuracy,
+        "model_accuracy": model_accuracy,
+        "gate_cost_us": gate_cost * 1e6,
+        "model_cost_us": model_cost * 1e6,
+        "average_cost_us": average_cost * 1e6,
+        "speedup": model_cost / average_cost if average_cost > 0 else None
+    }
+    
+    config = gate.to_dict()
+    config["fit_report"] = report
+    gate_file = Path(model_path) / "motion_gate.json"
+    with open(str(gate_file), 'w') as f:
+        json.dump(config, f, indent=2)
+    
+    def fmt(value):
+        return "disabled" if value is None else f"{value:.4f}"
+    
+    print(f"\nThresholds:")
+    print(f"  NEUTRAL if motion < {fmt(gate.neutral_max)}")
+    print(f"  YES if vertical/horizontal >= {fmt(gate.yes_ratio)}")
+    print(f"  NO if vertical/horizontal <= {fmt(gate.no_ratio)}")
+    print(f"\nGate hit rate:           {hit_rate*100:.1f}%")
+    for name, rate in per_class.items():
+        print(f"  {name:8}: {rate*100:.1f}% of windows")
+    print(f"Gate agreement w/ model: {gate_agreement*100:.1f}%")
+    print(f"Cascade agreement:       {cascade_agreement*100:.1f}%")
+    print(f"Accuracy (model):        {model_accuracy*100:.1f}%")
+    print(f"Accuracy (cascade):      {cascade_accuracy*100:.1f}%")
+    print(f"\nCost per window:")
+    print(f"  Gate:    {gate_cost*1e6:10.2f} us")
+    print(f"  Model:   {model_cost*1e6:10.2f} us")
+    print(f"  Average: {average_cost*1e6:10.2f} us ({report['speedup']:.1f}x faster)")
+    print(f"\nGate saved to: {gate_file}")
+    print("="*60)
+    
+    return gate
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the motion-statistics gate")
+    parser.add_argument("--target", type=float, default=0.99,
+                        help="Required agreement of each gate rule with the model (default 0.99)")
+    args = parser.parse_args()
+    fit_gate(target=args.target)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+EXTRACTION TRACE
+================
+Chrome trace-event timeline of feature extraction, across threads and
+worker processes, plus a peak-memory probe.
+
+extraction_stats.json sums every stage over the whole run; the trace shows
+when each frame was decoded, color-converted, run through FaceMesh and
+converted, and which thread or process did it - so pipeline stalls, idle
+workers and slow videos are visible at a glance.
+
+Usage:
+    python 2_extract_features.py --trace            # Writes data/extraction_trace.json
+    python 2_extract_features.py --trace --pipeline --workers 4
+
+Open the file in chrome://tracing or https://ui.perfetto.dev.
+
+How it works:
+    - Spans are "complete" trace events (ph "X") with perf_counter start
+      and duration in microseconds; perf_counter is a system-wide
+      monotonic clock on Linux, macOS and Windows, so spans from worker
+      processes line up with the main process
+    - Every thread and process gets a name event (ph "M") the first time
+      it records a span
+    - Workers hand their events back with each result (drain()); the main
+      process merges them (extend()) and save() shifts the timeline to
+      start at 0
+"""
+
+import os
+import sys
+import json
+import threading
+import multiprocessing
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process in MB
+    
+    Returns None where the resource module isn't available (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class TraceRecorder:
+    """Collects Chrome trace events; add() may be called from any thread"""
+    
+    def __init__(self):
+        self.events = []
+        self.named = set()
+    
+    def add(self, name, start, end, category="extract", **args):
+        """
+        Record a span
+        
+        Args:
+            name: Span name (e.g. the stage)
+            start, end: time.perf_counter() seconds
+            category: Trace category, for filtering in the viewer
+            **args: Extra values shown when the span is selected
+        """
+        pid, tid = os.getpid(), threading.get_ident()
+        if (pid, tid) not in self.named:
+            self._name_thread(pid, tid)
+        event = {"name": name, "cat": category, "ph": "X", "pid": pid, "tid": tid,
+                 "ts": start * 1e6, "dur": (end - start) * 1e6}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+    
+    def _name_thread(self, pid, tid):
+        if not any(key[0] == pid for key in self.named):
+            self.events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": tid,
+                                "args": {"name": f"{multiprocessing.current_process().name} ({pid})"}})
+        self.events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                            "args": {"name": threading.current_thread().name}})
+        self.named.add((pid, tid))
+    
+    def drain(self):
+        """Take the events recorded so far (workers send them with each result)"""
+        events, self.events = self.events, []
+        self.named = set()
+        return events
+    
+    def extend(self, events):
+        """Merge events drained from another recorder"""
+        self.events.extend(events)
+    
+    def save(self, path):
+        """
+        Write the trace as JSON
+        
+        Returns:
+            Number of spans written
+        """
+        spans = [event for event in self.events if event["ph"] == "X"]
+        origin = min((event["ts"] for event in spans), default=0.0)
+        events = [
+            dict(event, ts=round(event["ts"] - origin, 1), dur=round(event["dur"], 1))
+            if event["ph"] == "X" else event
+            for event in self.events
+        ]
+        with open(str(path), 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(spans)
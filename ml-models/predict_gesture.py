@@ -1,6 +1,17 @@
 """
 Gesture Prediction Script
 Called by the backend to make predictions using the trained model.
+
+If models/motion_gate.json was fit for the current LSTM (motion_gate.py),
+obvious windows are classified by the motion gate and TensorFlow is never
+loaded for them; a gate fit for another model or feature mode is ignored.
+
+Set GESTURE_BACKEND=classical to use the scikit-learn backend trained by
+classical_backend.py instead of the LSTM.
+
+If the trained model has a bundle (models/bundles, written by 3_train_model.py
+or model_bundle.py, and named in model_info.json), the LSTM runs from the memory-mapped bundle with NumPy
+instead of loading the H5 file into TensorFlow.
 """
 
 import sys
@@ -8,17 +19,53 @@ import json
 import os
 import warnings
 import numpy as np
-import tensorflow as tf
 from pathlib import Path
 
 # Suppress all TensorFlow and numpy warnings/info messages
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'  # 0=all, 1=info, 2=warnings, 3=errors only
 warnings.filterwarnings('ignore')
-tf.get_logger().setLevel('ERROR')
+
+def load_gate():
+    """Load the fitted motion gate, or None if it wasn't fit for the current model"""
+    # The gate is fit against the LSTM's predictions
+    if os.environ.get('GESTURE_BACKEND', 'lstm') != 'lstm':
+        return None
+    model_dir = Path(__file__).parent / "models"
+    gate_file = model_dir / "motion_gate.json"
+    info_file = model_dir / "model_info.json"
+    if not gate_file.exists() or not info_file.exists():
+        return None
+    
+    from motion_gate import MotionGate
+    gate = MotionGate.load(gate_file)
+    with open(str(info_file), 'r') as f:
+        model_info = json.load(f)
+    return gate if gate.matches(model_info) else None
 
 def load_model():
     """Load the trained gesture recognition model"""
-    model_path = Path(__file__).parent / "models" / "gesture_classifier.h5"
+    # GESTURE_BACKEND=classical uses the scikit-learn backend (no TensorFlow)
+    if os.environ.get('GESTURE_BACKEND', 'lstm') == 'classical':
+        from classical_backend import ClassicalGestureModel
+        return ClassicalGestureModel.load(
+            Path(__file__).parent / "models" / "gesture_classifier_classical.pkl"
+        )
+    
+    # Memory-mapped bundle of the trained model: no HDF5 parsing, no TensorFlow
+    from model_bundle import load_model_bundle
+    bundle = load_model_bundle(Path(__file__).parent / "models")
+    if bundle is not None:
+        return bundle
+    
+    return load_keras_model(Path(__file__).parent / "models" / "gesture_classifier.h5")
+
+def load_keras_model(model_path):
+    """Load an H5 model, working around TensorFlow version differences"""
+    # Imported here so gated predictions never pay for TensorFlow startup
+    import tensorflow as tf
+    tf.get_logger().setLevel('ERROR')
+    
+    model_path = Path(model_path)
     
     if not model_path.exists():
         raise FileNotFoundError(f"Model not found at {model_path}")
@@ -83,20 +130,24 @@ def predict(sequence):
     Args:
         sequence: List of lists, shape (sequence_length, 9)
                  Each frame has 9 features: [3 vertical_y, 3 horizontal_x, 3 vertical_z]
+                 (or 6 for head-pose models: pitch, yaw, roll + velocities)
     
     Returns:
-        Dictionary with gesture, confidence, and probabilities
+        Dictionary with gesture, confidence, probabilities and the cascade
+        stage ("gate" or "model") that produced the prediction
     """
-    model = load_model()
-    
     # Convert to numpy array
     sequence_array = np.array(sequence, dtype=np.float32)
     
     # Reshape for model input: (1, sequence_length, 9)
     sequence_array = np.expand_dims(sequence_array, axis=0)
     
-    # Make prediction
-    predictions = model.predict(sequence_array, verbose=0)[0]
+    # Cheap motion gate for obvious windows, the model (loaded only when
+    # needed) for ambiguous ones
+    from motion_gate import CascadeClassifier
+    cascade = CascadeClassifier(load_gate(), load_model)
+    predictions = cascade.predict(sequence_array, verbose=0)[0]
+    stage = "gate" if cascade.last_gated[0] else "model"
     
     # Get predicted class
     predicted_class = int(np.argmax(predictions))
@@ -115,7 +166,8 @@ def predict(sequence):
     return {
         "gesture": gesture,
         "confidence": confidence,
-        "probabilities": probabilities
+        "probabilities": probabilities,
+        "stage": stage
     }
 
 if __name__ == "__main__":
@@ -26,6 +26,10 @@ import json
 from collections import deque
 import time
 
+from head_pose import HeadPoseFeatures
+from gesture_features import face_features
+from keypoint_source import DetectorKeypoints
+
 # Load model
 print("\n" + "="*60)
 print("GESTURE RECOGNITION - DEBUG MODE")
@@ -39,6 +43,8 @@ with open("models/model_info.json", 'r') as f:
 
 label_names = {int(k): v for k, v in info['label_map'].items()}
 sequence_length = info['input_shape'][0]
+feature_mode = info.get('feature_mode', 'coords')
+pose_features = HeadPoseFeatures()
 
 # Handle legacy 3-class models
 if len(label_names) == 3:
@@ -46,6 +52,7 @@ if len(label_names) == 3:
 
 print(f"[OK] Classes: {label_names}")
 print(f"[OK] Sequence length: {sequence_length} frames")
+print(f"[OK] Feature mode: {feature_mode}")
 
 # Prediction counter
 frame_count = 0
@@ -53,19 +60,18 @@ prediction_count = 0
 last_log_time = time.time()
 
 # Setup
-mp_face_mesh = mp.solutions.face_mesh.FaceMesh(
-    max_num_faces=1,
-    refine_landmarks=True,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
-
-# Focused landmarks for movement detection (must match training)
-# Vertical landmarks (YES - nodding): 1 (nose), 10 (forehead), 152 (chin)
-# Horizontal landmarks (NO - shaking): 1 (nose), 33 (left eye), 263 (right eye)
-vertical_landmarks = [1, 10, 152]
-horizontal_landmarks = [1, 33, 263]
-key_landmarks = sorted(list(set(vertical_landmarks + horizontal_landmarks)))
+if feature_mode == "keypoints":
+    # Model trained on face detector keypoints (keypoint_source.py)
+    mp_face_mesh = DetectorKeypoints()
+else:
+    mp_face_mesh = mp.solutions.face_mesh.FaceMesh(
+        max_num_faces=1,
+        refine_landmarks=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+# Features come from gesture_features.py, the same kernel training uses
 frame_buffer = deque(maxlen=sequence_length)
 
 # Colors
@@ -99,30 +105,9 @@ while True:
     
     if results.multi_face_landmarks:
         # Extract movement-focused features (matching training)
-        face = results.multi_face_landmarks[0]
-        
-        # Extract raw positions
-        vertical_positions = []
-        horizontal_positions = []
-        
-        for idx in vertical_landmarks:
-            lm = face.landmark[idx]
-            vertical_positions.append([lm.x, lm.y, lm.z])
-        
-        for idx in horizontal_landmarks:
-            lm = face.landmark[idx]
-            horizontal_positions.append([lm.x, lm.y, lm.z])
-        
-        vertical_positions = np.array(vertical_positions)
-        horizontal_positions = np.array(horizontal_positions)
-        
-        # Compute movement-focused features
-        features = []
-        features.extend(vertical_positions[:, 1].tolist())  # vertical y-coords (YES)
-        features.extend(horizontal_positions[:, 0].tolist())  # horizontal x-coords (NO)
-        features.extend(vertical_positions[:, 2].tolist())  # z-coords (depth)
+        features = face_features(results.multi_face_landmarks[0], feature_mode, frame.shape, pose_features)
         
-        frame_buffer.append(np.array(features))
+        frame_buffer.append(features)
         
         # Predict
         if len(frame_buffer) == sequence_length:
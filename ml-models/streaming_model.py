@@ -0,0 +1,369 @@
+"""
+STREAMING GESTURE MODEL
+=======================
+Causal dilated-convolution variant of the gesture classifier with a
+constant-time per-frame runtime.
+
+Usage:
+    python streaming_model.py train     # Train on the extracted dataset
+    python streaming_model.py verify    # Check push() against batch evaluation
+
+What it does:
+    - Trains a causal temporal-convolution model on the same 15-frame windows
+      as 3_train_model.py
+    - Exports its weights to a plain NumPy file
+    - Runs the model frame by frame with push(frame) -> probabilities, doing
+      one new time step per layer instead of re-running the whole window
+
+Model Architecture:
+    - 3 causal Conv1D layers (kernel 3, dilations 1 -> 2 -> 4)
+    - Receptive field: 1 + 2*(1+2+4) = 15 frames = one full window
+    - Dense layers on the LAST time step only -> Softmax (YES, NO, NEUTRAL)
+
+Why streaming is exact:
+    With causal padding and a receptive field no larger than the window, the
+    last time step of the network depends on exactly the frames inside the
+    window and never on the padding. The runtime keeps, per conv layer, a ring
+    buffer of the last (kernel-1)*dilation+1 inputs of that layer, so each new
+    frame costs one output column per layer, no matter how long the window is.
+
+Output:
+    - models/streaming/gesture_classifier.h5: Trained Keras model
+    - models/streaming/model_info.json: Training metadata
+    - models/streaming/streaming_weights.npz: Weights for the NumPy runtime
+"""
+
+import sys
+import time
+import argparse
+import importlib
+import numpy as np
+from pathlib import Path
+
+from dataset_io import load_training_data
+
+STREAMING_MODEL_DIR = Path(__file__).parent / "models" / "streaming"
+WEIGHTS_FILE = "streaming_weights.npz"
+
+def causal_dilations(sequence_length, kernel_size=3):
+    """
+    Pick doubling dilation rates whose receptive field fits in the window
+    
+    Args:
+        sequence_length: Frames per window (15 by default)
+        kernel_size: Conv1D kernel size
+    
+    Returns:
+        List of dilation rates, e.g. [1, 2, 4] for 15 frames and kernel 3
+    """
+    dilations = []
+    receptive_field = 1
+    dilation = 1
+    while receptive_field + (kernel_size - 1) * dilation <= sequence_length:
+        dilations.append(dilation)
+        receptive_field += (kernel_size - 1) * dilation
+        dilation *= 2
+    return dilations
+
+def create_streaming_model(input_shape, num_classes=3, filters=32, kernel_size=3):
+    """
+    Create the causal dilated-convolution classifier
+    
+    Architecture:
+        Input -> Conv1D(d=1) -> Conv1D(d=2) -> Conv1D(d=4) -> last step -> Dense(32) -> Output(3)
+    
+    Args:
+        input_shape: (sequence_length, num_features)
+        num_classes: Number of output classes (default 3)
+        filters: Channels per conv layer
+        kernel_size: Conv1D kernel size
+    
+    Returns:
+        Compiled Keras model
+    """
+    from tensorflow import keras
+    
+    sequence_length = input_shape[0]
+    dilations = causal_dilations(sequence_length, kernel_size)
+    
+    layers = [keras.layers.Input(shape=input_shape)]
+    for dilation in dilations:
+        layers.append(keras.layers.Conv1D(
+            filters, kernel_size,
+            dilation_rate=dilation,
+            padding='causal',
+            activation='relu'
+        ))
+        layers.append(keras.layers.Dropout(0.2))
+    
+    layers.extend([
+        # Keep only the last time step - it sees exactly the window
+        keras.layers.Cropping1D(cropping=(sequence_length - 1, 0)),
+        keras.layers.Flatten(),
+        keras.layers.Dense(32, activation='relu'),
+        keras.layers.Dropout(0.2),
+        keras.layers.Dense(num_classes, activation='softmax')
+    ])
+    
+    model = keras.Sequential(layers, name='StreamingGestureModel')
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=0.001),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    return model
+
+def export_weights(model, output_file):
+    """
+    Export conv and dense weights of a trained streaming model to NumPy
+    
+    Args:
+        model: Keras model built by create_streaming_model
+        output_file: Path of the .npz file to write
+    """
+    arrays = {}
+    dilations = []
+    conv_count = 0
+    dense_count = 0
+    
+    for layer in model.layers:
+        layer_type = layer.__class__.__name__
+        if layer_type == 'Conv1D':
+            kernel, bias = layer.get_weights()
+            arrays[f"conv_kernel_{conv_count}"] = kernel.astype(np.float32)
+            arrays[f"conv_bias_{conv_count}"] = bias.astype(np.float32)
+            dilations.append(layer.dilation_rate[0])
+            conv_count += 1
+        elif layer_type == 'Dense':
+            kernel, bias = layer.get_weights()
+            arrays[f"dense_kernel_{dense_count}"] = kernel.astype(np.float32)
+            arrays[f"dense_bias_{dense_count}"] = bias.astype(np.float32)
+            dense_count += 1
+    
+    arrays["dilations"] = np.array(dilations, dtype=np.int64)
+    arrays["sequence_length"] = np.array(model.input_shape[1], dtype=np.int64)
+    np.savez(str(output_file), **arrays)
+
+class StreamingGestureModel:
+    """
+    NumPy runtime for the causal gesture model
+    
+    push(frame) costs one output column per conv layer, so per-frame work is
+    constant. Before the receptive field has filled, push() returns None,
+    matching the testers that wait for a full buffer.
+    """
+    
+    def __init__(self, weights):
+        self.dilations = [int(d) for d in weights["dilations"]]
+        self.sequence_length = int(weights["sequence_length"])
+        self.kernels = [weights[f"conv_kernel_{i}"] for i in range(len(self.dilations))]
+        self.biases = [weights[f"conv_bias_{i}"] for i in range(len(self.dilations))]
+        
+        self.dense_layers = []
+        i = 0
+        while f"dense_kernel_{i}" in weights:
+            self.dense_layers.append((weights[f"dense_kernel_{i}"], weights[f"dense_bias_{i}"]))
+            i += 1
+        
+        kernel_size = self.kernels[0].shape[0]
+        self.receptive_field = 1 + (kernel_size - 1) * sum(self.dilations)
+        
+        # Tap j of a causal conv reads input (kernel_size-1-j)*dilation steps back
+        self.tap_offsets = [
+            (kernel_size - 1 - np.arange(kernel_size)) * dilation
+            for dilation in self.dilations
+        ]
+        self.history_sizes = [(kernel_size - 1) * d + 1 for d in self.dilations]
+        
+        self.reset()
+    
+    @classmethod
+    def load(cls, model_dir=STREAMING_MODEL_DIR):
+        """Load exported weights (no TensorFlow needed)"""
+        weights_file = Path(model_dir) / WEIGHTS_FILE
+        if not weights_file.exists():
+            raise FileNotFoundError(
+                f"Streaming weights not found: {weights_file}\n"
+                "Please train the model first using 'python streaming_model.py train'"
+            )
+        with np.load(str(weights_file)) as data:
+            weights = {key: data[key] for key in data.files}
+        return cls(weights)
+    
+    def reset(self):
+        """Clear all cached activations (e.g. when the face is lost)"""
+        # Zeros in the history are exactly the causal zero padding of batch mode
+        self._history = [
+            np.zeros((size, kernel.shape[1]), dtype=np.float32)
+            for size, kernel in zip(self.history_sizes, self.kernels)
+        ]
+        self._write_pos = [0] * len(self.kernels)
+        self.frames_seen = 0
+    
+    def _head(self, features):
+        """Dense layers on the last time step, softmax output"""
+        x = features
+        for i, (kernel, bias) in enumerate(self.dense_layers):
+            x = x @ kernel + bias
+            if i < len(self.dense_layers) - 1:
+                x = np.maximum(x, 0.0)
+        x = x - np.max(x, axis=-1, keepdims=True)
+        exp = np.exp(x)
+        return exp / np.sum(exp, axis=-1, keepdims=True)
+    
+    def push(self, frame):
+        """
+        Feed one frame of features and get the current window's prediction
+        
+        Args:
+            frame: Feature vector of shape (num_features,)
+        
+        Returns:
+            Probabilities of shape (num_classes,), or None while warming up
+        """
+        x = np.asarray(frame, dtype=np.float32)
+        
+        for layer in range(len(self.kernels)):
+            history = self._history[layer]
+            pos = self._write_pos[layer]
+            history[pos] = x
+            
+            taps = history[(pos - self.tap_offsets[layer]) % len(history)]
+            x = np.einsum('ki,kio->o', taps, self.kernels[layer]) + self.biases[layer]
+            x = np.maximum(x, 0.0)
+            
+            self._write_pos[layer] = (pos + 1) % len(history)
+        
+        self.frames_seen += 1
+        if self.frames_seen < self.receptive_field:
+            return None
+        return self._head(x)
+    
+    def predict_windows(self, X):
+        """
+        Batch reference: evaluate full windows the way Keras does
+        
+        Args:
+            X: Windows of shape (num_windows, sequence_length, num_features)
+        
+        Returns:
+            Probabilities of shape (num_windows, num_classes)
+        """
+        x = np.asarray(X, dtype=np.float32)
+        
+        for kernel, bias, dilation in zip(self.kernels, self.biases, self.dilations):
+            kernel_size = kernel.shape[0]
+            pad = (kernel_size - 1) * dilation
+            padded = np.pad(x, ((0, 0), (pad, 0), (0, 0)))
+            steps = x.shape[1]
+            out = bias + sum(
+                padded[:, j * dilation:j * dilation + steps] @ kernel[j]
+                for j in range(kernel_size)
+            )
+            x = np.maximum(out, 0.0)
+        
+        return self._head(x[:, -1])
+
+def train_streaming_model(epochs=100, batch_size=16):
+    """Train with the standard trainer, swapping in the causal architecture"""
+    trainer_module = importlib.import_module("3_train_model")
+    
+    class StreamingModelTrainer(trainer_module.GestureModelTrainer):
+        def create_model(self, input_shape, num_classes=3):
+            return create_streaming_model(input_shape, num_classes=num_classes)
+    
+    trainer = StreamingModelTrainer(model_path=str(STREAMING_MODEL_DIR))
+    X, y = trainer.load_data()
+    if X is None:
+        return None
+    
+    model = trainer.train(X, y, epochs=epochs, batch_size=batch_size)
+    
+    weights_file = STREAMING_MODEL_DIR / WEIGHTS_FILE
+    export_weights(model, weights_file)
+    print(f"Streaming runtime weights saved to: {weights_file}")
+    return model
+
+def verify_equivalence(model_dir=STREAMING_MODEL_DIR, data_path="data", num_frames=600, tolerance=1e-5):
+    """
+    Stream frames through push() and compare with batch evaluation of the
+    same sliding windows (NumPy reference and, if available, the Keras model)
+    
+    Returns:
+        True if every streamed prediction matches within tolerance
+    """
+    runtime = StreamingGestureModel.load(model_dir)
+    window = runtime.sequence_length
+    
+    # Build a continuous stream from real windows when available
+    data = load_training_data(data_path, lazy=True)
+    if data is not None:
+        X = data[0]
+        stream = X[:max(1, num_frames // window)].reshape(-1, X.shape[2])
+    else:
+        rng = np.random.default_rng(0)
+        stream = rng.normal(0.5, 0.1, size=(num_frames, runtime.kernels[0].shape[1]))
+    stream = stream.astype(np.float32)
+    
+    start = time.perf_counter()
+    streamed = [runtime.push(frame) for frame in stream]
+    push_time = (time.perf_counter() - start) / len(stream)
+    
+    # Windows ending at every frame where a full window exists
+    windows = np.lib.stride_tricks.sliding_window_view(stream, window, axis=0)
+    windows = np.ascontiguousarray(windows.transpose(0, 2, 1))
+    streamed = np.array(streamed[window - 1:])
+    
+    batch = runtime.predict_windows(windows)
+    max_dev = float(np.max(np.abs(streamed - batch)))
+    passed = max_dev <= tolerance
+    
+    print("\n" + "="*60)
+    print(" "*15 + "STREAMING EQUIVALENCE CHECK")
+    print("="*60)
+    print(f"\nFrames streamed:            {len(stream)}")
+    print(f"Windows compared:           {len(windows)}")
+    print(f"Receptive field:            {runtime.receptive_field} frames")
+    print(f"Max deviation vs NumPy batch: {max_dev:.2e}")
+    print(f"push() time per frame:      {push_time*1e6:.1f} us")
+    
+    keras_file = Path(model_dir) / "gesture_classifier.h5"
+    if keras_file.exists():
+        try:
+            import tensorflow as tf
+            model = tf.keras.models.load_model(str(keras_file), compile=False)
+            keras_batch = model.predict(windows, verbose=0)
+            keras_dev = float(np.max(np.abs(streamed - keras_batch)))
+            passed = passed and keras_dev <= tolerance
+            print(f"Max deviation vs Keras:     {keras_dev:.2e}")
+        except ImportError:
+            print("TensorFlow not installed - skipped Keras comparison")
+    
+    if passed:
+        print("\n[OK] Streaming output matches batch evaluation")
+    else:
+        print("\n[ERROR] Streaming output differs from batch evaluation")
+    print("="*60)
+    return passed
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming causal gesture model")
+    parser.add_argument("command", choices=["train", "verify"])
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+    
+    if args.command == "train":
+        model = train_streaming_model(epochs=args.epochs, batch_size=args.batch_size)
+        if model is None:
+            sys.exit(1)
+    else:
+        try:
+            passed = verify_equivalence()
+        except FileNotFoundError as e:
+            print(f"\n[ERROR] {e}")
+            sys.exit(1)
+        sys.exit(0 if passed else 1)
+
+if __name__ == "__main__":
+    main()